@@ -1,20 +1,36 @@
 """
 Hybrid STT API routes for the Whisper Voice Auth microservice.
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Header, Depends, Query
-from fastapi.responses import JSONResponse
-from typing import Optional, Dict, Any
+from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Optional, AsyncIterator
+import asyncio
 import logging
-import os
 from pathlib import Path
+import orjson
 
 from app.api.schemas import HybridSTTResponse, ErrorResponse
-from app.audio.processor import process_audio_file
-from app.hybrid.controller import process_audio_hybrid
-from app.utils.security import validate_api_key
+from app.audio.processor import process_audio_file, receive_audio_file, prepare_audio_file, save_pcm_audio, TARGET_SAMPLE_RATE, MAX_AUDIO_DURATION
+from app.audio.vad import UtteranceSegmenter
+from app.hybrid.controller import process_audio_hybrid, translate_audio_hybrid, stream_audio_hybrid
+from app.hybrid.cache import make_cache_key, get_cached_result, cache_result
+from app.voice_auth.verification import owner_voiceprint_version
+from app.utils.security import validate_api_key, API_KEY_NAME
+from app.utils.config import load_config
 
 logger = logging.getLogger(__name__)
 
+# Load configuration
+config = load_config()
+hybrid_config = config.get("hybrid_stt", {})
+REQUEST_TIMEOUT = float(hybrid_config.get("request_timeout", 30))  # Seconds
+MAX_CONCURRENT_TRANSCRIPTIONS = int(hybrid_config.get("max_concurrent_transcriptions", 8))
+
+# Bulkhead: cap in-flight transcriptions so a slow STT backend can't absorb every worker.
+# Audio normalization has its own limit in app.audio.processor.
+_transcription_semaphore = asyncio.Semaphore(MAX_CONCURRENT_TRANSCRIPTIONS)
+
 # Create router
 hybrid_router = APIRouter()
 
@@ -25,10 +41,12 @@ hybrid_router = APIRouter()
     responses={
         403: {"model": ErrorResponse},
         422: {"model": ErrorResponse},
+        504: {"model": ErrorResponse},
     },
     description="Process audio using hybrid STT approach (OpenAI primary, local fallback).",
 )
 async def hybrid_stt(
+    background_tasks: BackgroundTasks,
     audio_file: UploadFile = File(...),
     audio_url: Optional[str] = None,
     verify_speaker: bool = Query(False, description="Whether to verify speaker identity"),
@@ -43,6 +61,7 @@ async def hybrid_stt(
     Process audio using hybrid STT approach with OpenAI API primary and local fallback.
     
     Args:
+        background_tasks: FastAPI background tasks
         audio_file: Uploaded audio file (WAV, MP3, etc.)
         audio_url: URL to audio file (alternative to upload)
         verify_speaker: Whether to verify speaker identity
@@ -57,22 +76,56 @@ async def hybrid_stt(
         HybridSTTResponse: The STT result with text and metadata
     """
     try:
-        # Process and normalize the audio file
-        processed_audio_path = await process_audio_file(audio_file, audio_url)
+        # Receive the audio file (hashing it on the way in)
+        audio_source, digest, header = await receive_audio_file(audio_file, audio_url)
         
-        # Process with hybrid approach
-        result = await process_audio_hybrid(
-            audio_path=processed_audio_path,
-            verify_speaker_flag=verify_speaker,
+        # Serve repeated uploads of the same audio from the cache (speaker checks only
+        # against the current voiceprint, which another worker may have replaced)
+        cache_key = make_cache_key(
+            digest,
+            verify_speaker=verify_speaker,
+            voiceprint_version=owner_voiceprint_version() if verify_speaker else None,
+            return_debug=return_debug,
             use_semantics=use_semantics,
-            semantic_threshold=semantic_threshold or 0.8,
+            semantic_threshold=semantic_threshold,
             language=language,
             prompt=prompt,
-            return_debug=return_debug
         )
+        cached = get_cached_result(cache_key)
+        if cached is not None:
+            logger.info(f"Serving cached hybrid STT result for {digest}")
+            if isinstance(audio_source, Path):
+                audio_source.unlink(missing_ok=True)
+            return cached
         
+        # Normalize the audio file
+        processed_audio_path = await prepare_audio_file(audio_source, header)
+        background_tasks.add_task(processed_audio_path.unlink, missing_ok=True)
+        
+        # Process with hybrid approach
+        async with _transcription_semaphore:
+            result = await asyncio.wait_for(
+                process_audio_hybrid(
+                    audio_path=processed_audio_path,
+                    verify_speaker_flag=verify_speaker,
+                    use_semantics=use_semantics,
+                    semantic_threshold=semantic_threshold or 0.8,
+                    language=language,
+                    prompt=prompt,
+                    return_debug=return_debug
+                ),
+                timeout=REQUEST_TIMEOUT,
+            )
+        
+        cache_result(cache_key, result)
         return result
         
+    except asyncio.TimeoutError:
+        logger.error(f"Hybrid STT timed out after {REQUEST_TIMEOUT:.0f} seconds")
+        raise HTTPException(
+            status_code=504,
+            detail=f"Transcription timed out after {REQUEST_TIMEOUT:.0f} seconds"
+        )
     except Exception as e:
         logger.error(f"Error processing hybrid STT: {str(e)}")
         raise HTTPException(
@@ -81,6 +134,140 @@ async def hybrid_stt(
         )
 
 
+@hybrid_router.post(
+    "/hybrid/stt/stream",
+    responses={
+        403: {"model": ErrorResponse},
+        422: {"model": ErrorResponse},
+    },
+    description="Process audio using hybrid STT, streaming partial transcripts as server-sent events.",
+)
+async def hybrid_stt_stream(
+    audio_file: UploadFile = File(...),
+    audio_url: Optional[str] = None,
+    verify_speaker: bool = Query(False, description="Whether to verify speaker identity"),
+    language: Optional[str] = Query(None, description="Target language code (e.g., 'en', 'ru')"),
+    prompt: Optional[str] = Query(None, description="Context prompt for better transcription"),
+    api_key: str = Depends(validate_api_key),
+) -> StreamingResponse:
+    """
+    Process audio using hybrid STT and stream the transcript as it is produced.
+    
+    Emits `delta` events with partial text and a closing `final` event whose
+    `result` has the same shape as HybridSTTResponse.
+    
+    Args:
+        audio_file: Uploaded audio file (WAV, MP3, etc.)
+        audio_url: URL to audio file (alternative to upload)
+        verify_speaker: Whether to verify speaker identity
+        language: Target language code
+        prompt: Context prompt for better transcription
+        api_key: API key for service authentication
+        
+    Returns:
+        StreamingResponse: text/event-stream of transcription events
+    """
+    try:
+        # Process and normalize the audio file before the stream starts,
+        # so invalid input still gets a regular error response
+        processed_audio_path = await process_audio_file(audio_file, audio_url)
+    except Exception as e:
+        logger.error(f"Error processing hybrid STT stream: {str(e)}")
+        raise HTTPException(
+            status_code=422,
+            detail=f"Error processing audio: {str(e)}"
+        )
+    
+    async def event_stream() -> AsyncIterator[bytes]:
+        try:
+            async with _transcription_semaphore:
+                async for event in stream_audio_hybrid(
+                    audio_path=processed_audio_path,
+                    verify_speaker_flag=verify_speaker,
+                    language=language,
+                    prompt=prompt,
+                ):
+                    yield b"data: " + orjson.dumps(event) + b"\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming hybrid STT: {str(e)}")
+            yield b"data: " + orjson.dumps({"type": "error", "detail": str(e)}) + b"\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        background=BackgroundTask(processed_audio_path.unlink, missing_ok=True),
+    )
+
+
+@hybrid_router.websocket("/hybrid/stt/ws")
+async def hybrid_stt_ws(
+    websocket: WebSocket,
+    verify_speaker: bool = Query(False, description="Whether to verify speaker identity"),
+    language: Optional[str] = Query(None, description="Target language code (e.g., 'en', 'ru')"),
+    prompt: Optional[str] = Query(None, description="Context prompt for better transcription"),
+) -> None:
+    """
+    Transcribe streamed audio utterance by utterance.
+    
+    The client sends binary messages with 16-bit little-endian mono PCM at
+    16 kHz (any chunk size, 20 ms frames recommended) and may send the text
+    message "end" to flush the last utterance. Silence is gated with VAD, and
+    each detected utterance is transcribed without ffmpeg and answered with
+    {"type": "final", "result": ...} (HybridSTTResponse shape).
+    
+    Args:
+        websocket: WebSocket connection (API key in the X-API-Key header)
+        verify_speaker: Whether to verify speaker identity
+        language: Target language code
+        prompt: Context prompt for better transcription
+    """
+    try:
+        await validate_api_key(websocket.headers.get(API_KEY_NAME))
+    except HTTPException:
+        await websocket.close(code=1008, reason="Invalid or missing API key")
+        return
+    
+    await websocket.accept()
+    segmenter = UtteranceSegmenter(sample_rate=TARGET_SAMPLE_RATE, max_duration=MAX_AUDIO_DURATION)
+    
+    async def transcribe_utterance(pcm: bytes) -> None:
+        audio_path = await asyncio.to_thread(save_pcm_audio, pcm)
+        try:
+            async with _transcription_semaphore:
+                result = await asyncio.wait_for(
+                    process_audio_hybrid(
+                        audio_path=audio_path,
+                        verify_speaker_flag=verify_speaker,
+                        language=language,
+                        prompt=prompt,
+                    ),
+                    timeout=REQUEST_TIMEOUT,
+                )
+            await websocket.send_text(orjson.dumps({"type": "final", "result": result}).decode())
+        except asyncio.TimeoutError:
+            await websocket.send_text(orjson.dumps({"type": "error", "detail": "Transcription timed out"}).decode())
+        finally:
+            audio_path.unlink(missing_ok=True)
+    
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            
+            if message.get("bytes"):
+                for utterance in segmenter.push(message["bytes"]):
+                    await transcribe_utterance(utterance)
+            elif message.get("text") == "end":
+                utterance = segmenter.flush()
+                if utterance:
+                    await transcribe_utterance(utterance)
+                await websocket.close()
+                break
+    except WebSocketDisconnect:
+        logger.info("Hybrid STT WebSocket client disconnected")
+
+
 @hybrid_router.post(
     "/hybrid/translate",
     response_model=HybridSTTResponse,
@@ -91,6 +278,7 @@ async def hybrid_stt(
     description="Translate audio to target language using OpenAI API.",
 )
 async def translate_audio_endpoint(
+    background_tasks: BackgroundTasks,
     audio_file: UploadFile = File(...),
     audio_url: Optional[str] = None,
     target_language: str = Query("en", description="Target language code (default: 'en')"),
@@ -102,6 +290,7 @@ async def translate_audio_endpoint(
     Translate audio to target language using OpenAI API.
     
     Args:
+        background_tasks: FastAPI background tasks
         audio_file: Uploaded audio file (WAV, MP3, etc.)
         audio_url: URL to audio file (alternative to upload)
         target_language: Target language code
@@ -113,11 +302,9 @@ async def translate_audio_endpoint(
         HybridSTTResponse: Translation result with metadata
     """
     try:
-        # Import the translation function
-        from app.hybrid.controller import translate_audio_hybrid
-        
         # Process and normalize the audio file
         processed_audio_path = await process_audio_file(audio_file, audio_url)
+        background_tasks.add_task(processed_audio_path.unlink, missing_ok=True)
         
         # Translate audio
         result = await translate_audio_hybrid(
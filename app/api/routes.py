@@ -4,6 +4,7 @@ API routes for the Whisper Voice Auth microservice.
 from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Header, Depends
 from fastapi.responses import JSONResponse
 from typing import Optional, List, Dict, Any
+import asyncio
 import logging
 
 from app.api.schemas import VerificationResponse, ErrorResponse
@@ -51,6 +52,7 @@ async def voice_verify(
     try:
         # Process and normalize the audio file
         processed_audio_path = await process_audio_file(audio_file, audio_url)
+        background_tasks.add_task(processed_audio_path.unlink, missing_ok=True)
         
         # Verify the speaker
         speaker_verified, speaker_match_score = await verify_speaker(processed_audio_path)
@@ -106,6 +108,7 @@ async def voice_verify(
     description="Register a new voice print for the owner.",
 )
 async def register_voice(
+    background_tasks: BackgroundTasks,
     audio_files: List[UploadFile] = File(...),
     api_key: str = Depends(validate_api_key),
 ) -> Dict[str, Any]:
@@ -113,6 +116,7 @@ async def register_voice(
     Register a new voice print from audio samples.
     
     Args:
+        background_tasks: FastAPI background tasks
         audio_files: List of audio files containing the owner's voice
         api_key: API key for service authentication
         
@@ -120,11 +124,12 @@ async def register_voice(
         Dict[str, Any]: Result of voice registration
     """
     try:
-        # Process each audio file
-        processed_paths = []
-        for audio_file in audio_files:
-            processed_path = await process_audio_file(audio_file)
-            processed_paths.append(processed_path)
+        # Process all audio files concurrently (ffmpeg concurrency is bounded by the processor)
+        processed_paths = list(await asyncio.gather(
+            *(process_audio_file(audio_file) for audio_file in audio_files)
+        ))
+        for processed_path in processed_paths:
+            background_tasks.add_task(processed_path.unlink, missing_ok=True)
         
         # Create and store voice print
         from app.voice_auth.registration import register_voice_print
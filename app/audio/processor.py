@@ -1,28 +1,80 @@
 """
 Audio processing utilities for the Whisper Voice Auth microservice.
 """
+import io
 import os
+import mmap
+import time
 import uuid
+import wave
+import struct
+import hashlib
+import asyncio
 import tempfile
+from functools import lru_cache
 from pathlib import Path
+from urllib.parse import urlparse
 import logging
 import aiofiles
 import aiohttp
 from fastapi import UploadFile
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple, Dict, Any, Union
 import ffmpeg
-import librosa
+import numpy as np
 import soundfile as sf
 from pydub import AudioSegment
 
 logger = logging.getLogger(__name__)
 
+# Original audio: raw upload bytes, or a downloaded file on disk
+AudioSource = Union[bytes, Path]
+
 # Define constants
-ALLOWED_AUDIO_FORMATS = [".wav", ".mp3", ".m4a", ".ogg", ".flac"]
+ALLOWED_AUDIO_FORMATS = frozenset({".wav", ".mp3", ".m4a", ".ogg", ".flac"})
+CONTENT_TYPE_EXTENSIONS = {
+    "audio/wav": ".wav",
+    "audio/x-wav": ".wav",
+    "audio/wave": ".wav",
+    "audio/mpeg": ".mp3",
+    "audio/mp3": ".mp3",
+    "audio/mp4": ".m4a",
+    "audio/m4a": ".m4a",
+    "audio/x-m4a": ".m4a",
+    "audio/ogg": ".ogg",
+    "audio/flac": ".flac",
+    "audio/x-flac": ".flac",
+}
 TARGET_SAMPLE_RATE = 16000  # 16kHz, standard for most speech recognition models
 TARGET_CHANNELS = 1  # Mono
+MIN_AUDIO_DURATION = 2  # Seconds
+MAX_AUDIO_DURATION = 20  # Seconds
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1MB read/write chunks for streaming uploads
+WAV_HEADER_SNIFF_SIZE = 4096  # Leading bytes kept to parse a WAV header inline
+METADATA_CACHE_SIZE = 1024  # Audio headers remembered by file identity
+SAMPLES_CACHE_SIZE = 32  # Decoded clips remembered by file identity (~1.3MB each at 20s)
+MAX_UPLOAD_SIZE = 25 * 1024 * 1024  # Uploads are held in memory, so cap their size
 TEMP_DIR = Path(tempfile.gettempdir()) / "whisper_audio"
 STORAGE_DIR = Path(os.environ.get("WHISPER_STORAGE_DIR", "app/storage/audio"))
+FFMPEG_PARALLELISM = int(os.environ.get("WHISPER_FFMPEG_PARALLELISM", os.cpu_count() or 1))
+FFMPEG_TIMEOUT = float(os.environ.get("WHISPER_FFMPEG_TIMEOUT", 30))  # Seconds before a normalization is killed
+
+DOWNLOAD_TIMEOUT = aiohttp.ClientTimeout(total=10, sock_connect=2)
+TEMP_FILE_MAX_AGE = 300  # Seconds before a leftover temp file is considered stale
+TEMP_CLEANUP_INTERVAL = 60  # Seconds between temp directory sweeps
+
+# Prebuilt ffmpeg argv for normalization: <input args> INPUT <output args> OUTPUT
+_FFMPEG_INPUT_ARGS = ("ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i")
+_FFMPEG_OUTPUT_ARGS = (
+    "-acodec", "pcm_s16le",  # 16-bit PCM
+    "-ar", str(TARGET_SAMPLE_RATE),  # Sample rate
+    "-ac", str(TARGET_CHANNELS),  # Mono
+)
+
+# Bound the number of concurrent ffmpeg processes
+_ffmpeg_semaphore = asyncio.Semaphore(FFMPEG_PARALLELISM)
+
+# Shared HTTP session for audio downloads (created lazily, closed on app shutdown)
+_http_session: Optional[aiohttp.ClientSession] = None
 
 
 # Ensure directories exist
@@ -44,68 +96,230 @@ async def process_audio_file(
     Returns:
         Path: Path to the processed audio file
         
+    Raises:
+        ValueError: If neither audio_file nor audio_url is provided
+    """
+    source, _, header = await receive_audio_file(audio_file, audio_url)
+    return await prepare_audio_file(source, header)
+
+
+async def receive_audio_file(
+    audio_file: Optional[UploadFile] = None,
+    audio_url: Optional[str] = None,
+) -> Tuple[AudioSource, str, Optional[Dict[str, Any]]]:
+    """
+    Receive an uploaded or downloaded audio file.
+    
+    Uploads are bounded by MAX_UPLOAD_SIZE and kept in memory, since ffmpeg
+    can read them from stdin, unless their container needs a seekable input
+    (see is_pipe_readable); those are written to the temp directory like
+    downloads. Downloads have unknown size and are streamed to the temp
+    directory. The content digest, byte count and WAV header are
+    all taken in the same pass, so neither the cache key nor the duration
+    check has to read the audio again.
+    
+    Args:
+        audio_file: Uploaded audio file
+        audio_url: URL to audio file
+        
+    Returns:
+        Tuple: Original audio (bytes or path), its content digest, and WAV
+        header metadata (None for other formats)
+        
     Raises:
         ValueError: If neither audio_file nor audio_url is provided
     """
     if not audio_file and not audio_url:
         raise ValueError("Either audio_file or audio_url must be provided")
     
-    # Generate unique filename
-    temp_id = str(uuid.uuid4())
+    digest = hashlib.blake2b(digest_size=16)
+    head = bytearray()
+    total = 0
     
-    # Save the original file
     if audio_file:
         # Get file extension
         file_ext = Path(audio_file.filename).suffix.lower()
         if file_ext not in ALLOWED_AUDIO_FORMATS:
-            raise ValueError(f"Unsupported audio format: {file_ext}. Supported formats: {', '.join(ALLOWED_AUDIO_FORMATS)}")
+            raise ValueError(f"Unsupported audio format: {file_ext}. Supported formats: {', '.join(sorted(ALLOWED_AUDIO_FORMATS))}")
+        
+        # Read upload into memory
+        data = bytearray()
+        while chunk := await audio_file.read(UPLOAD_CHUNK_SIZE):
+            if len(data) + len(chunk) > MAX_UPLOAD_SIZE:
+                raise ValueError(f"Uploaded file exceeds the {MAX_UPLOAD_SIZE // (1024 * 1024)}MB limit")
+            digest.update(chunk)
+            data += chunk
+        
+        logger.info(f"Received {len(data)} bytes of {file_ext} audio")
+        header = parse_wav_header(data, len(data))
+        if is_pipe_readable(data):
+            return bytes(data), digest.hexdigest(), header
+        
+        # MP4/M4A (whose index may follow the audio) and unrecognised data need a seekable file
+        orig_path = TEMP_DIR / f"original_{uuid.uuid4()}{file_ext}"
+        async with aiofiles.open(orig_path, "wb") as f:
+            await f.write(data)
+        logger.info(f"Saved {file_ext} upload to {orig_path}, its container can't be read from a pipe")
+        return orig_path, digest.hexdigest(), header
+    
+    # Download from URL
+    session = get_http_session()
+    async with session.get(audio_url, timeout=DOWNLOAD_TIMEOUT) as response:
+        if response.status != 200:
+            raise ValueError(f"Failed to download audio from URL: {response.status}")
+        
+        # Determine file extension from content-type or URL
+        content_type = response.headers.get("Content-Type", "")
+        file_ext = get_url_audio_extension(audio_url, content_type)
+        if file_ext is None:
+            raise ValueError(f"Unsupported audio format from URL: {content_type}")
         
-        # Save uploaded file
-        orig_path = TEMP_DIR / f"original_{temp_id}{file_ext}"
+        orig_path = TEMP_DIR / f"original_{uuid.uuid4()}{file_ext}"
         async with aiofiles.open(orig_path, "wb") as f:
-            content = await audio_file.read()
-            await f.write(content)
-    else:
-        # Download from URL
-        async with aiohttp.ClientSession() as session:
-            async with session.get(audio_url) as response:
-                if response.status != 200:
-                    raise ValueError(f"Failed to download audio from URL: {response.status}")
-                
-                # Determine file extension from content-type or URL
-                content_type = response.headers.get("Content-Type", "")
-                if "audio/wav" in content_type or audio_url.endswith(".wav"):
-                    file_ext = ".wav"
-                elif "audio/mp3" in content_type or audio_url.endswith(".mp3"):
-                    file_ext = ".mp3"
-                elif "audio/m4a" in content_type or audio_url.endswith(".m4a"):
-                    file_ext = ".m4a"
-                elif "audio/ogg" in content_type or audio_url.endswith(".ogg"):
-                    file_ext = ".ogg"
-                elif "audio/flac" in content_type or audio_url.endswith(".flac"):
-                    file_ext = ".flac"
-                else:
-                    raise ValueError(f"Unsupported audio format from URL: {content_type}")
-                
-                orig_path = TEMP_DIR / f"original_{temp_id}{file_ext}"
-                async with aiofiles.open(orig_path, "wb") as f:
-                    await f.write(await response.read())
-    
-    logger.info(f"Saved original audio to {orig_path}")
+            async for chunk in response.content.iter_chunked(UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+                total += len(chunk)
+                if len(head) < WAV_HEADER_SNIFF_SIZE:
+                    head += chunk[:WAV_HEADER_SNIFF_SIZE - len(head)]
+                await f.write(chunk)
+    
+    logger.info(f"Saved {total} bytes of original audio to {orig_path}")
+    return orig_path, digest.hexdigest(), parse_wav_header(head, total)
+
+
+def is_pipe_readable(head: Union[bytes, bytearray]) -> bool:
+    """
+    Check whether ffmpeg can demux audio from a non-seekable pipe.
+    
+    WAV, MP3, Ogg and FLAC are read front to back. MP4/M4A may keep its
+    index (the moov atom) at the end of the file, so it and anything not
+    recognised here are given to ffmpeg as a file.
+    
+    Args:
+        head: Leading bytes of the file
+        
+    Returns:
+        bool: True if the data can be fed to ffmpeg via stdin
+    """
+    if head[:4] in (b"RIFF", b"RF64") and head[8:12] == b"WAVE":
+        return True
+    if head[:4] in (b"OggS", b"fLaC") or head[:3] == b"ID3":
+        return True
+    # Bare MPEG audio frame sync
+    return len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0
+
+
+def parse_wav_header(head: Union[bytes, bytearray, mmap.mmap], total_size: int) -> Optional[Dict[str, Any]]:
+    """
+    Parse a RIFF/WAVE header from the leading bytes of a file.
+    
+    Only uncompressed PCM/float WAV is recognised; anything else returns
+    None and is probed later.
+    
+    Args:
+        head: Leading bytes of the file
+        total_size: Total file size in bytes
+        
+    Returns:
+        Optional[Dict[str, Any]]: Sample rate, channels, bits per sample, duration and
+        the data chunk's byte offset and size, or None
+    """
+    view = memoryview(head)[:WAV_HEADER_SNIFF_SIZE]
+    if len(view) < 12 or view[:4] != b"RIFF" or view[8:12] != b"WAVE":
+        return None
+    
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(view):
+        chunk_id = bytes(view[offset:offset + 4])
+        (chunk_size,) = struct.unpack_from("<I", view, offset + 4)
+        body = offset + 8
+        
+        if chunk_id == b"fmt " and body + 16 <= len(view):
+            fmt = struct.unpack_from("<HHIIHH", view, body)
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            audio_format, channels, sample_rate, _, block_align, bits_per_sample = fmt
+            # 1 = PCM, 3 = IEEE float, 0xFFFE = WAVE_FORMAT_EXTENSIBLE
+            if audio_format not in (1, 3, 0xFFFE) or not sample_rate or not block_align:
+                return None
+            # Streamed WAV writers leave the data size as 0 or 0xFFFFFFFF
+            available = total_size - body
+            data_size = chunk_size if 0 < chunk_size <= available else available
+            return {
+                "sample_rate": sample_rate,
+                "channels": channels,
+                "bits_per_sample": bits_per_sample,
+                "duration": data_size // block_align / sample_rate,
+                "data_offset": body,
+                "data_size": data_size,
+            }
+        
+        # Chunks are word aligned
+        offset = body + chunk_size + (chunk_size & 1)
+    
+    return None
+
+
+def get_url_audio_extension(audio_url: str, content_type: str) -> Optional[str]:
+    """
+    Resolve the audio file extension for a downloaded file.
+    
+    Args:
+        audio_url: URL the audio was downloaded from
+        content_type: Content-Type header of the response
+        
+    Returns:
+        Optional[str]: File extension (with dot) or None if unsupported
+    """
+    file_ext = CONTENT_TYPE_EXTENSIONS.get(content_type.split(";", 1)[0].strip().lower())
+    if file_ext:
+        return file_ext
+    
+    # Fall back to the extension in the URL path (ignoring any query string)
+    file_ext = Path(urlparse(audio_url).path).suffix.lower()
+    return file_ext if file_ext in ALLOWED_AUDIO_FORMATS else None
+
+
+async def prepare_audio_file(source: AudioSource, header: Optional[Dict[str, Any]] = None) -> Path:
+    """
+    Validate and normalize received audio.
     
+    Args:
+        source: Original audio as returned by receive_audio_file
+        header: WAV header metadata from receive_audio_file, if any
+        
+    Returns:
+        Path: Path to the processed audio file
+        
+    Raises:
+        ValueError: If the audio duration is out of range
+    """
     # Normalize and convert the audio
-    processed_path = TEMP_DIR / f"processed_{temp_id}.wav"
+    processed_path = TEMP_DIR / f"processed_{uuid.uuid4()}.wav"
     
     try:
+        # Validate duration from the original header before transcoding,
+        # so out-of-range inputs never pay for the ffmpeg conversion
+        if header is not None:
+            duration = header["duration"]
+        else:
+            duration = await asyncio.to_thread(probe_duration, source)
+        if duration is not None:
+            validate_duration(duration)
+        
         # Convert to WAV with proper settings
-        await normalize_audio(orig_path, processed_path)
+        await normalize_audio(source, processed_path)
         
-        # Get audio metadata
-        duration, _ = get_audio_metadata(processed_path)
+        # The downloaded original is no longer needed once converted
+        if isinstance(source, Path):
+            source.unlink(missing_ok=True)
         
-        # Validate duration
-        if duration < 2 or duration > 20:
-            raise ValueError(f"Audio duration must be between 2 and 20 seconds. Got: {duration:.2f} seconds")
+        # Formats whose header couldn't be read in memory are checked after conversion
+        if duration is None:
+            duration, _ = await asyncio.to_thread(get_audio_metadata, processed_path)
+            validate_duration(duration)
         
         logger.info(f"Processed audio saved to {processed_path}")
         return processed_path
@@ -113,65 +327,292 @@ async def process_audio_file(
     except Exception as e:
         logger.error(f"Error processing audio file: {str(e)}")
         # Clean up files
-        if orig_path.exists():
-            orig_path.unlink()
+        if isinstance(source, Path) and source.exists():
+            source.unlink()
         if processed_path.exists():
             processed_path.unlink()
         raise
 
 
-async def normalize_audio(input_path: Path, output_path: Path) -> None:
+def save_pcm_audio(pcm: bytes) -> Path:
+    """
+    Save raw 16-bit mono PCM at the target sample rate as a processed WAV file.
+    
+    Streamed audio already has the target format, so ffmpeg isn't needed.
+    
+    Args:
+        pcm: 16-bit little-endian mono PCM bytes
+        
+    Returns:
+        Path: Path to the processed audio file
+    """
+    processed_path = TEMP_DIR / f"processed_{uuid.uuid4()}.wav"
+    with wave.open(str(processed_path), "wb") as wav_file:
+        wav_file.setnchannels(TARGET_CHANNELS)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(TARGET_SAMPLE_RATE)
+        wav_file.writeframes(pcm)
+    return processed_path
+
+
+def probe_duration(source: AudioSource) -> Optional[float]:
+    """
+    Read the duration of original audio from its header.
+    
+    Args:
+        source: Original audio (bytes or path)
+        
+    Returns:
+        Optional[float]: Duration in seconds, or None if it can't be read without decoding
+    """
+    if isinstance(source, Path):
+        duration, _ = get_audio_metadata(source)
+        return duration
+    
+    try:
+        info = sf.info(io.BytesIO(source))
+        return info.frames / info.samplerate
+    except RuntimeError:
+        return None
+
+
+def validate_duration(duration: float) -> None:
+    """
+    Check that the audio duration is within the accepted range.
+    
+    Args:
+        duration: Duration in seconds
+        
+    Raises:
+        ValueError: If the duration is out of range
+    """
+    if duration < MIN_AUDIO_DURATION or duration > MAX_AUDIO_DURATION:
+        raise ValueError(
+            f"Audio duration must be between {MIN_AUDIO_DURATION} and {MAX_AUDIO_DURATION} seconds. "
+            f"Got: {duration:.2f} seconds"
+        )
+
+
+def cleanup_temp_files(max_age: float = TEMP_FILE_MAX_AGE) -> int:
+    """
+    Delete temp audio files older than max_age.
+    
+    Processed files are normally removed by a background task once the
+    response is sent; this catches files left behind by failed requests.
+    
+    Args:
+        max_age: Maximum file age in seconds
+        
+    Returns:
+        int: Number of files removed
+    """
+    cutoff = time.time() - max_age
+    removed = 0
+    with os.scandir(TEMP_DIR) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    
+    if removed:
+        logger.info(f"Removed {removed} stale temp audio files")
+    return removed
+
+
+async def run_temp_janitor(interval: float = TEMP_CLEANUP_INTERVAL) -> None:
+    """
+    Periodically remove stale temp audio files until cancelled.
+    
+    Args:
+        interval: Seconds between cleanup passes
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(cleanup_temp_files)
+        except Exception as e:
+            logger.error(f"Temp file cleanup failed: {str(e)}")
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Get the shared HTTP session used for audio downloads.
+    
+    Reusing one session keeps connections (and TLS sessions) to storage
+    hosts alive across requests.
+    
+    Returns:
+        aiohttp.ClientSession: Shared client session
+    """
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=20,
+            ttl_dns_cache=300,
+            keepalive_timeout=60,
+        )
+        _http_session = aiohttp.ClientSession(connector=connector)
+    return _http_session
+
+
+async def close_http_session() -> None:
+    """Close the shared HTTP session if it was created."""
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
+
+async def normalize_audio(input_source: AudioSource, output_path: Path) -> None:
     """
     Normalize audio to standard format for processing.
     
     Args:
-        input_path: Path to input audio file
+        input_source: Path to input audio file, or its raw bytes (fed to ffmpeg via stdin)
         output_path: Path to save normalized audio
         
     Raises:
-        RuntimeError: If audio processing fails
+        RuntimeError: If audio processing fails or takes longer than FFMPEG_TIMEOUT
     """
-    try:
-        # Use ffmpeg to normalize audio
-        (
-            ffmpeg
-            .input(str(input_path))
-            .output(
-                str(output_path),
-                acodec='pcm_s16le',  # 16-bit PCM
-                ar=TARGET_SAMPLE_RATE,  # Sample rate
-                ac=TARGET_CHANNELS,  # Mono
-                loglevel='error'
-            )
-            .run(capture_stdout=True, capture_stderr=True)
+    from_stdin = not isinstance(input_source, Path)
+    
+    # Use ffmpeg to normalize audio
+    args = [
+        *_FFMPEG_INPUT_ARGS,
+        "pipe:" if from_stdin else os.fspath(input_source),
+        *_FFMPEG_OUTPUT_ARGS,
+        os.fspath(output_path),
+    ]
+    
+    # Run ffmpeg as a subprocess so the event loop stays free while it transcodes
+    async with _ffmpeg_semaphore:
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=asyncio.subprocess.PIPE if from_stdin else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
         )
-    except ffmpeg.Error as e:
-        logger.error(f"FFmpeg error: {e.stderr.decode() if e.stderr else str(e)}")
-        raise RuntimeError(f"Failed to process audio: {e.stderr.decode() if e.stderr else str(e)}")
+        try:
+            _, stderr = await asyncio.wait_for(
+                process.communicate(input_source if from_stdin else None),
+                timeout=FFMPEG_TIMEOUT,
+            )
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # Don't leave ffmpeg running (and holding its slot) for a request that is gone
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+            if isinstance(e, asyncio.TimeoutError):
+                logger.error(f"FFmpeg timed out after {FFMPEG_TIMEOUT:.0f} seconds")
+                raise RuntimeError(f"Failed to process audio: ffmpeg timed out after {FFMPEG_TIMEOUT:.0f} seconds") from e
+            raise
+    
+    if process.returncode != 0:
+        error = stderr.decode(errors="replace").strip() or f"ffmpeg exited with code {process.returncode}"
+        logger.error(f"FFmpeg error: {error}")
+        raise RuntimeError(f"Failed to process audio: {error}")
 
 
-def get_audio_metadata(audio_path: Path) -> Tuple[float, Dict[str, Any]]:
+def get_audio_metadata(
+    audio_path: Path,
+    stat_result: Optional[os.stat_result] = None,
+) -> Tuple[float, Dict[str, Any]]:
     """
     Get metadata from an audio file.
     
+    Only the container header is read (via soundfile), falling back to ffprobe
+    for formats libsndfile cannot parse, so the audio is never decoded.
+    Results are cached by path, inode, mtime and size, so the several stages
+    that look at the same file only parse its header once, and a file replaced
+    under the same name is parsed again.
+    
     Args:
         audio_path: Path to audio file
+        stat_result: Result of audio_path.stat(), if the caller already has it
         
     Returns:
         Tuple[float, Dict[str, Any]]: Duration and metadata dictionary
     """
-    # Load audio file
-    y, sr = librosa.load(audio_path, sr=None)
-    
-    # Calculate duration
-    duration = librosa.get_duration(y=y, sr=sr)
+    if stat_result is None:
+        stat_result = audio_path.stat()
+    return _read_audio_metadata(
+        str(audio_path), stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size
+    )
+
+
+@lru_cache(maxsize=METADATA_CACHE_SIZE)
+def _read_audio_metadata(path: str, inode: int, mtime_ns: int, size: int) -> Tuple[float, Dict[str, Any]]:
+    audio_path = Path(path)
+    try:
+        info = sf.info(str(audio_path))
+        duration = info.frames / info.samplerate
+        sample_rate = info.samplerate
+        channels = info.channels
+    except RuntimeError:
+        # libsndfile can't parse the header (e.g. MP3/M4A) - ask ffprobe instead
+        probe = ffmpeg.probe(str(audio_path))
+        stream = next(s for s in probe["streams"] if s.get("codec_type") == "audio")
+        duration = float(probe["format"].get("duration") or stream.get("duration", 0.0))
+        sample_rate = int(stream.get("sample_rate", 0))
+        channels = int(stream.get("channels", 1))
     
-    # Get other metadata
     metadata = {
-        "sample_rate": sr,
-        "channels": 1 if y.ndim == 1 else y.shape[0],
+        "sample_rate": sample_rate,
+        "channels": channels,
         "duration": duration,
         "format": audio_path.suffix[1:],  # Remove dot from extension
     }
     
     return duration, metadata
+
+
+def load_audio_samples(
+    audio_path: Path,
+    stat_result: Optional[os.stat_result] = None,
+) -> np.ndarray:
+    """
+    Decode an audio file to 16kHz mono float32 samples.
+    
+    Speaker verification and local transcription both need the samples of
+    the same processed file, so the decoded clip is cached by path, inode,
+    mtime and size (like get_audio_metadata) and decoded only once. Files
+    that are already 16kHz mono are read directly; anything else is
+    resampled by ffmpeg.
+    
+    The returned array is shared between callers and must not be modified.
+    
+    Args:
+        audio_path: Path to audio file
+        stat_result: Result of audio_path.stat(), if the caller already has it
+        
+    Returns:
+        np.ndarray: Samples in [-1, 1] at TARGET_SAMPLE_RATE
+    """
+    if stat_result is None:
+        stat_result = audio_path.stat()
+    return _read_audio_samples(
+        str(audio_path), stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size
+    )
+
+
+@lru_cache(maxsize=SAMPLES_CACHE_SIZE)
+def _read_audio_samples(path: str, inode: int, mtime_ns: int, size: int) -> np.ndarray:
+    try:
+        samples, sample_rate = sf.read(path, dtype="float32")
+        if sample_rate == TARGET_SAMPLE_RATE and samples.ndim == 1:
+            return samples
+    except RuntimeError:
+        pass  # Not a format libsndfile reads
+    
+    pcm, _ = (
+        ffmpeg.input(path)
+        .output("-", format="s16le", acodec="pcm_s16le", ac=TARGET_CHANNELS, ar=TARGET_SAMPLE_RATE)
+        .run(cmd=["ffmpeg", "-nostdin"], capture_stdout=True, capture_stderr=True)
+    )
+    return np.frombuffer(pcm, np.int16).astype(np.float32) / 32768.0
@@ -0,0 +1,102 @@
+"""
+Voice activity detection for streamed PCM audio.
+"""
+import logging
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+    logger.warning("webrtcvad not available. Streamed audio will not be silence-gated.")
+
+SAMPLE_WIDTH = 2  # 16-bit PCM
+
+
+class UtteranceSegmenter:
+    """
+    Split a stream of 16-bit mono PCM into utterances using WebRTC VAD.
+
+    Silence before speech is dropped. An utterance ends after `silence_ms` of
+    silence or when it reaches `max_duration` seconds.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        frame_ms: int = 20,
+        aggressiveness: int = 2,
+        silence_ms: int = 300,
+        min_duration: float = 0.5,
+        max_duration: float = 20.0,
+    ):
+        self.sample_rate = sample_rate
+        self.frame_bytes = sample_rate * frame_ms // 1000 * SAMPLE_WIDTH
+        self.silence_frames = max(1, silence_ms // frame_ms)
+        self.min_bytes = int(min_duration * sample_rate) * SAMPLE_WIDTH
+        self.max_bytes = int(max_duration * sample_rate) * SAMPLE_WIDTH
+        self.vad = webrtcvad.Vad(aggressiveness) if webrtcvad else None
+        self._pending = bytearray()
+        self._utterance = bytearray()
+        self._silent_run = 0
+
+    def push(self, pcm: bytes) -> List[bytes]:
+        """
+        Add PCM data to the stream.
+
+        Args:
+            pcm: 16-bit little-endian mono PCM bytes (any length)
+
+        Returns:
+            List[bytes]: Utterances completed by this chunk
+        """
+        self._pending += pcm
+        completed = []
+
+        # Frames are views into the pending buffer; only the utterance buffer copies them
+        offset = 0
+        with memoryview(self._pending) as pending:
+            while len(pending) - offset >= self.frame_bytes:
+                utterance = self._push_frame(pending[offset:offset + self.frame_bytes])
+                offset += self.frame_bytes
+                if utterance is not None:
+                    completed.append(utterance)
+
+        del self._pending[:offset]
+        return completed
+
+    def flush(self) -> Optional[bytes]:
+        """
+        End the stream and return the utterance in progress, if any.
+
+        Returns:
+            Optional[bytes]: Final utterance or None
+        """
+        self._utterance += self._pending
+        self._pending.clear()
+        return self._finish_utterance()
+
+    def _push_frame(self, frame: memoryview) -> Optional[bytes]:
+        is_speech = self.vad.is_speech(frame, self.sample_rate) if self.vad else True
+
+        if not self._utterance and not is_speech:
+            # Still waiting for speech to start
+            return None
+
+        self._utterance += frame
+        self._silent_run = 0 if is_speech else self._silent_run + 1
+
+        if self._silent_run >= self.silence_frames or len(self._utterance) >= self.max_bytes:
+            return self._finish_utterance()
+        return None
+
+    def _finish_utterance(self) -> Optional[bytes]:
+        utterance = bytes(self._utterance)
+        self._utterance.clear()
+        self._silent_run = 0
+
+        if len(utterance) < self.min_bytes:
+            return None
+        return utterance
@@ -0,0 +1,405 @@
+"""
+In-process result caches for the hybrid STT pipeline.
+
+Identical uploads (client retries, test traffic) are served from memory
+instead of being normalized and transcribed again. Behind that, results
+are also cached by a fingerprint of the decoded PCM, and local transcripts
+that were already confirmed by semantic validation are remembered so that
+near-identical ones don't need another remote comparison.
+"""
+import os
+import mmap
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple, Hashable
+import numpy as np
+import orjson
+from cachetools import TTLCache
+from app.utils.config import load_config
+from app.audio.processor import parse_wav_header
+
+logger = logging.getLogger(__name__)
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+# Load configuration
+config = load_config()
+hybrid_config = config.get("hybrid_stt", {})
+
+CACHE_MAX_SIZE = int(hybrid_config.get("cache_size", 1024))
+CACHE_TTL = float(hybrid_config.get("cache_ttl", 3600))  # Seconds
+OPENAI_CACHE_SIZE = int(hybrid_config.get("openai_cache_size", 2048))
+SEMANTIC_CACHE_SIZE = int(hybrid_config.get("semantic_cache_size", 512))
+SEMANTIC_CACHE_THRESHOLD = float(hybrid_config.get("semantic_cache_threshold", 0.87))
+SEMANTIC_CACHE_PATH = hybrid_config.get("semantic_cache_path")  # .npz file, None disables persistence
+SEMANTIC_INDEX_MIN_SIZE = int(hybrid_config.get("semantic_index_min_size", 4096))  # Use HNSW from this cache size
+FINGERPRINT_STRIDE = 4  # Hash every Nth PCM sample
+HNSW_NEIGHBORS = 32
+HNSW_EF_SEARCH = 64
+HNSW_CANDIDATES = 8  # Neighbours fetched per lookup, so evicted vectors can be skipped
+
+# Sources that represent a failed run and must never be served again
+UNCACHEABLE_SOURCES = frozenset({"error", "failed", "verification_error"})
+
+transcription_cache: TTLCache = TTLCache(maxsize=CACHE_MAX_SIZE, ttl=CACHE_TTL)
+fingerprint_cache: "OrderedDict[Tuple[Hashable, ...], Dict[str, Any]]" = OrderedDict()
+# OpenAI transcripts by PCM fingerprint and request options, and the calls still in flight
+openai_transcript_cache: TTLCache = TTLCache(maxsize=max(1, OPENAI_CACHE_SIZE), ttl=CACHE_TTL)
+_openai_in_flight: Dict[Tuple[Hashable, ...], "asyncio.Future"] = {}
+
+
+def make_cache_key(digest: str, **options: Any) -> Tuple[Hashable, ...]:
+    """
+    Build a cache key from the audio content digest and request options.
+
+    Args:
+        digest: Content digest of the uploaded audio
+        **options: Request options that influence the result
+
+    Returns:
+        Tuple: Hashable cache key
+    """
+    return (digest, *sorted(options.items()))
+
+
+def get_cached_result(key: Tuple[Hashable, ...]) -> Optional[Dict[str, Any]]:
+    """
+    Look up a cached transcription result.
+
+    Args:
+        key: Cache key from make_cache_key
+
+    Returns:
+        Optional[Dict[str, Any]]: Cached result or None on a miss
+    """
+    if CACHE_MAX_SIZE <= 0:
+        return None
+    return transcription_cache.get(key)
+
+
+def cache_result(key: Tuple[Hashable, ...], result: Dict[str, Any]) -> None:
+    """
+    Store a transcription result unless it represents a failure.
+
+    Args:
+        key: Cache key from make_cache_key
+        result: Result returned by process_audio_hybrid
+    """
+    if CACHE_MAX_SIZE <= 0 or result.get("source") in UNCACHEABLE_SOURCES:
+        return
+    transcription_cache[key] = result
+
+
+def audio_fingerprint(audio_path: Path) -> Optional[str]:
+    """
+    Fingerprint the decoded PCM of a processed WAV file.
+    
+    Unlike the upload digest, this matches the same audio delivered in a
+    different container or downloaded from a different URL.
+    
+    Args:
+        audio_path: Path to the processed (16-bit PCM) audio file
+        
+    Returns:
+        Optional[str]: Hex fingerprint, or None if the file isn't readable PCM WAV
+    """
+    try:
+        # Samples are hashed straight from the page cache; only every Nth one is copied
+        with open(audio_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            header = parse_wav_header(mapped, len(mapped))
+            if header is None or header["bits_per_sample"] != 16:
+                return None
+            samples = np.frombuffer(
+                mapped, dtype=np.int16, count=header["data_size"] // 2, offset=header["data_offset"]
+            )
+            fingerprint = hashlib.blake2b(samples[::FINGERPRINT_STRIDE].tobytes(), digest_size=16).hexdigest()
+            del samples  # The mapping can't be closed while an array still views it
+    except (OSError, ValueError):
+        # ValueError: empty files can't be mapped
+        return None
+    
+    return fingerprint
+
+
+def _copy_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a result and its nested dicts; the leaves are immutable, so this is a full copy."""
+    return {key: _copy_result(value) if isinstance(value, dict) else value for key, value in result.items()}
+
+
+def get_fingerprint_result(key: Tuple[Hashable, ...]) -> Optional[Dict[str, Any]]:
+    """
+    Look up a result cached by PCM fingerprint.
+    
+    Args:
+        key: Cache key from make_cache_key
+        
+    Returns:
+        Optional[Dict[str, Any]]: Copy of the cached result or None on a miss
+    """
+    result = fingerprint_cache.get(key)
+    if result is None:
+        return None
+    fingerprint_cache.move_to_end(key)
+    # Callers update the result in place
+    return _copy_result(result)
+
+
+def cache_fingerprint_result(key: Tuple[Hashable, ...], result: Dict[str, Any]) -> None:
+    """
+    Store a result by PCM fingerprint, evicting the least recently used entry.
+    
+    Args:
+        key: Cache key from make_cache_key
+        result: Result returned by process_audio_hybrid
+    """
+    if SEMANTIC_CACHE_SIZE <= 0 or result.get("source") in UNCACHEABLE_SOURCES:
+        return
+    fingerprint_cache[key] = _copy_result(result)
+    fingerprint_cache.move_to_end(key)
+    while len(fingerprint_cache) > SEMANTIC_CACHE_SIZE:
+        fingerprint_cache.popitem(last=False)
+
+
+class SemanticCache:
+    """
+    LRU cache of unit-length transcript embeddings.
+    
+    Embeddings are kept in one matrix so a lookup is a single
+    matrix-vector product. Large caches are searched through a FAISS HNSW
+    index instead of scanning the whole matrix, when faiss is installed.
+    """
+    
+    def __init__(self, max_size: int = 512, threshold: float = 0.87, use_index: Optional[bool] = None):
+        self.max_size = max_size
+        self.threshold = threshold
+        if use_index is None:
+            use_index = max_size >= SEMANTIC_INDEX_MIN_SIZE
+        self.use_index = use_index and faiss is not None
+        self._embeddings: Optional[np.ndarray] = None
+        self._entries: "OrderedDict[str, Tuple[int, Dict[str, Any]]]" = OrderedDict()
+        self._row_texts: List[str] = []
+        # HNSW can't delete vectors: replaced ones stay in the index, mapped to None
+        self._index = None
+        self._index_texts: List[Optional[str]] = []
+        self._index_ids: Dict[str, int] = {}
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def lookup(self, embedding: np.ndarray) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """
+        Find the most similar cached entry.
+        
+        Args:
+            embedding: Unit-length query embedding
+            
+        Returns:
+            Optional[Tuple[float, Dict]]: Similarity and entry value, or None below the threshold
+        """
+        if not self._entries:
+            return None
+        
+        if self._index is not None:
+            match = self._search_index(embedding)
+            if match is None:
+                return None
+            similarity, text = match
+        else:
+            similarities = self._embeddings[:len(self._entries)] @ embedding.astype(np.float32, copy=False)
+            row = int(np.argmax(similarities))
+            similarity = float(similarities[row])
+            text = self._row_texts[row]
+        
+        if similarity < self.threshold:
+            return None
+        
+        self._entries.move_to_end(text)
+        return similarity, self._entries[text][1]
+    
+    def add(self, text: str, embedding: np.ndarray, value: Dict[str, Any]) -> None:
+        """
+        Add or refresh an entry, evicting the least recently used one when full.
+        
+        Args:
+            text: Transcript the embedding was computed from
+            embedding: Unit-length embedding of the transcript
+            value: Data returned on a hit
+        """
+        if self.max_size <= 0:
+            return
+        
+        embedding = embedding.astype(np.float32, copy=False)
+        if self._embeddings is None:
+            self._embeddings = np.zeros((self.max_size, embedding.shape[0]), dtype=np.float32)
+        
+        if text in self._entries:
+            row = self._entries[text][0]
+        elif len(self._entries) < self.max_size:
+            row = len(self._entries)
+            self._row_texts.append(text)
+        else:
+            evicted, (row, _) = self._entries.popitem(last=False)
+            self._drop_from_index(evicted)
+        
+        self._embeddings[row] = embedding
+        self._row_texts[row] = text
+        self._entries[text] = (row, value)
+        self._entries.move_to_end(text)
+        
+        if self.use_index:
+            self._drop_from_index(text)
+            self._add_to_index(text, embedding)
+    
+    def clear(self) -> None:
+        """Drop all entries."""
+        self._entries.clear()
+        self._row_texts.clear()
+        self._embeddings = None
+        self._index = None
+        self._index_texts.clear()
+        self._index_ids.clear()
+    
+    def _add_to_index(self, text: str, embedding: np.ndarray) -> None:
+        if self._index is None:
+            self._index = faiss.IndexHNSWFlat(embedding.shape[0], HNSW_NEIGHBORS, faiss.METRIC_INNER_PRODUCT)
+            self._index.hnsw.efSearch = HNSW_EF_SEARCH
+        self._index_ids[text] = len(self._index_texts)
+        self._index_texts.append(text)
+        self._index.add(embedding.reshape(1, -1))
+    
+    def _drop_from_index(self, text: str) -> None:
+        index_id = self._index_ids.pop(text, None)
+        if index_id is None:
+            return
+        self._index_texts[index_id] = None
+        
+        # Rebuild once replaced vectors outnumber live ones
+        if len(self._index_texts) > 2 * len(self._entries) + HNSW_CANDIDATES:
+            self._index = None
+            self._index_texts.clear()
+            self._index_ids.clear()
+            for live_text, (row, _) in self._entries.items():
+                if live_text != text:
+                    self._add_to_index(live_text, self._embeddings[row])
+    
+    def _search_index(self, embedding: np.ndarray) -> Optional[Tuple[float, str]]:
+        query = embedding.astype(np.float32, copy=False).reshape(1, -1)
+        scores, ids = self._index.search(query, min(HNSW_CANDIDATES, len(self._index_texts)))
+        # Results are ordered best first; the first live one is the nearest entry
+        for score, index_id in zip(scores[0], ids[0]):
+            if index_id >= 0 and self._index_texts[index_id] is not None:
+                return float(score), self._index_texts[index_id]
+        return None
+    
+    def save(self, path: Path) -> None:
+        """
+        Persist the cache to an .npz file.
+        
+        Texts are stored as a string array and values as JSON, so the
+        file can be loaded without unpickling anything.
+        
+        Args:
+            path: Destination file
+        """
+        texts = list(self._entries)
+        rows = [self._entries[text][0] for text in texts]
+        values = [self._entries[text][1] for text in texts]
+        embeddings = self._embeddings[rows] if rows else np.zeros((0, 0), dtype=np.float32)
+        # Written under a per-process name and renamed into place, so workers
+        # saving on shutdown at the same time never leave a torn file
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                embeddings=embeddings,
+                texts=np.array(texts, dtype=np.str_),
+                values=np.frombuffer(orjson.dumps(values, option=orjson.OPT_SERIALIZE_NUMPY), dtype=np.uint8),
+            )
+        os.replace(tmp_path, path)
+        logger.info(f"Saved {len(texts)} semantic cache entries to {path}")
+    
+    def load(self, path: Path) -> None:
+        """
+        Load entries saved by save(), oldest first.
+        
+        Args:
+            path: Source file
+        """
+        # Files pickled by earlier versions are rejected rather than unpickled
+        data = np.load(path, allow_pickle=False)
+        values = orjson.loads(data["values"].tobytes())
+        for text, embedding, value in zip(data["texts"], data["embeddings"], values):
+            self.add(str(text), embedding, value)
+        logger.info(f"Loaded {len(self)} semantic cache entries from {path}")
+
+
+semantic_cache = SemanticCache(SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD)
+
+
+def load_semantic_cache() -> None:
+    """Restore the semantic cache from SEMANTIC_CACHE_PATH, if configured."""
+    if SEMANTIC_CACHE_PATH and Path(SEMANTIC_CACHE_PATH).exists():
+        try:
+            semantic_cache.load(Path(SEMANTIC_CACHE_PATH))
+        except Exception as e:
+            logger.warning(f"Failed to load semantic cache: {str(e)}")
+
+
+def save_semantic_cache() -> None:
+    """Persist the semantic cache to SEMANTIC_CACHE_PATH, if configured."""
+    if SEMANTIC_CACHE_PATH and len(semantic_cache):
+        try:
+            semantic_cache.save(Path(SEMANTIC_CACHE_PATH))
+        except Exception as e:
+            logger.warning(f"Failed to save semantic cache: {str(e)}")
+
+
+async def cached_openai_transcript(
+    key: Tuple[Hashable, ...],
+    transcribe: Callable[[], Awaitable[Optional[Tuple[str, float, str]]]],
+) -> Optional[Tuple[str, float, str]]:
+    """
+    Return the OpenAI transcript for a key, calling the API at most once for it.
+    
+    Concurrent callers with the same key share one in-flight call, and
+    successful transcripts are cached for CACHE_TTL seconds.
+    
+    Args:
+        key: Cache key from make_cache_key
+        transcribe: Coroutine function that calls OpenAI, returning None on failure
+        
+    Returns:
+        Optional[Tuple[str, float, str]]: Text, confidence and language, or None if OpenAI failed
+    """
+    if OPENAI_CACHE_SIZE <= 0:
+        return await transcribe()
+    
+    cached = openai_transcript_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    in_flight = _openai_in_flight.get(key)
+    if in_flight is None:
+        in_flight = asyncio.ensure_future(transcribe())
+        _openai_in_flight[key] = in_flight
+        in_flight.add_done_callback(lambda _: _openai_in_flight.pop(key, None))
+    
+    # Shielded, so a cancelled caller doesn't cancel the call for everyone else
+    transcript = await asyncio.shield(in_flight)
+    if transcript is not None:
+        openai_transcript_cache[key] = transcript
+    return transcript
+
+
+def clear_transcription_cache() -> None:
+    """Drop all cached results (e.g. after the owner voiceprint changes)."""
+    transcription_cache.clear()
+    fingerprint_cache.clear()
+    openai_transcript_cache.clear()
+    logger.info("Transcription cache cleared")
@@ -2,18 +2,39 @@
 Hybrid Speech-to-Text controller for dynamic switching between OpenAI and local processing.
 """
 import os
+import asyncio
 import logging
+from functools import partial
 from pathlib import Path
-from typing import Dict, Any, Optional
-import torch
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator, TypedDict
 from app.utils.config import load_config
 from app.audio.processor import process_audio_file, get_audio_metadata
-from app.voice_auth.verification import verify_speaker
+from app.voice_auth.verification import verify_speaker, owner_voiceprint_version
+from app.hybrid.cache import (
+    audio_fingerprint,
+    make_cache_key,
+    get_fingerprint_result,
+    cache_fingerprint_result,
+    cached_openai_transcript,
+    semantic_cache
+)
+from app.hybrid.semantic import (
+    get_sentence_transformer,
+    encode_texts,
+    inference_mode,
+    lexical_similarity,
+    semantic_similarity
+)
 from app.transcription.openai_whisper import (
     transcribe_audio_hybrid, 
     transcribe_large_audio,
+    try_transcribe_with_openai,
     get_openai_status,
-    translate_audio
+    translate_audio,
+    stream_with_openai,
+    supports_streaming,
+    openai_breaker,
+    OPENAI_CONFIDENCE
 )
 
 logger = logging.getLogger(__name__)
@@ -31,17 +52,105 @@ MIN_SPEAKER_MATCH = float(hybrid_config.get("min_speaker_match", 0.90))
 USE_SEMANTIC_VALIDATION = hybrid_config.get("use_semantic_validation", False)
 SEMANTIC_MODEL = hybrid_config.get("semantic_model", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
 SEMANTIC_THRESHOLD = float(hybrid_config.get("semantic_threshold", 0.75))
+SEMANTIC_QUANTIZE = hybrid_config.get("semantic_quantize", True)
+PARALLEL_VERIFICATION = hybrid_config.get("parallel_verification", True)
+PRELOAD_SEMANTIC_MODEL = hybrid_config.get("preload_semantic_model", True)
+SEMANTIC_FAST_PATH = hybrid_config.get("semantic_fast_path", True)
+LEXICAL_SAME_THRESHOLD = float(hybrid_config.get("lexical_same_threshold", 0.95))
+LEXICAL_DIFFERENT_THRESHOLD = float(hybrid_config.get("lexical_different_threshold", 0.3))
+
 
-# Initialize sentence transformer if semantic validation is enabled
-sentence_transformer = None
-if USE_SEMANTIC_VALIDATION:
+def warm_up_semantic_model() -> None:
+    """
+    Load the semantic validation model and run one encode, so the first
+    request doesn't pay for model loading and kernel selection.
+    """
+    if not (USE_SEMANTIC_VALIDATION and PRELOAD_SEMANTIC_MODEL):
+        return
+    sentence_transformer = get_sentence_transformer(SEMANTIC_MODEL, SEMANTIC_QUANTIZE)
+    if sentence_transformer is None:
+        return
     try:
-        from sentence_transformers import SentenceTransformer
-        sentence_transformer = SentenceTransformer(SEMANTIC_MODEL)
-        logger.info(f"Sentence transformer model loaded: {SEMANTIC_MODEL}")
+        # Encoded directly so the warm-up text doesn't take a cache slot
+        with inference_mode():
+            sentence_transformer.encode(["warmup"], convert_to_numpy=True, show_progress_bar=False)
+        logger.info("Semantic validation model warmed up")
     except Exception as e:
-        logger.warning(f"Failed to load sentence transformer: {str(e)}")
-        USE_SEMANTIC_VALIDATION = False
+        logger.warning(f"Semantic model warm-up failed: {str(e)}")
+
+
+class HybridMetadata(TypedDict, total=False):
+    """Metadata of a hybrid result (the HybridSTTResponse metadata, plus file size)."""
+    confidence: float
+    speaker_match: Optional[float]
+    duration: float
+    language: str
+    fallback_used: bool
+    semantic_diff: Optional[float]
+    file_size_mb: float
+
+
+class HybridResult(TypedDict, total=False):
+    """Result of process_audio_hybrid, as served by the API and cached."""
+    source: str
+    text: str
+    metadata: HybridMetadata
+    debug: Dict[str, Any]
+
+
+# Metadata every hybrid result starts from
+_RESULT_METADATA: HybridMetadata = {
+    "confidence": 0.0,
+    "speaker_match": None,
+    "duration": 0.0,
+    "language": "unknown",
+    "fallback_used": False,
+    "semantic_diff": None,
+}
+
+
+def _new_result(duration: float, source: str = "unknown", text: str = "", **metadata: Any) -> HybridResult:
+    """Build a result from the metadata template (a flat copy, values are immutable)."""
+    result_metadata = _RESULT_METADATA.copy()
+    result_metadata["duration"] = duration
+    result_metadata.update(metadata)
+    return {"source": source, "text": text, "metadata": result_metadata}
+
+
+def _probe_audio(audio_path: Path) -> Tuple[os.stat_result, Tuple[float, Dict[str, Any]]]:
+    """Stat the file and read its (cached) metadata."""
+    stat_result = audio_path.stat()
+    return stat_result, get_audio_metadata(audio_path, stat_result)
+
+
+async def _transcribe(
+    audio_path: Path,
+    stat_result: os.stat_result,
+    authorized: bool,
+    language: Optional[str],
+    prompt: Optional[str],
+    use_openai_first: bool,
+) -> Tuple[str, float, str, str]:
+    """Transcribe with the method that fits the file size."""
+    if stat_result.st_size / (1024 * 1024) > 25:
+        # Use chunking for large files, reusing the stat result for the size checks
+        return await transcribe_large_audio(audio_path, authorized, language, prompt, stat_result)
+    # Use hybrid transcription
+    return await transcribe_audio_hybrid(audio_path, authorized, language, prompt, use_openai_first)
+
+
+async def _openai_comparison(
+    audio_path: Path,
+    fingerprint: Optional[str],
+    language: Optional[str],
+    prompt: Optional[str],
+) -> Optional[Tuple[str, float, str]]:
+    """Get the OpenAI transcript to validate a local one against, reusing earlier ones for the same audio."""
+    transcribe = partial(try_transcribe_with_openai, audio_path, language, prompt)
+    if fingerprint is None:
+        return await transcribe()
+    key = make_cache_key(fingerprint, language=language, prompt=prompt)
+    return await cached_openai_transcript(key, transcribe)
 
 
 async def process_audio_hybrid(
@@ -52,7 +161,8 @@ async def process_audio_hybrid(
     language: Optional[str] = None,
     prompt: Optional[str] = None,
     return_debug: bool = False,
-) -> Dict[str, Any]:
+    speaker_result: Optional[Tuple[bool, float]] = None,
+) -> HybridResult:
     """
     Process audio using hybrid approach (OpenAI API primary, local fallback).
     
@@ -64,32 +174,58 @@ async def process_audio_hybrid(
         language: Target language code
         prompt: Context prompt for better transcription
         return_debug: Whether to return debug information
+        speaker_result: Verification result the caller already computed, if any
         
     Returns:
         Dict with transcription results and metadata
     """
+    pending_tasks: List[asyncio.Task] = []
     try:
-        # Get audio metadata
-        metadata = get_audio_metadata(audio_path)
-        audio_duration = metadata.get("duration", 0)
-        file_size_mb = audio_path.stat().st_size / (1024 * 1024)
+        # Serve audio that was already processed from the PCM fingerprint cache
+        cache_key = None
+        fingerprint = None
+        if not return_debug:
+            fingerprint = await asyncio.to_thread(audio_fingerprint, audio_path)
+            if fingerprint is not None:
+                cache_key = make_cache_key(
+                    fingerprint,
+                    verify_speaker=verify_speaker_flag,
+                    voiceprint_version=owner_voiceprint_version() if verify_speaker_flag else None,
+                    use_semantics=use_semantics,
+                    semantic_threshold=semantic_threshold,
+                    language=language,
+                    prompt=prompt,
+                )
+                cached = get_fingerprint_result(cache_key)
+                if cached is not None:
+                    logger.info(f"Serving {audio_path.name} from fingerprint cache")
+                    return cached
+        
+        # Verify the speaker while the file is probed (and, below, transcribed)
+        verify_task = None
+        if verify_speaker_flag and speaker_result is None:
+            verify_task = asyncio.create_task(verify_speaker(audio_path))
+            pending_tasks.append(verify_task)
+        stat_result, (audio_duration, metadata) = await asyncio.to_thread(_probe_audio, audio_path)
+        file_size_mb = stat_result.st_size / (1024 * 1024)
         
         logger.info(f"Processing audio: {audio_path.name}, duration: {audio_duration:.2f}s, size: {file_size_mb:.2f}MB")
         
         # Initialize result structure
-        result = {
-            "source": "unknown",
-            "text": "",
-            "metadata": {
-                "confidence": 0.0,
-                "speaker_match": None,
-                "duration": audio_duration,
-                "language": "unknown",
-                "file_size_mb": file_size_mb,
-                "fallback_used": False,
-                "semantic_diff": None
-            }
-        }
+        result = _new_result(audio_duration, file_size_mb=file_size_mb)
+        result_metadata = result["metadata"]
+        
+        use_openai_first = PRIMARY_SERVICE == "openai"
+        
+        # Transcribe speculatively while verification is still running; the text is
+        # dropped if it fails. Debug responses show the unauthorized transcription
+        # instead, so they wait for the verification result.
+        transcribe_task = None
+        if verify_task is not None and PARALLEL_VERIFICATION and not return_debug:
+            transcribe_task = asyncio.create_task(
+                _transcribe(audio_path, stat_result, True, language, prompt, use_openai_first)
+            )
+            pending_tasks.append(transcribe_task)
         
         # Perform speaker verification if requested
         speaker_verified = False
@@ -97,20 +233,22 @@ async def process_audio_hybrid(
         
         if verify_speaker_flag:
             try:
-                speaker_verified, speaker_confidence = await verify_speaker(audio_path)
-                result["metadata"]["speaker_match"] = speaker_confidence
+                if verify_task is not None:
+                    speaker_result = await verify_task
+                speaker_verified, speaker_confidence = speaker_result
+                result_metadata["speaker_match"] = speaker_confidence
                 
                 if not speaker_verified:
                     logger.warning(f"Speaker verification failed: {speaker_confidence:.4f} < {MIN_SPEAKER_MATCH}")
                     if not return_debug:
                         result["text"] = "Speaker verification failed"
-                        result["metadata"]["confidence"] = 0.0
+                        result_metadata["confidence"] = 0.0
                         result["source"] = "verification_failed"
                         return result
                         
             except Exception as e:
                 logger.error(f"Speaker verification error: {str(e)}")
-                result["metadata"]["speaker_match"] = 0.0
+                result_metadata["speaker_match"] = 0.0
                 if not return_debug:
                     result["text"] = "Speaker verification error"
                     result["source"] = "verification_error"
@@ -119,51 +257,66 @@ async def process_audio_hybrid(
         # Determine if user is authorized for detailed transcription
         authorized = not verify_speaker_flag or speaker_verified
         
-        # Choose transcription method based on file size
-        use_openai_first = PRIMARY_SERVICE == "openai"
-        
-        if file_size_mb > 25:
-            # Use chunking for large files
-            text, confidence, detected_language, source = await transcribe_large_audio(
-                audio_path, authorized, language, prompt
-            )
+        if transcribe_task is not None:
+            text, confidence, detected_language, source = await transcribe_task
         else:
-            # Use hybrid transcription
-            text, confidence, detected_language, source = await transcribe_audio_hybrid(
-                audio_path, authorized, language, prompt, use_openai_first
+            text, confidence, detected_language, source = await _transcribe(
+                audio_path, stat_result, authorized, language, prompt, use_openai_first
             )
         
         # Update result
         result["source"] = source
         result["text"] = text
-        result["metadata"]["confidence"] = confidence
-        result["metadata"]["language"] = detected_language
-        result["metadata"]["fallback_used"] = source in ["local", "chunked"]
+        result_metadata.update(
+            confidence=confidence,
+            language=detected_language,
+            fallback_used=source in ("local", "chunked"),
+        )
         
-        # Semantic validation if enabled
-        if use_semantics and sentence_transformer and source == "local" and authorized:
+        # Semantic validation if enabled (the sentence transformer is loaded on first use).
+        # With OpenAI as primary, a local result means OpenAI already failed for this
+        # request, so there is no second opinion to compare against.
+        sentence_transformer = None
+        if use_semantics and USE_SEMANTIC_VALIDATION and source == "local" and authorized and not use_openai_first:
+            # Loading (on first use) must not block the event loop
+            sentence_transformer = await asyncio.to_thread(get_sentence_transformer, SEMANTIC_MODEL, SEMANTIC_QUANTIZE)
+        
+        if sentence_transformer is not None:
             try:
-                # Get OpenAI result for comparison
-                openai_text, openai_conf, openai_lang, _ = await transcribe_audio_hybrid(
-                    audio_path, True, language, prompt, True
-                )
-                
-                # Compare semantic similarity
-                embeddings = sentence_transformer.encode([text, openai_text])
-                similarity = float(torch.cosine_similarity(
-                    torch.tensor(embeddings[0]).unsqueeze(0),
-                    torch.tensor(embeddings[1]).unsqueeze(0)
-                ))
+                # Encoding is CPU/GPU-bound, so it runs in a worker thread
+                local_embedding = (await asyncio.to_thread(encode_texts, sentence_transformer, [text]))[0]
                 
-                result["metadata"]["semantic_diff"] = 1.0 - similarity
-                
-                # Use OpenAI result if semantic difference is too high
-                if similarity < semantic_threshold:
-                    logger.info(f"Semantic validation failed: {similarity:.4f} < {semantic_threshold}, using OpenAI result")
-                    result["text"] = openai_text
-                    result["metadata"]["confidence"] = openai_conf
-                    result["metadata"]["language"] = openai_lang
-                    result["source"] = "openai_semantic"
+                # A near-identical local transcript was already confirmed by OpenAI
+                hit = semantic_cache.lookup(local_embedding)
+                if hit is not None:
+                    similarity, _ = hit
+                    logger.info(f"Semantic cache hit ({similarity:.4f}), skipping OpenAI comparison")
+                    result_metadata["semantic_diff"] = 1.0 - similarity
+                elif (openai_result := await _openai_comparison(audio_path, fingerprint, language, prompt)) is not None:
+                    # Only OpenAI is asked here: a local fallback would transcribe the audio a second time
+                    openai_text, openai_conf, openai_lang = openai_result
+                    
+                    # Clearly identical or clearly different transcripts don't need the encoder
+                    lexical = lexical_similarity(text, openai_text) if SEMANTIC_FAST_PATH else None
+                    if lexical is not None and lexical >= LEXICAL_SAME_THRESHOLD:
+                        similarity = 1.0
+                    elif lexical is not None and lexical < LEXICAL_DIFFERENT_THRESHOLD:
+                        similarity = 0.0
+                    else:
+                        # Compare semantic similarity (the local embedding is reused from the cache)
+                        similarity = await asyncio.to_thread(semantic_similarity, sentence_transformer, text, openai_text)
+                    
+                    result_metadata["semantic_diff"] = 1.0 - similarity
+                    
+                    # Use OpenAI result if semantic difference is too high
+                    if similarity < semantic_threshold:
+                        logger.info(f"Semantic validation failed: {similarity:.4f} < {semantic_threshold}, using OpenAI result")
+                        result["text"] = openai_text
+                        result_metadata["confidence"] = openai_conf
+                        result_metadata["language"] = openai_lang
+                        result["source"] = "openai_semantic"
+                    else:
+                        semantic_cache.add(text, local_embedding, {"openai_text": openai_text, "similarity": similarity})
                     
             except Exception as e:
                 logger.warning(f"Semantic validation error: {str(e)}")
@@ -183,23 +336,88 @@ async def process_audio_hybrid(
                 }
             }
         
+        if cache_key is not None:
+            cache_fingerprint_result(cache_key, result)
+        
         logger.info(f"Transcription completed: source={source}, confidence={confidence:.4f}, length={len(text)}")
         return result
         
     except Exception as e:
         logger.error(f"Error processing audio: {str(e)}")
-        return {
-            "source": "error",
-            "text": f"Processing error: {str(e)}",
-            "metadata": {
-                "confidence": 0.0,
-                "speaker_match": None,
-                "duration": 0,
-                "language": "unknown",
-                "fallback_used": False,
-                "semantic_diff": None
-            }
-        }
+        return _new_result(0, source="error", text=f"Processing error: {str(e)}")
+    
+    finally:
+        # Early returns and errors leave verification or speculative transcription running
+        for task in pending_tasks:
+            task.cancel()
+
+
+async def stream_audio_hybrid(
+    audio_path: Path,
+    verify_speaker_flag: bool = False,
+    language: Optional[str] = None,
+    prompt: Optional[str] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Process audio using hybrid approach, yielding partial transcripts as they arrive.
+    
+    OpenAI deltas are streamed when the configured model supports it. Otherwise
+    (local fallback, open circuit breaker, failed verification) the regular
+    hybrid pipeline runs and only the final event is emitted.
+    
+    Args:
+        audio_path: Path to the audio file
+        verify_speaker_flag: Whether to perform speaker verification
+        language: Target language code
+        prompt: Context prompt for better transcription
+        
+    Yields:
+        Dict events: {"type": "delta", "text": ...} followed by one
+        {"type": "final", "result": ...} carrying the HybridSTTResponse payload
+    """
+    speaker_result = None
+    speaker_confidence = None
+    if verify_speaker_flag:
+        speaker_result = await verify_speaker(audio_path)
+        speaker_verified, speaker_confidence = speaker_result
+        if not speaker_verified:
+            # Let the regular pipeline produce the masked response
+            result = await process_audio_hybrid(
+                audio_path, verify_speaker_flag, language=language, prompt=prompt, speaker_result=speaker_result
+            )
+            yield {"type": "final", "result": result}
+            return
+    
+    if PRIMARY_SERVICE == "openai" and supports_streaming() and openai_breaker.allow_request():
+        parts = []
+        try:
+            async for delta in stream_with_openai(audio_path, language, prompt):
+                parts.append(delta)
+                yield {"type": "delta", "text": delta}
+            openai_breaker.record_success()
+        except Exception as e:
+            openai_breaker.record_failure()
+            logger.warning(f"OpenAI streaming transcription failed: {str(e)}")
+            if parts:
+                # Deltas were already sent, so a fallback transcript can't be spliced in
+                yield {"type": "error", "detail": f"Streaming transcription failed: {str(e)}"}
+                return
+        else:
+            duration, _ = await asyncio.to_thread(get_audio_metadata, audio_path)
+            result = _new_result(duration, source="openai", text="".join(parts).strip())
+            result["metadata"].update(
+                confidence=OPENAI_CONFIDENCE,
+                speaker_match=speaker_confidence,
+                language=language or "auto",
+            )
+            yield {"type": "final", "result": result}
+            return
+    
+    # No streaming available: run the regular pipeline (speaker already verified)
+    result = await process_audio_hybrid(
+        audio_path, verify_speaker_flag, language=language, prompt=prompt, speaker_result=speaker_result
+    )
+    yield {"type": "final", "result": result}
 
 
 async def translate_audio_hybrid(
@@ -222,8 +440,8 @@ async def translate_audio_hybrid(
     """
     try:
         # Get audio metadata
-        metadata = get_audio_metadata(audio_path)
-        file_size_mb = audio_path.stat().st_size / (1024 * 1024)
+        stat_result, (audio_duration, metadata) = await asyncio.to_thread(_probe_audio, audio_path)
+        file_size_mb = stat_result.st_size / (1024 * 1024)
         
         # Translate using OpenAI API
         text, confidence, detected_language = await translate_audio(
@@ -237,7 +455,7 @@ async def translate_audio_hybrid(
                 "confidence": confidence,
                 "source_language": detected_language,
                 "target_language": target_language,
-                "duration": metadata.get("duration", 0),
+                "duration": audio_duration,
                 "file_size_mb": file_size_mb
             }
         }
@@ -280,7 +498,7 @@ def get_hybrid_status() -> Dict[str, Any]:
         "primary_service": PRIMARY_SERVICE,
         "fallback_enabled": FALLBACK_TO_LOCAL,
         "semantic_validation_enabled": USE_SEMANTIC_VALIDATION,
-        "semantic_model": SEMANTIC_MODEL if sentence_transformer else None,
+        "semantic_model": SEMANTIC_MODEL if USE_SEMANTIC_VALIDATION else None,
         "confidence_threshold": MIN_CONFIDENCE,
         "speaker_match_threshold": MIN_SPEAKER_MATCH,
         "openai_status": get_openai_status()
@@ -0,0 +1,274 @@
+"""
+Sentence embedding helpers for semantic validation of transcripts.
+"""
+import hashlib
+import logging
+import re
+import threading
+from contextlib import nullcontext
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from cachetools import LRUCache
+from app.utils.config import load_config
+from app.utils.similarity import unit_dot
+
+logger = logging.getLogger(__name__)
+
+try:
+    from rapidfuzz import fuzz, utils as fuzz_utils
+except ImportError:
+    fuzz = None
+    logger.warning("rapidfuzz not available. Falling back to difflib for lexical similarity.")
+
+# Load configuration
+config = load_config()
+EMBEDDING_CACHE_SIZE = int(config.get("hybrid_stt", {}).get("embedding_cache_size", 4096))
+QUANTIZE_MAX_DRIFT = float(config.get("hybrid_stt", {}).get("semantic_quantize_max_drift", 0.01))
+SEMANTIC_BACKEND = config.get("hybrid_stt", {}).get("semantic_backend", "torch")  # "torch" or "onnx"
+SEMANTIC_ONNX_FILE = config.get("hybrid_stt", {}).get("semantic_onnx_file")  # e.g. a pre-quantized model
+SEMANTIC_COMPILE = config.get("hybrid_stt", {}).get("semantic_compile", True)
+QUANTIZED_ENGINES = ("x86", "fbgemm", "qnnpack")  # Preferred int8 backends, x86 first
+# Sentence pair whose similarity must survive quantization
+QUANTIZE_PROBE_TEXTS = ("turn on the light in the kitchen", "switch the kitchen lamp on")
+
+# Unit-length embeddings by transcript digest (keys stay small however long the text is)
+_embedding_cache: LRUCache = LRUCache(maxsize=max(1, EMBEDDING_CACHE_SIZE))
+_embedding_lock = threading.Lock()
+
+# Loaded models by (model_name, quantize, backend); None records a failed load
+_sentence_transformers: Dict[Tuple[str, bool, str], Any] = {}
+_sentence_transformers_lock = threading.Lock()
+
+
+def get_sentence_transformer(model_name: str, quantize: bool = True, backend: str = SEMANTIC_BACKEND):
+    """
+    Load a sentence transformer on first use and share it between callers.
+
+    Concurrent first calls (e.g. the startup warm-up and an early request)
+    wait for a single load instead of each loading the model.
+
+    With the "onnx" backend the model runs on ONNX Runtime, falling back to
+    PyTorch when that isn't available. A PyTorch model is placed on the GPU
+    in fp16 when one is available, and its transformer is compiled with
+    torch.compile. On the CPU its linear layers are optionally quantized to
+    int8, as long as that doesn't noticeably change similarity scores.
+
+    Args:
+        model_name: SentenceTransformer model name or path
+        quantize: Whether to apply dynamic int8 quantization on the CPU
+        backend: "torch" or "onnx"
+
+    Returns:
+        SentenceTransformer model, or None if it can't be loaded
+    """
+    key = (model_name, quantize, backend)
+    if key not in _sentence_transformers:
+        with _sentence_transformers_lock:
+            if key not in _sentence_transformers:
+                _sentence_transformers[key] = _load_sentence_transformer(model_name, quantize, backend)
+    return _sentence_transformers[key]
+
+
+def clear_sentence_transformers() -> None:
+    """Forget all loaded models, so the next call loads them again."""
+    with _sentence_transformers_lock:
+        _sentence_transformers.clear()
+
+
+def _load_sentence_transformer(model_name: str, quantize: bool, backend: str):
+    try:
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        if backend == "onnx":
+            model = _load_onnx_model(SentenceTransformer, model_name, device)
+            if model is not None:
+                logger.info(f"Sentence transformer model loaded: {model_name} on ONNX Runtime ({device})")
+                return model
+
+        model = SentenceTransformer(model_name, device=device)
+        model.eval()
+        if device == "cuda":
+            model.half()
+            if SEMANTIC_COMPILE:
+                _compile_transformer(model)
+        elif quantize:
+            model = _quantize_linear_layers(model)
+        logger.info(f"Sentence transformer model loaded: {model_name} on {device}")
+        return model
+    except Exception as e:
+        logger.warning(f"Failed to load sentence transformer: {str(e)}")
+        return None
+
+
+def _quantize_linear_layers(model):
+    """
+    Return a copy of the model with dynamic int8 nn.Linear layers.
+
+    The fp32 model is returned instead when no int8 backend is available or
+    quantization moves the similarity of the probe sentences by more than
+    QUANTIZE_MAX_DRIFT.
+    """
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+
+    quantized_backends = torch.backends.quantized
+    if quantized_backends.engine not in QUANTIZED_ENGINES:
+        engine = next((name for name in QUANTIZED_ENGINES if name in quantized_backends.supported_engines), None)
+        if engine is None:
+            logger.info("No int8 quantization engine available, keeping fp32 weights")
+            return model
+        quantized_backends.engine = engine
+
+    try:
+        quantized = quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        with inference_mode():
+            reference, probe = (
+                candidate.encode(
+                    list(QUANTIZE_PROBE_TEXTS),
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                    show_progress_bar=False,
+                )
+                for candidate in (model, quantized)
+            )
+        drift = abs(unit_dot(reference[0], reference[1]) - unit_dot(probe[0], probe[1]))
+    except Exception as e:
+        logger.warning(f"Dynamic quantization failed, keeping fp32 weights: {str(e)}")
+        return model
+
+    if drift > QUANTIZE_MAX_DRIFT:
+        logger.warning(f"Quantized similarity drift {drift:.4f} > {QUANTIZE_MAX_DRIFT}, keeping fp32 weights")
+        return model
+    return quantized
+
+
+def _load_onnx_model(model_class, model_name: str, device: str):
+    """Load the model on ONNX Runtime, or return None if that fails."""
+    provider = "CUDAExecutionProvider" if device == "cuda" else "CPUExecutionProvider"
+    model_kwargs = {"provider": provider}
+    if SEMANTIC_ONNX_FILE:
+        model_kwargs["file_name"] = SEMANTIC_ONNX_FILE
+    try:
+        # Exported on first use if the model repository has no ONNX file yet
+        return model_class(model_name, device=device, backend="onnx", model_kwargs=model_kwargs)
+    except Exception as e:
+        logger.warning(f"ONNX Runtime backend unavailable, using PyTorch: {str(e)}")
+        return None
+
+
+def _compile_transformer(model) -> None:
+    """Compile the model's Hugging Face transformer in place, if it has one."""
+    import torch
+
+    transformer = model[0] if len(model) else None
+    if transformer is None or not hasattr(transformer, "auto_model") or not hasattr(torch, "compile"):
+        return
+    try:
+        # Transcripts vary in length, so compile for dynamic shapes rather than per length
+        transformer.auto_model = torch.compile(transformer.auto_model, dynamic=True)
+    except Exception as e:
+        logger.warning(f"torch.compile failed, using the eager model: {str(e)}")
+
+
+def inference_mode():
+    """Return torch.inference_mode() when torch is available."""
+    try:
+        import torch
+    except ImportError:
+        return nullcontext()
+    return torch.inference_mode()
+
+
+def _text_key(text: str) -> bytes:
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+def encode_texts(model, texts: List[str]) -> np.ndarray:
+    """
+    Encode texts to unit-length embeddings.
+
+    Texts that aren't cached yet are encoded together in one batched
+    forward pass, with autograd disabled. Safe to call from worker threads.
+
+    Args:
+        model: SentenceTransformer model
+        texts: Texts to encode
+
+    Returns:
+        np.ndarray: One float32 row per text
+    """
+    return np.stack(_encode_rows(model, texts))
+
+
+def _encode_rows(model, texts: List[str]) -> List[np.ndarray]:
+    """Return the cached (or newly encoded) embedding of each text, without stacking them."""
+    keys = [_text_key(text) for text in texts]
+    # Callers encode from worker threads; the model itself runs outside the lock
+    with _embedding_lock:
+        rows = {key: _embedding_cache[key] for key in keys if key in _embedding_cache}
+
+    missing = list(dict.fromkeys(text for text, key in zip(texts, keys) if key not in rows))
+    if missing:
+        with inference_mode():
+            embeddings = model.encode(
+                missing,
+                batch_size=len(missing),
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False,
+            )
+        with _embedding_lock:
+            for text, embedding in zip(missing, embeddings):
+                key = _text_key(text)
+                rows[key] = _embedding_cache[key] = embedding.astype(np.float32, copy=False)
+
+    return [rows[key] for key in keys]
+
+
+def lexical_similarity(text1: str, text2: str) -> float:
+    """
+    Cheap word-level similarity of two transcripts.
+
+    Word order is ignored, but every word counts on both sides, so a
+    transcript is not "the same" as a longer one that contains it
+    ("open the door" vs "do not open the door").
+
+    Args:
+        text1: First text
+        text2: Second text
+
+    Returns:
+        float: Token sort ratio between 0.0 and 1.0
+    """
+    if fuzz is not None:
+        return fuzz.token_sort_ratio(text1, text2, processor=fuzz_utils.default_process) / 100.0
+    tokens1 = " ".join(sorted(re.findall(r"\w+", text1.lower())))
+    tokens2 = " ".join(sorted(re.findall(r"\w+", text2.lower())))
+    return SequenceMatcher(None, tokens1, tokens2).ratio()
+
+
+def semantic_similarity(model, text1: str, text2: str) -> float:
+    """
+    Calculate semantic similarity between two texts.
+
+    Args:
+        model: SentenceTransformer model
+        text1: First text
+        text2: Second text
+
+    Returns:
+        float: Cosine similarity of the text embeddings
+    """
+    # The cached rows are compared in place; embeddings are normalized, so
+    # cosine similarity is a dot product
+    embedding1, embedding2 = _encode_rows(model, [text1, text2])
+    return unit_dot(embedding1, embedding2)
+
+
+def clear_embedding_cache() -> None:
+    """Drop all cached embeddings (e.g. after the model changes)."""
+    with _embedding_lock:
+        _embedding_cache.clear()
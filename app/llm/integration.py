@@ -2,11 +2,13 @@
 Language Model integration module for the Whisper Voice Auth microservice.
 """
 import os
-import json
+import asyncio
 import logging
-import requests
-from typing import Dict, Any, Optional
+import aiohttp
+import orjson
+from typing import Dict, Any, List, Optional, Tuple
 from app.utils.config import load_config
+from app.audio.processor import get_http_session
 
 logger = logging.getLogger(__name__)
 
@@ -15,12 +17,127 @@ config = load_config()
 LLM_API_URL = config.get("llm", {}).get("api_url", os.environ.get("WHISPER_LLM_API_URL"))
 LLM_API_KEY = config.get("llm", {}).get("api_key", os.environ.get("WHISPER_LLM_API_KEY"))
 LLM_TIMEOUT = config.get("llm", {}).get("timeout", 30)
+LLM_CLIENT_TIMEOUT = aiohttp.ClientTimeout(total=LLM_TIMEOUT)
+LLM_MAX_RETRIES = int(config.get("llm", {}).get("max_retries", 2))
+LLM_RETRY_BACKOFF = float(config.get("llm", {}).get("retry_backoff", 0.2))  # Seconds, doubled per retry
+RETRY_STATUSES = frozenset({502, 503, 504})  # Gateway errors worth another attempt
+# Commands merged into one {"items": [...]} request, answered with {"results": [...]}; 1 disables batching
+LLM_BATCH_SIZE = int(config.get("llm", {}).get("batch_size", 1))
+LLM_BATCH_WAIT_MS = float(config.get("llm", {}).get("batch_wait_ms", 10))
+# metadata may hold numpy scalars
+JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# Request headers are the same for every command
+LLM_HEADERS = {"Content-Type": "application/json"}
+if LLM_API_KEY:
+    LLM_HEADERS["Authorization"] = f"Bearer {LLM_API_KEY}"
+
+
+class CommandBatcher:
+    """
+    Micro-batcher for LLM commands, for APIs that accept several at once.
+    
+    Commands arriving within `max_wait_ms` of the first one are sent
+    together as {"items": [payload, ...]} (at most `max_batch_size` of
+    them), and the API's {"results": [result, ...]} are handed back to the
+    callers in order. If the API rejects the batch or its answer is
+    malformed, the commands are resent one at a time.
+    """
+    
+    def __init__(self, max_batch_size: int = 32, max_wait_ms: float = 10):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._loop = None
+        self._queue = None
+        self._worker = None
+        self._sending = set()
+    
+    async def submit(self, payload: Dict[str, Any]) -> Tuple[int, Any]:
+        """
+        Queue a command payload and wait for the API's answer to it.
+        
+        Args:
+            payload: Command payload, as sent for a single command
+            
+        Returns:
+            Tuple[int, Any]: HTTP status and the command's result (the error body unless 200)
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        
+        future = loop.create_future()
+        await self._queue.put((payload, future))
+        return await future
+    
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Batches are sent concurrently; the next one is collected meanwhile
+            task = loop.create_task(self._send(batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+    
+    async def _send(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        try:
+            status, content = await _post(orjson.dumps({"items": [payload for payload, _ in batch]}, option=JSON_OPTIONS))
+            answers = None
+            if status == 200:
+                results = _batch_results(content)
+                if isinstance(results, list) and len(results) == len(batch):
+                    answers = [(status, result) for result in results]
+                else:
+                    found = f"{len(results)} results" if isinstance(results, list) else type(results).__name__
+                    logger.warning(f"LLM API answered {len(batch)} batched commands with {found}, sending them one at a time")
+            else:
+                logger.warning(f"LLM API rejected a batch of {len(batch)} commands ({status}), sending them one at a time")
+            
+            if answers is None:
+                # Fall back to single-command requests, for APIs that don't take batches
+                answers = await asyncio.gather(*(_post_command(payload) for payload, _ in batch), return_exceptions=True)
+        except Exception as e:
+            answers = [e] * len(batch)
+        
+        for (_, future), answer in zip(batch, answers):
+            if future.done():
+                continue
+            if isinstance(answer, Exception):
+                future.set_exception(answer)
+            else:
+                future.set_result(answer)
+
+
+def _batch_results(content: bytes) -> Any:
+    """The "results" of a batch answer, or None if the body isn't a JSON object."""
+    try:
+        body = orjson.loads(content)
+    except orjson.JSONDecodeError:
+        return None
+    return body.get("results") if isinstance(body, dict) else None
+
+
+command_batcher = CommandBatcher(LLM_BATCH_SIZE, LLM_BATCH_WAIT_MS)
 
 
 async def process_command(transcript: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
     """
     Process a transcribed command with a language model.
     
+    With llm.batch_size above 1, concurrent commands share one API request.
+    
     Args:
         transcript: Transcribed text to process
         metadata: Additional metadata about the audio
@@ -37,15 +154,6 @@ async def process_command(transcript: str, metadata: Dict[str, Any]) -> Dict[str
         }
     
     try:
-        # Prepare request to LLM API
-        headers = {
-            "Content-Type": "application/json",
-        }
-        
-        # Add API key if provided
-        if LLM_API_KEY:
-            headers["Authorization"] = f"Bearer {LLM_API_KEY}"
-        
         # Create payload
         payload = {
             "text": transcript,
@@ -53,17 +161,13 @@ async def process_command(transcript: str, metadata: Dict[str, Any]) -> Dict[str
             "source": "whisper_voice_auth",
         }
         
-        # Send request to LLM API
-        response = requests.post(
-            LLM_API_URL,
-            headers=headers,
-            json=payload,
-            timeout=LLM_TIMEOUT,
-        )
+        if LLM_BATCH_SIZE > 1:
+            status, result = await command_batcher.submit(payload)
+        else:
+            status, result = await _post_command(payload)
         
         # Check response
-        if response.status_code == 200:
-            result = response.json()
+        if status == 200:
             logger.info(f"Command processed successfully: {result.get('response')}")
             return {
                 "success": True,
@@ -72,10 +176,10 @@ async def process_command(transcript: str, metadata: Dict[str, Any]) -> Dict[str
                 "details": result.get("details"),
             }
         else:
-            logger.error(f"LLM API error: {response.status_code} - {response.text}")
+            logger.error(f"LLM API error: {status} - {result.decode(errors='replace')}")
             return {
                 "success": False,
-                "response": f"Error processing command: {response.status_code}",
+                "response": f"Error processing command: {status}",
                 "action_taken": None,
             }
     
@@ -86,3 +190,55 @@ async def process_command(transcript: str, metadata: Dict[str, Any]) -> Dict[str
             "response": f"Error processing command: {str(e)}",
             "action_taken": None,
         }
+
+
+async def _post_command(payload: Dict[str, Any]) -> Tuple[int, Any]:
+    """
+    Send a single command to the LLM API.
+    
+    Args:
+        payload: Command payload
+        
+    Returns:
+        Tuple[int, Any]: HTTP status and the decoded result (the raw error body unless 200)
+    """
+    status, content = await _post(orjson.dumps(payload, option=JSON_OPTIONS))
+    return status, orjson.loads(content) if status == 200 else content
+
+
+async def _post(body: bytes) -> Tuple[int, bytes]:
+    """
+    Send an encoded request to the LLM API without blocking the event loop.
+    
+    Gateway errors and failed connections are retried with exponential
+    backoff; the body is encoded once for all attempts.
+    
+    Args:
+        body: JSON request body
+        
+    Returns:
+        Tuple[int, bytes]: Final HTTP status and response body
+    """
+    session = get_http_session()
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        if attempt:
+            await asyncio.sleep(LLM_RETRY_BACKOFF * 2 ** (attempt - 1))
+        retries_left = attempt < LLM_MAX_RETRIES
+        
+        try:
+            async with session.post(
+                LLM_API_URL,
+                headers=LLM_HEADERS,
+                data=body,
+                timeout=LLM_CLIENT_TIMEOUT,
+            ) as response:
+                if response.status in RETRY_STATUSES and retries_left:
+                    logger.warning(f"LLM API returned {response.status}, retrying (attempt {attempt + 1})")
+                    continue
+                return response.status, await response.read()
+        
+        except aiohttp.ClientConnectorError as e:
+            # The request never reached the server, so it is safe to send again
+            if not retries_left:
+                raise
+            logger.warning(f"LLM API connection failed, retrying (attempt {attempt + 1}): {str(e)}")
@@ -3,12 +3,19 @@
 Main entry point for the Whisper Voice Authentication microservice.
 """
 import os
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 import uvicorn
 from app.api.routes import api_router
 from app.api.hybrid_routes import hybrid_router
+from app.audio.processor import close_http_session, run_temp_janitor
+from app.hybrid.cache import load_semantic_cache, save_semantic_cache
+from app.hybrid.controller import warm_up_semantic_model
+from app.transcription.openai_whisper import close_openai_client
 from app.utils.config import load_config
 
 # Set up logging
@@ -21,11 +28,66 @@ logger = logging.getLogger(__name__)
 # Load configuration
 config = load_config()
 
+
+def default_workers() -> int:
+    """Worker count when none is configured: half the CPU cores, or one on CUDA hosts."""
+    import torch
+    
+    # Every worker would load its own copy of the models onto the same GPU
+    if torch.cuda.is_available():
+        return 1
+    return max(1, (os.cpu_count() or 1) // 2)
+
+
+# Worker processes; each loads its own models, so size this by memory as well as cores
+WORKERS = int(os.environ.get("WORKERS") or config.get("server", {}).get("workers") or default_workers())
+
+
+def configure_torch_threads() -> None:
+    """Apply the configured PyTorch intra-op and inter-op thread counts."""
+    import torch
+    
+    torch_config = config.get("torch", {})
+    num_threads = torch_config.get("num_threads")
+    interop_threads = torch_config.get("interop_threads")
+    if not num_threads and WORKERS > 1:
+        # Split the cores between workers instead of each one using all of them
+        num_threads = max(1, (os.cpu_count() or 1) // WORKERS)
+    
+    if num_threads:
+        torch.set_num_threads(int(num_threads))
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(int(interop_threads))
+        except RuntimeError as e:
+            # Only possible before any inter-op parallel work has run
+            logger.warning(f"Could not set PyTorch inter-op threads: {str(e)}")
+    logger.info(f"PyTorch threads: intra-op {torch.get_num_threads()}, inter-op {torch.get_num_interop_threads()}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Manage resources shared across requests."""
+    configure_torch_threads()
+    janitor = asyncio.create_task(run_temp_janitor())
+    load_semantic_cache()
+    # Load the semantic model before serving instead of on the first request
+    await asyncio.to_thread(warm_up_semantic_model)
+    yield
+    janitor.cancel()
+    save_semantic_cache()
+    # Release pooled HTTP connections on shutdown
+    await close_http_session()
+    await close_openai_client()
+
+
 # Create FastAPI application
 app = FastAPI(
     title="Whisper Voice Auth",
     description="Voice Authentication and Analysis Microservice",
     version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Add CORS middleware
@@ -84,11 +146,18 @@ if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
     host = os.environ.get("HOST", "0.0.0.0")
     
-    logger.info(f"Starting Whisper Voice Auth service on {host}:{port}")
+    # Auto-reload only supports a single worker
+    reload = config.get("development_mode", False)
+    workers = 1 if reload else WORKERS
+    
+    logger.info(f"Starting Whisper Voice Auth service on {host}:{port} with {workers} worker(s)")
     
     uvicorn.run(
         "main:app",
         host=host,
         port=port,
-        reload=config.get("development_mode", False),
+        reload=reload,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
     )
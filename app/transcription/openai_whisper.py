@@ -3,15 +3,23 @@ OpenAI Whisper API integration for speech recognition.
 Primary transcription service with local whisper as fallback.
 """
 import os
+import hashlib
 import logging
+import shutil
+from collections import Counter
+from functools import partial
 from pathlib import Path
-from typing import Tuple, Optional, Dict, Any, Union
+from typing import Tuple, Optional, Dict, Any, Union, AsyncIterator, Awaitable, BinaryIO, Callable
+import httpx
 import openai
-from openai import OpenAI
+from openai import AsyncOpenAI
 import aiohttp
 import asyncio
+import orjson
 from app.utils.config import load_config
+from app.utils.circuit_breaker import CircuitBreaker
 from app.transcription.speech_recognition import transcribe_audio as local_transcribe
+from app.audio.processor import get_audio_metadata, TARGET_SAMPLE_RATE
 
 logger = logging.getLogger(__name__)
 
@@ -19,18 +27,161 @@ logger = logging.getLogger(__name__)
 config = load_config()
 OPENAI_API_KEY = config.get("openai", {}).get("api_key") or os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = config.get("openai", {}).get("model", "gpt-4o-transcribe")
+# gpt-4o transcription models stream deltas; whisper-1 can't
+OPENAI_STREAMING_MODEL = OPENAI_MODEL.startswith("gpt-4o")
+# OpenAI doesn't provide confidence scores, so they are estimated from the model
+OPENAI_CONFIDENCE = 0.95 if OPENAI_STREAMING_MODEL else 0.85
+OPENAI_MAX_RETRIES = int(config.get("openai", {}).get("max_retries", 3))
+OPENAI_TIMEOUT = float(config.get("openai", {}).get("timeout", 30))
+OPENAI_MAX_CONNECTIONS = int(config.get("openai", {}).get("max_connections", 64))
+OPENAI_KEEPALIVE_TIMEOUT = float(config.get("openai", {}).get("keepalive_timeout", 60))
+OPENAI_HTTP2 = config.get("openai", {}).get("http2", True)
+# Large-file chunks transcribed at once; 1 transcribes each file's chunks in order, passing
+# the end of each chunk's text as a prompt for the next one
+CHUNK_CONCURRENCY = max(1, int(config.get("openai", {}).get("chunk_concurrency", 4)))
+BREAKER_FAIL_MAX = int(config.get("openai", {}).get("breaker_fail_max", 5))
+BREAKER_RESET_TIMEOUT = float(config.get("openai", {}).get("breaker_reset_timeout", 30))
 FALLBACK_TO_LOCAL = config.get("transcription", {}).get("fallback_to_local", True)
+# Start local transcription alongside OpenAI while OpenAI has been failing
+SPECULATIVE_LOCAL = config.get("transcription", {}).get("speculative_local", True)
 MAX_FILE_SIZE = 25 * 1024 * 1024  # 25MB limit for OpenAI API
+# Directory of API responses by audio content hash, kept across restarts; None disables it
+OPENAI_CACHE_DIR = config.get("openai", {}).get("cache_dir")
+
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+    if OPENAI_HTTP2:
+        logger.warning("h2 not available. OpenAI requests will use HTTP/1.1 (install httpx[http2]).")
+
+# Shared by all large-file requests, so long uploads can't take every pooled connection
+_chunk_semaphore = asyncio.Semaphore(CHUNK_CONCURRENCY)
+
+# Skip OpenAI entirely while it keeps failing instead of paying its timeout on every request
+openai_breaker = CircuitBreaker("openai", fail_max=BREAKER_FAIL_MAX, reset_timeout=BREAKER_RESET_TIMEOUT)
 
 # Initialize OpenAI client
 if OPENAI_API_KEY:
-    openai_client = OpenAI(api_key=OPENAI_API_KEY)
+    # Async client, so API round trips don't block the event loop. Idle connections
+    # are kept well past httpx's 5s default so fallbacks don't pay a new TLS handshake,
+    # and with HTTP/2 concurrent chunk uploads share a connection instead of opening more.
+    openai_client = AsyncOpenAI(
+        api_key=OPENAI_API_KEY,
+        max_retries=OPENAI_MAX_RETRIES,
+        timeout=OPENAI_TIMEOUT,
+        http_client=openai.DefaultAsyncHttpxClient(
+            http2=OPENAI_HTTP2 and HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+                keepalive_expiry=OPENAI_KEEPALIVE_TIMEOUT,
+            ),
+        ),
+    )
     logger.info(f"OpenAI client initialized with model: {OPENAI_MODEL}")
 else:
     openai_client = None
     logger.warning("OpenAI API key not found. Will use local Whisper only.")
 
 
+async def close_openai_client() -> None:
+    """Close the pooled connections of the OpenAI client, if it was created."""
+    if openai_client is not None:
+        await openai_client.close()
+
+
+def _open_upload(audio_path: Path) -> BinaryIO:
+    """
+    Open an audio file for upload to OpenAI after checking its size.
+    
+    Args:
+        audio_path: Path to the audio file
+        
+    Returns:
+        BinaryIO: File opened for binary reading
+        
+    Raises:
+        ValueError: If the file exceeds the OpenAI upload limit
+    """
+    file_size = audio_path.stat().st_size
+    if file_size > MAX_FILE_SIZE:
+        raise ValueError(f"File size {file_size} exceeds OpenAI limit of {MAX_FILE_SIZE} bytes")
+    return open(audio_path, "rb")
+
+
+def _response_cache_path(audio_path: Path, endpoint: str, **options: Any) -> Path:
+    """
+    Locate the cached API response for this audio content and request.
+    
+    Args:
+        audio_path: Path to the audio file
+        endpoint: "transcriptions" or "translations"
+        **options: Request options that influence the response (model, language, ...)
+        
+    Returns:
+        Path: JSON file in OPENAI_CACHE_DIR, which may not exist yet
+    """
+    with open(audio_path, "rb") as f:
+        audio_digest = hashlib.file_digest(f, "sha256").hexdigest()
+    request_digest = hashlib.sha256(orjson.dumps([endpoint, sorted(options.items())])).hexdigest()[:16]
+    return Path(OPENAI_CACHE_DIR) / f"{audio_digest}-{request_digest}.json"
+
+
+def _read_cached_response(cache_path: Path) -> Optional[Tuple[str, float, str]]:
+    try:
+        text, confidence, language = orjson.loads(cache_path.read_bytes())
+        return text, confidence, language
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable OpenAI cache entry {cache_path.name}: {str(e)}")
+        return None
+
+
+def _write_cached_response(cache_path: Path, response: Tuple[str, float, str]) -> None:
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(orjson.dumps(list(response)))
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        logger.warning(f"Failed to cache OpenAI response: {str(e)}")
+
+
+async def _cached_response(
+    audio_path: Path,
+    endpoint: str,
+    call: Callable[[], Awaitable[Tuple[str, float, str]]],
+    **options: Any,
+) -> Tuple[str, float, str]:
+    """
+    Return the API response from OPENAI_CACHE_DIR, or call the API and store it there.
+    
+    Args:
+        audio_path: Path to the audio file
+        endpoint: "transcriptions" or "translations"
+        call: Coroutine function that calls the API
+        **options: Request options that influence the response
+        
+    Returns:
+        Tuple[str, float, str]: Text, confidence and language
+    """
+    if not OPENAI_CACHE_DIR:
+        return await call()
+    
+    cache_path = await asyncio.to_thread(_response_cache_path, audio_path, endpoint, **options)
+    cached = await asyncio.to_thread(_read_cached_response, cache_path)
+    if cached is not None:
+        logger.info(f"Serving OpenAI {endpoint} response for {audio_path.name} from disk cache")
+        return cached
+    
+    response = await call()
+    await asyncio.to_thread(_write_cached_response, cache_path, response)
+    return response
+
+
 async def transcribe_with_openai(
     audio_path: Path,
     language: Optional[str] = None,
@@ -52,13 +203,30 @@ async def transcribe_with_openai(
     if not openai_client:
         raise RuntimeError("OpenAI client not initialized")
     
-    # Check file size
-    file_size = audio_path.stat().st_size
-    if file_size > MAX_FILE_SIZE:
-        raise ValueError(f"File size {file_size} exceeds OpenAI limit of {MAX_FILE_SIZE} bytes")
+    return await _cached_response(
+        audio_path,
+        "transcriptions",
+        partial(_request_transcription, audio_path, language, prompt, response_format),
+        model=OPENAI_MODEL,
+        language=language,
+        prompt=prompt,
+        response_format=response_format,
+    )
+
+
+async def _request_transcription(
+    audio_path: Path,
+    language: Optional[str],
+    prompt: Optional[str],
+    response_format: str,
+) -> Tuple[str, float, str]:
+    # Check file size and open the upload off the event loop
+    audio_file = await asyncio.to_thread(_open_upload, audio_path)
     
     try:
-        with open(audio_path, "rb") as audio_file:
+        # The open file is streamed by httpx in 64 KiB chunks with a Content-Length
+        # taken from fstat, so the upload is never buffered in memory as a whole
+        with audio_file:
             # Prepare transcription parameters
             kwargs = {
                 "model": OPENAI_MODEL,
@@ -73,26 +241,104 @@ async def transcribe_with_openai(
                 kwargs["prompt"] = prompt
             
             # Call OpenAI API
-            response = openai_client.audio.transcriptions.create(**kwargs)
+            response = await openai_client.audio.transcriptions.create(**kwargs)
             
-            if response_format == "json":
-                text = response.text
-                # OpenAI doesn't provide confidence scores, estimate based on model
-                confidence = 0.95 if OPENAI_MODEL.startswith("gpt-4o") else 0.85
-                detected_language = language or "auto"
-            else:
-                text = str(response)
-                confidence = 0.95 if OPENAI_MODEL.startswith("gpt-4o") else 0.85
-                detected_language = language or "auto"
+            # "text" responses are the transcript itself
+            text = response.text if response_format == "json" else str(response)
             
             logger.info(f"OpenAI transcription completed. Model: {OPENAI_MODEL}, Length: {len(text)}")
-            return text.strip(), confidence, detected_language
+            return text.strip(), OPENAI_CONFIDENCE, language or "auto"
             
     except Exception as e:
         logger.error(f"OpenAI transcription failed: {str(e)}")
         raise
 
 
+async def try_transcribe_with_openai(
+    audio_path: Path,
+    language: Optional[str] = None,
+    prompt: Optional[str] = None
+) -> Optional[Tuple[str, float, str]]:
+    """
+    Transcribe audio with OpenAI only, without falling back to local Whisper.
+    
+    Respects and updates the OpenAI circuit breaker.
+    
+    Args:
+        audio_path: Path to the audio file
+        language: Language code (optional, auto-detected if None)
+        prompt: Context prompt to improve transcription
+        
+    Returns:
+        Optional[Tuple[str, float, str]]: Transcription text, confidence and language,
+        or None if OpenAI is unavailable or failed
+    """
+    if not openai_client or not openai_breaker.allow_request():
+        return None
+    
+    try:
+        result = await transcribe_with_openai(audio_path, language, prompt)
+        openai_breaker.record_success()
+        return result
+    except Exception as e:
+        if not isinstance(e, ValueError):
+            openai_breaker.record_failure()
+        logger.warning(f"OpenAI transcription failed: {str(e)}")
+        return None
+
+
+def supports_streaming() -> bool:
+    """
+    Check whether the configured OpenAI model can stream transcripts.
+    
+    Returns:
+        bool: True for gpt-4o transcription models (whisper-1 can't stream)
+    """
+    return openai_client is not None and OPENAI_STREAMING_MODEL
+
+
+async def stream_with_openai(
+    audio_path: Path,
+    language: Optional[str] = None,
+    prompt: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    Transcribe audio using OpenAI API, yielding text deltas as they arrive.
+    
+    Args:
+        audio_path: Path to the audio file
+        language: Language code (optional, auto-detected if None)
+        prompt: Context prompt to improve transcription
+        
+    Yields:
+        str: Transcript text deltas
+    """
+    if not openai_client:
+        raise RuntimeError("OpenAI client not initialized")
+    
+    # Check file size and open the upload off the event loop
+    audio_file = await asyncio.to_thread(_open_upload, audio_path)
+    
+    with audio_file:
+        kwargs = {
+            "model": OPENAI_MODEL,
+            "file": audio_file,
+            "response_format": "json",
+            "stream": True
+        }
+        
+        if language:
+            kwargs["language"] = language
+        
+        if prompt:
+            kwargs["prompt"] = prompt
+        
+        stream = await openai_client.audio.transcriptions.create(**kwargs)
+        async for event in stream:
+            if event.type == "transcript.text.delta":
+                yield event.delta
+
+
 async def transcribe_audio_hybrid(
     audio_path: Path,
     detailed: bool = True,
@@ -114,14 +360,28 @@ async def transcribe_audio_hybrid(
         Tuple[str, float, str, str]: Transcription text, confidence, language, source
     """
     errors = []
+    local_task = None
     
-    if use_openai_first and openai_client:
+    if use_openai_first and openai_client and not openai_breaker.allow_request():
+        error_msg = "OpenAI transcription skipped: circuit breaker open"
+        errors.append(error_msg)
+        logger.warning(error_msg)
+    elif use_openai_first and openai_client:
+        if SPECULATIVE_LOCAL and FALLBACK_TO_LOCAL and openai_breaker.consecutive_failures > 0:
+            # OpenAI failed recently, so run the fallback concurrently instead of after it
+            logger.info("Starting speculative local transcription")
+            local_task = asyncio.create_task(local_transcribe(audio_path, detailed))
+        
         try:
             # Try OpenAI API first
             logger.info("Attempting transcription with OpenAI API...")
             text, confidence, detected_lang = await transcribe_with_openai(
                 audio_path, language, prompt
             )
+            openai_breaker.record_success()
+            
+            if local_task is not None:
+                local_task.cancel()
             
             # For unauthorized users, provide minimal output
             if not detailed:
@@ -130,7 +390,16 @@ async def transcribe_audio_hybrid(
             
             return text, confidence, detected_lang, "openai"
             
+        except asyncio.CancelledError:
+            # Don't leave the speculative task running
+            if local_task is not None:
+                local_task.cancel()
+            raise
+            
         except Exception as e:
+            # Input errors (e.g. oversized files) say nothing about the service health
+            if not isinstance(e, ValueError):
+                openai_breaker.record_failure()
             error_msg = f"OpenAI transcription failed: {str(e)}"
             errors.append(error_msg)
             logger.warning(error_msg)
@@ -139,7 +408,10 @@ async def transcribe_audio_hybrid(
     if FALLBACK_TO_LOCAL:
         try:
             logger.info("Falling back to local Whisper transcription...")
-            text, confidence, detected_lang = await local_transcribe(audio_path, detailed)
+            if local_task is not None:
+                text, confidence, detected_lang = await local_task
+            else:
+                text, confidence, detected_lang = await local_transcribe(audio_path, detailed)
             return text, confidence, detected_lang, "local"
             
         except Exception as e:
@@ -172,8 +444,22 @@ async def translate_audio(
     if not openai_client:
         raise RuntimeError("OpenAI client not initialized for translation")
     
+    return await _cached_response(
+        audio_path,
+        "translations",
+        partial(_request_translation, audio_path, target_language, prompt),
+        model="whisper-1",
+        prompt=prompt,
+    )
+
+
+async def _request_translation(
+    audio_path: Path,
+    target_language: str,
+    prompt: Optional[str],
+) -> Tuple[str, float, str]:
     try:
-        with open(audio_path, "rb") as audio_file:
+        with await asyncio.to_thread(_open_upload, audio_path) as audio_file:
             kwargs = {
                 "model": "whisper-1",  # Only whisper-1 supports translation
                 "file": audio_file
@@ -183,7 +469,7 @@ async def translate_audio(
                 kwargs["prompt"] = prompt
             
             # Use translations endpoint for English translation
-            response = openai_client.audio.translations.create(**kwargs)
+            response = await openai_client.audio.translations.create(**kwargs)
             
             text = response.text.strip()
             confidence = 0.85  # Estimate for translation
@@ -208,68 +494,100 @@ def get_openai_status() -> Dict[str, Any]:
         "api_key_configured": bool(OPENAI_API_KEY),
         "model": OPENAI_MODEL,
         "fallback_enabled": FALLBACK_TO_LOCAL,
-        "max_file_size_mb": MAX_FILE_SIZE / (1024 * 1024)
+        "max_file_size_mb": MAX_FILE_SIZE / (1024 * 1024),
+        "circuit_breaker": openai_breaker.get_status()
     }
 
 
 async def chunk_large_audio(
     audio_path: Path, 
-    chunk_size_mb: float = 20.0
+    chunk_size_mb: float = 20.0,
+    stat_result: Optional[os.stat_result] = None
 ) -> list[Path]:
     """
     Split large audio files into chunks for OpenAI API.
     
+    ffmpeg's segment muxer copies the stream into chunk files, so the
+    audio is never decoded into memory. Formats that can't be split that
+    way are re-encoded into 16-bit PCM WAV chunks by a second ffmpeg run.
+    
     Args:
         audio_path: Path to the audio file
         chunk_size_mb: Maximum chunk size in MB
+        stat_result: Result of audio_path.stat(), if the caller already has it
         
     Returns:
         List of paths to audio chunks
     """
     try:
-        from pydub import AudioSegment
-        
-        # Load audio
-        audio = AudioSegment.from_file(str(audio_path))
-        
         # Calculate chunk duration
-        file_size_mb = audio_path.stat().st_size / (1024 * 1024)
+        if stat_result is None:
+            stat_result = audio_path.stat()
+        file_size_mb = stat_result.st_size / (1024 * 1024)
         if file_size_mb <= chunk_size_mb:
             return [audio_path]  # No need to split
         
-        # Calculate duration per chunk
-        total_duration_ms = len(audio)
-        chunk_duration_ms = int((chunk_size_mb / file_size_mb) * total_duration_ms)
+        duration, _ = await asyncio.to_thread(get_audio_metadata, audio_path, stat_result)
+        segment_seconds = max(1, int(duration * chunk_size_mb / file_size_mb))
         
         # Split into chunks
-        chunks = []
-        chunk_dir = audio_path.parent / f"{audio_path.stem}_chunks"
-        chunk_dir.mkdir(exist_ok=True)
+        chunk_dir = _chunk_dir(audio_path)
+        await asyncio.to_thread(_reset_chunk_dir, chunk_dir)
         
-        for i, start_ms in enumerate(range(0, total_duration_ms, chunk_duration_ms)):
-            end_ms = min(start_ms + chunk_duration_ms, total_duration_ms)
-            chunk = audio[start_ms:end_ms]
-            
-            chunk_path = chunk_dir / f"chunk_{i:03d}{audio_path.suffix}"
-            chunk.export(str(chunk_path), format=audio_path.suffix[1:])
-            chunks.append(chunk_path)
+        try:
+            chunks = await _segment_audio(audio_path, chunk_dir, segment_seconds, ["-c", "copy"], audio_path.suffix)
+        except RuntimeError as e:
+            # Some containers can't be cut without re-encoding; PCM has a known
+            # bitrate, so the segment length is computed from that instead
+            logger.warning(f"Stream copy split failed, re-encoding chunks: {str(e)}")
+            await asyncio.to_thread(_reset_chunk_dir, chunk_dir)
+            pcm_seconds = max(1, int(chunk_size_mb * 1024 * 1024 / (TARGET_SAMPLE_RATE * 2)))
+            pcm_args = ["-ac", "1", "-ar", str(TARGET_SAMPLE_RATE), "-c:a", "pcm_s16le"]
+            chunks = await _segment_audio(audio_path, chunk_dir, pcm_seconds, pcm_args, ".wav")
         
         logger.info(f"Split audio into {len(chunks)} chunks")
         return chunks
         
-    except ImportError:
-        logger.error("pydub not available for audio chunking")
-        raise RuntimeError("Audio chunking requires pydub package")
     except Exception as e:
         logger.error(f"Audio chunking failed: {str(e)}")
         raise
 
 
+async def _segment_audio(
+    audio_path: Path,
+    chunk_dir: Path,
+    segment_seconds: int,
+    codec_args: list[str],
+    suffix: str,
+) -> list[Path]:
+    """Cut the file into segment_seconds long chunk files with ffmpeg's segment muxer."""
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-i", str(audio_path),
+        "-f", "segment", "-segment_time", str(segment_seconds),
+        *codec_args,
+        str(chunk_dir / f"chunk_%03d{suffix}"),
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to split audio: {stderr.decode(errors='replace').strip()}")
+    return sorted(chunk_dir.glob(f"chunk_*{suffix}"))
+
+
+def _reset_chunk_dir(chunk_dir: Path) -> None:
+    """Create an empty chunk directory, discarding chunks left by an earlier attempt."""
+    shutil.rmtree(chunk_dir, ignore_errors=True)
+    chunk_dir.mkdir()
+
+
 async def transcribe_large_audio(
     audio_path: Path,
     detailed: bool = True,
     language: Optional[str] = None,
-    prompt: Optional[str] = None
+    prompt: Optional[str] = None,
+    stat_result: Optional[os.stat_result] = None
 ) -> Tuple[str, float, str, str]:
     """
     Transcribe large audio files by chunking them.
@@ -279,59 +597,76 @@ async def transcribe_large_audio(
         detailed: Whether to perform detailed transcription
         language: Target language code
         prompt: Context prompt
+        stat_result: Result of audio_path.stat(), if the caller already has it
         
     Returns:
         Tuple[str, float, str, str]: Combined transcription, avg confidence, language, source
     """
-    file_size_mb = audio_path.stat().st_size / (1024 * 1024)
+    if stat_result is None:
+        stat_result = audio_path.stat()
+    file_size_mb = stat_result.st_size / (1024 * 1024)
     
     if file_size_mb <= 25:
         # Use normal transcription
         return await transcribe_audio_hybrid(audio_path, detailed, language, prompt)
     
     # Split and transcribe chunks
-    chunks = await chunk_large_audio(audio_path)
+    chunks = await chunk_large_audio(audio_path, stat_result=stat_result)
     
     try:
-        transcriptions = []
-        confidences = []
-        languages = []
-        
-        for i, chunk_path in enumerate(chunks):
-            # Update prompt with context from previous chunks
-            chunk_prompt = prompt
-            if i > 0 and transcriptions:
-                # Add context from previous chunk
-                prev_text = transcriptions[-1].split()[-20:]  # Last 20 words
-                chunk_prompt = f"{prompt or ''} Previous context: {' '.join(prev_text)}"
+        if CHUNK_CONCURRENCY > 1:
+            # Chunks share the pooled API connections, so they are sent concurrently
+            async def transcribe_chunk(chunk_path: Path) -> Tuple[str, float, str, str]:
+                async with _chunk_semaphore:
+                    return await transcribe_audio_hybrid(chunk_path, detailed, language, prompt)
             
-            text, conf, lang, source = await transcribe_audio_hybrid(
-                chunk_path, detailed, language, chunk_prompt
+            outcomes = await asyncio.gather(
+                *(transcribe_chunk(chunk_path) for chunk_path in chunks), return_exceptions=True
             )
-            
-            transcriptions.append(text)
-            confidences.append(conf)
-            languages.append(lang)
+            failed = [i for i, outcome in enumerate(outcomes) if isinstance(outcome, BaseException)]
+            if len(failed) == len(outcomes):
+                raise outcomes[0]
+            for i in failed:
+                # The rest of the file is still worth returning; the gap lowers the confidence
+                logger.error(f"Transcription of chunk {i + 1}/{len(chunks)} failed: {str(outcomes[i])}")
+                outcomes[i] = ("", 0.0, "unknown", "error")
+            results = outcomes
+        else:
+            results = []
+            for i, chunk_path in enumerate(chunks):
+                # Update prompt with context from previous chunks
+                chunk_prompt = prompt
+                if i > 0 and results:
+                    # Add context from previous chunk
+                    prev_text = results[-1][0].split()[-20:]  # Last 20 words
+                    chunk_prompt = f"{prompt or ''} Previous context: {' '.join(prev_text)}"
+                
+                results.append(await transcribe_audio_hybrid(chunk_path, detailed, language, chunk_prompt))
         
         # Combine results
-        combined_text = " ".join(transcriptions)
-        avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
-        primary_language = max(set(languages), key=languages.count) if languages else "unknown"
+        combined_text = " ".join(text for text, _, _, _ in results if text)
+        avg_confidence = sum(conf for _, conf, _, _ in results) / len(results) if results else 0.0
+        languages = Counter(lang for _, _, lang, source in results if source != "error")
+        primary_language = languages.most_common(1)[0][0] if languages else "unknown"
         
         return combined_text, avg_confidence, primary_language, "chunked"
         
     finally:
-        # Cleanup chunks
-        for chunk_path in chunks:
-            try:
-                chunk_path.unlink()
-            except Exception:
-                pass
-        
-        # Remove chunk directory if empty
-        chunk_dir = chunks[0].parent if chunks else None
-        if chunk_dir and chunk_dir.exists():
-            try:
-                chunk_dir.rmdir()
-            except Exception:
-                pass
+        await asyncio.to_thread(_remove_chunks, audio_path, chunks)
+
+
+def _remove_chunks(audio_path: Path, chunks: list[Path]) -> None:
+    """Delete the chunk files and their directory (never the original file)."""
+    for chunk_path in chunks:
+        if chunk_path == audio_path:
+            continue
+        try:
+            chunk_path.unlink()
+        except OSError:
+            pass
+    # Also takes any chunk ffmpeg wrote before failing
+    shutil.rmtree(_chunk_dir(audio_path), ignore_errors=True)
+
+
+def _chunk_dir(audio_path: Path) -> Path:
+    return audio_path.parent / f"{audio_path.stem}_chunks"
@@ -2,12 +2,19 @@
 Speech recognition module for the Whisper Voice Auth microservice.
 """
 import os
+import asyncio
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import replace
 from pathlib import Path
-from typing import Tuple, Optional, Dict, Any
+from typing import Tuple, Optional, Dict, Any, List
+import numpy as np
 import torch
 import whisper
 from app.utils.config import load_config
+from app.audio.processor import load_audio_samples
 
 logger = logging.getLogger(__name__)
 
@@ -15,17 +22,322 @@ logger = logging.getLogger(__name__)
 config = load_config()
 WHISPER_MODEL = config.get("transcription", {}).get("whisper_model", "base")
 LANGUAGE = config.get("transcription", {}).get("language", None)  # None for auto-detection
+# Languages auto-detection may choose from; None allows all of Whisper's languages
+LANGUAGE_SUBSET = config.get("transcription", {}).get("languages") or None
+BATCH_SIZE = int(config.get("transcription", {}).get("batch_size", 8))
+BATCH_WAIT_MS = float(config.get("transcription", {}).get("batch_wait_ms", 15))
+WHISPER_BACKEND = config.get("transcription", {}).get("backend", "openai-whisper")  # or "faster-whisper"
+# CTranslate2 weight format for faster-whisper; null picks int8_float16 on GPU, int8 on CPU
+COMPUTE_TYPE = config.get("transcription", {}).get("compute_type")
+# Worker processes decoding local Whisper on CPU-only hosts, each with its own model (0 decodes in-process)
+CPU_PROCESSES = max(0, int(config.get("transcription", {}).get("cpu_processes") or 0))
+
+if LANGUAGE_SUBSET:
+    # Whisper's own language table stays intact: its order defines the language token ids
+    unknown = [code for code in LANGUAGE_SUBSET if code not in whisper.tokenizer.LANGUAGES]
+    if unknown:
+        logger.warning(f"Ignoring unknown language codes in transcription.languages: {unknown}")
+    LANGUAGE_SUBSET = tuple(code for code in LANGUAGE_SUBSET if code in whisper.tokenizer.LANGUAGES) or None
 
-# Initialize Whisper model
 try:
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    whisper_model = whisper.load_model(WHISPER_MODEL, device=device)
+    from faster_whisper import WhisperModel as FasterWhisperModel
+except ImportError:
+    FasterWhisperModel = None
+
+
+def _load_whisper_model(device: str):
+    """Load the configured local Whisper backend, preferring faster-whisper when selected."""
+    if WHISPER_BACKEND == "faster-whisper":
+        if FasterWhisperModel is not None:
+            compute_type = COMPUTE_TYPE or ("int8_float16" if device == "cuda" else "int8")
+            model = FasterWhisperModel(WHISPER_MODEL, device=device, compute_type=compute_type)
+            logger.info(f"Whisper model '{WHISPER_MODEL}' loaded on {device} with faster-whisper ({compute_type})")
+            return model
+        logger.warning("faster-whisper not available. Falling back to openai-whisper.")
+    model = whisper.load_model(WHISPER_MODEL, device=device).eval()
     logger.info(f"Whisper model '{WHISPER_MODEL}' loaded on {device}")
+    return model
+
+
+# Initialize Whisper model (left to the decode processes when they are used)
+device = "cuda" if torch.cuda.is_available() else "cpu"
+USE_DECODE_PROCESSES = CPU_PROCESSES > 0 and device == "cpu"
+try:
+    whisper_model = None if USE_DECODE_PROCESSES else _load_whisper_model(device)
 except Exception as e:
     logger.error(f"Failed to load Whisper model: {str(e)}")
     whisper_model = None
 
 
+class TranscriptionBatcher:
+    """
+    Micro-batcher for local Whisper transcription.
+    
+    Concurrent requests are queued and decoded together in a single forward
+    pass: a batch is sent once `max_batch_size` requests are waiting or
+    `max_wait_ms` has passed since the first one arrived. At most
+    `max_in_flight` batches are decoded at once.
+    """
+    
+    def __init__(self, model, max_batch_size: int = 8, max_wait_ms: float = 15, max_in_flight: int = 1):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.max_in_flight = max(1, max_in_flight)
+        # Batches are decoded one at a time on a thread of their own, so a long
+        # decode never holds a thread of the default pool that file I/O relies on
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper-decode")
+        self._loop = None
+        self._queue = None
+        self._worker = None
+    
+    async def transcribe(self, audio_path: Path) -> Tuple[str, float, str]:
+        """
+        Queue audio for batched transcription and wait for its result.
+        
+        Args:
+            audio_path: Path to the audio file
+            
+        Returns:
+            Tuple[str, float, str]: Transcription text, confidence score, and detected language
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        
+        future = loop.create_future()
+        await self._queue.put((audio_path, future))
+        return await future
+    
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        # Each batch holds a slot until its results are delivered
+        slots = asyncio.Semaphore(self.max_in_flight)
+        decoding = set()
+        while True:
+            await slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            task = loop.create_task(self._deliver(batch, slots))
+            decoding.add(task)
+            task.add_done_callback(decoding.discard)
+    
+    async def _deliver(self, batch: List[Tuple[Path, asyncio.Future]], slots: asyncio.Semaphore) -> None:
+        try:
+            results = await self._submit([path for path, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            slots.release()
+        
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+    
+    async def _submit(self, audio_paths: List[Path]) -> List[Tuple[str, float, str]]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._decode_batch, audio_paths)
+    
+    def _decode_batch(self, audio_paths: List[Path]) -> List[Tuple[str, float, str]]:
+        return _decode_batch(self.model, audio_paths)
+
+
+class ProcessTranscriptionBatcher(TranscriptionBatcher):
+    """
+    Micro-batcher that decodes in worker processes, for CPU-only hosts.
+    
+    Each process loads its own model replica, so up to `processes` batches
+    are decoded in parallel without sharing the GIL or PyTorch's thread
+    pool. The current PyTorch thread count is split between the processes;
+    they are started on the first request, after the server has applied
+    its thread settings.
+    """
+    
+    def __init__(self, processes: int, max_batch_size: int = 8, max_wait_ms: float = 15):
+        super().__init__(None, max_batch_size, max_wait_ms, max_in_flight=processes)
+        self._pool: Optional[ProcessPoolExecutor] = None
+    
+    async def _submit(self, audio_paths: List[Path]) -> List[Tuple[str, float, str]]:
+        if self._pool is None:
+            # Spawned, not forked: a forked child would inherit PyTorch's thread pools
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_in_flight,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_decode_process,
+                initargs=(max(1, torch.get_num_threads() // self.max_in_flight),),
+            )
+            logger.info(f"Started {self.max_in_flight} local Whisper decode processes")
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, _decode_in_process, audio_paths)
+        except BrokenProcessPool:
+            # A decode process died; a new pool is started for the next batch
+            self._pool = None
+            raise
+
+
+def _init_decode_process(num_threads: int) -> None:
+    """Load the decode process's own model replica."""
+    global whisper_model
+    torch.set_num_threads(num_threads)
+    try:
+        whisper_model = _load_whisper_model("cpu")
+    except Exception as e:
+        logger.error(f"Failed to load Whisper model in decode process: {str(e)}")
+
+
+def _decode_in_process(audio_paths: List[Path]) -> List[Tuple[str, float, str]]:
+    if whisper_model is None:
+        raise RuntimeError("Whisper model not initialized")
+    return _decode_batch(whisper_model, audio_paths)
+
+
+# Inference mode also skips the tensor version tracking that no_grad keeps
+@torch.inference_mode()
+def _decode_batch(model, audio_paths: List[Path]) -> List[Tuple[str, float, str]]:
+    """
+    Transcribe a batch of audio files with one model.
+    
+    Args:
+        model: openai-whisper or faster-whisper model
+        audio_paths: Paths to the audio files
+        
+    Returns:
+        List[Tuple[str, float, str]]: Text, confidence and language per file
+    """
+    if len(audio_paths) > 1:
+        logger.info(f"Decoding batch of {len(audio_paths)} audio files")
+    
+    # Decoded once per file: speaker verification reuses the same cached samples
+    audios = [load_audio_samples(audio_path) for audio_path in audio_paths]
+    if FasterWhisperModel is not None and isinstance(model, FasterWhisperModel):
+        # CTranslate2 has no cross-file batching, so the batch is decoded file by file
+        return [_transcribe_ctranslate2(model, audio) for audio in audios]
+    
+    results: List[Optional[Tuple[str, float, str]]] = [None] * len(audios)
+    
+    # Clips longer than Whisper's 30s window need the sliding-window transcribe()
+    short = [i for i, audio in enumerate(audios) if len(audio) <= whisper.audio.N_SAMPLES]
+    for i in range(len(audios)):
+        if i not in short:
+            results[i] = _transcribe_long(model, audios[i])
+    
+    if short:
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(audios[i]), n_mels=model.dims.n_mels)
+            for i in short
+        ]).to(model.device)
+        options = whisper.DecodingOptions(
+            language=LANGUAGE,  # Can be None for auto-detection
+            task="transcribe",
+            fp16=model.device.type == "cuda",
+        )
+        if _restrict_detection(model):
+            # Encoded once: detection and decoding both accept the audio features
+            features = model.encoder(mels.half() if options.fp16 else mels)
+            languages = _detect_languages(model, features)
+            for language in dict.fromkeys(languages):
+                rows = [k for k, detected in enumerate(languages) if detected == language]
+                decoded = whisper.decode(model, features[rows], replace(options, language=language))
+                for k, result in zip(rows, decoded):
+                    results[short[k]] = (result.text.strip(), float(np.exp(result.avg_logprob)), result.language)
+        else:
+            decoded = whisper.decode(model, mels, options)
+            for i, result in zip(short, decoded):
+                results[i] = (result.text.strip(), float(np.exp(result.avg_logprob)), result.language)
+    
+    return results
+
+
+def _transcribe_long(model, audio: np.ndarray) -> Tuple[str, float, str]:
+    """Transcribe audio longer than one Whisper window."""
+    language = LANGUAGE  # Can be None for auto-detection
+    if _restrict_detection(model):
+        # Detected on the first window, as transcribe() itself would
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=model.dims.n_mels)
+        language = _detect_languages(model, mel.unsqueeze(0).to(model.device))[0]
+    
+    # Set transcription options
+    options = {
+        "language": language,
+        "task": "transcribe",
+        "fp16": torch.cuda.is_available(),
+    }
+    
+    # Process audio with Whisper
+    result = model.transcribe(audio, **options)
+    
+    # Extract results
+    text = result["text"].strip()
+    language = result.get("language", "unknown")
+    
+    # Whisper segments carry no confidence field; like short clips, use exp(avg_logprob)
+    segments = result.get("segments", [])
+    if segments:
+        logprobs = np.fromiter((segment["avg_logprob"] for segment in segments), dtype=np.float64, count=len(segments))
+        confidence = float(np.exp(logprobs).mean())
+    else:
+        confidence = 0.0
+    
+    return text, confidence, language
+
+
+def _restrict_detection(model) -> bool:
+    """Whether the language must be detected here, limited to LANGUAGE_SUBSET."""
+    return LANGUAGE is None and LANGUAGE_SUBSET is not None and model.is_multilingual
+
+
+def _detect_languages(model, mels: torch.Tensor) -> List[str]:
+    """
+    Detect the language of each clip, choosing only from LANGUAGE_SUBSET.
+    
+    Args:
+        model: Whisper model
+        mels: Batch of log-mel spectrograms or already encoded audio features
+        
+    Returns:
+        List[str]: Most probable allowed language code per clip
+    """
+    _, probabilities = whisper.detect_language(model, mels)
+    return [max(LANGUAGE_SUBSET, key=language_probs.get) for language_probs in probabilities]
+
+
+def _transcribe_ctranslate2(model, audio: np.ndarray) -> Tuple[str, float, str]:
+    """Transcribe audio with a faster-whisper model."""
+    segments, info = model.transcribe(audio, language=LANGUAGE, vad_filter=True)
+    # Segments are generated lazily; decoding happens while they are consumed
+    segments = list(segments)
+    
+    text = " ".join(segment.text.strip() for segment in segments).strip()
+    if segments:
+        logprobs = np.fromiter((segment.avg_logprob for segment in segments), dtype=np.float64, count=len(segments))
+        confidence = float(np.exp(logprobs).mean())
+    else:
+        confidence = 0.0
+    
+    return text, confidence, info.language
+
+
+if USE_DECODE_PROCESSES:
+    transcription_batcher = ProcessTranscriptionBatcher(CPU_PROCESSES, BATCH_SIZE, BATCH_WAIT_MS)
+elif whisper_model is not None:
+    transcription_batcher = TranscriptionBatcher(whisper_model, BATCH_SIZE, BATCH_WAIT_MS)
+else:
+    transcription_batcher = None
+
+
 async def transcribe_audio(
     audio_path: Path,
     detailed: bool = True,
@@ -40,30 +352,12 @@ async def transcribe_audio(
     Returns:
         Tuple[str, float, str]: Transcription text, confidence score, and detected language
     """
-    if whisper_model is None:
+    if transcription_batcher is None:
         raise RuntimeError("Whisper model not initialized")
     
     try:
-        # Set transcription options
-        options = {
-            "language": LANGUAGE,  # Can be None for auto-detection
-            "task": "transcribe",
-            "fp16": torch.cuda.is_available(),
-        }
-        
-        # Process audio with Whisper
-        result = whisper_model.transcribe(str(audio_path), **options)
-        
-        # Extract results
-        text = result["text"].strip()
-        language = result.get("language", "unknown")
-        
-        # Calculate average confidence
-        segments = result.get("segments", [])
-        if segments:
-            confidence = sum(segment.get("confidence", 0) for segment in segments) / len(segments)
-        else:
-            confidence = 0.0
+        # Batched with any other concurrent local transcriptions
+        text, confidence, language = await transcription_batcher.transcribe(audio_path)
         
         # For unauthorized users, provide minimal output
         if not detailed:
@@ -83,7 +377,11 @@ def get_supported_languages() -> Dict[str, str]:
     """
     Get a dictionary of languages supported by the Whisper model.
     
+    When transcription.languages is set, only those languages are returned.
+    
     Returns:
         Dict[str, str]: Dictionary mapping language codes to language names
     """
+    if LANGUAGE_SUBSET:
+        return {code: whisper.tokenizer.LANGUAGES[code] for code in LANGUAGE_SUBSET}
     return whisper.tokenizer.LANGUAGES
@@ -0,0 +1,92 @@
+"""
+Circuit breaker for calls to external services.
+"""
+import time
+import logging
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `fail_max` consecutive failures the breaker opens and callers are
+    expected to skip the protected service for `reset_timeout` seconds. After
+    that a single probe call is allowed (half-open); its outcome closes or
+    re-opens the breaker.
+    """
+
+    def __init__(self, name: str, fail_max: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started_at = None
+
+    @property
+    def state(self) -> str:
+        """Current breaker state."""
+        if self._failures < self.fail_max:
+            return STATE_CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return STATE_HALF_OPEN
+        return STATE_OPEN
+
+    @property
+    def consecutive_failures(self) -> int:
+        """Number of failures since the last success."""
+        return self._failures
+
+    def allow_request(self) -> bool:
+        """
+        Check whether a call to the protected service may be attempted.
+
+        Returns:
+            bool: False while the breaker is open or a half-open probe is running
+        """
+        state = self.state
+        if state == STATE_CLOSED:
+            return True
+        if state == STATE_HALF_OPEN:
+            now = time.monotonic()
+            # A probe whose outcome was never recorded (e.g. cancelled) expires
+            if self._probe_started_at is None or now - self._probe_started_at >= self.reset_timeout:
+                self._probe_started_at = now
+                return True
+        return False
+
+    def record_success(self) -> None:
+        """Record a successful call and close the breaker."""
+        if self._failures >= self.fail_max:
+            logger.info(f"Circuit breaker '{self.name}' closed")
+        self._failures = 0
+        self._probe_started_at = None
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the breaker once the limit is reached."""
+        self._failures += 1
+        self._probe_started_at = None
+        if self._failures >= self.fail_max:
+            self._opened_at = time.monotonic()
+            logger.warning(
+                f"Circuit breaker '{self.name}' opened after {self._failures} consecutive failures"
+            )
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get breaker status for health/debug output.
+
+        Returns:
+            Dict with state and failure count
+        """
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+        }
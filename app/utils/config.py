@@ -2,7 +2,9 @@
 Configuration utilities for the Whisper Voice Auth microservice.
 """
 import os
+import copy
 import yaml
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, Any
 import logging
@@ -11,15 +13,31 @@ logger = logging.getLogger(__name__)
 
 DEFAULT_CONFIG_PATH = Path("config.yaml")
 ENV_CONFIG_PATH = os.environ.get("CONFIG_PATH")
+# libyaml's C loader when PyYAML was built with it
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
 
 def load_config() -> Dict[str, Any]:
     """
     Load configuration from a YAML file and environment variables.
     
+    The file and environment are read once per process; every module that
+    loads configuration at import time gets its own copy of that result.
+    Call reload_config() to pick up changes.
+    
     Returns:
         Dict[str, Any]: Configuration dictionary
     """
+    return copy.deepcopy(_read_config())
+
+
+def reload_config() -> None:
+    """Discard the loaded configuration so the next load_config() reads it again."""
+    _read_config.cache_clear()
+
+
+@lru_cache(maxsize=1)
+def _read_config() -> Dict[str, Any]:
     config = {}
     
     # Determine config path
@@ -29,7 +47,7 @@ def load_config() -> Dict[str, Any]:
     if config_path.exists():
         try:
             with open(config_path, "r") as f:
-                config = yaml.safe_load(f)
+                config = yaml.load(f, Loader=YAML_LOADER) or {}
             logger.info(f"Loaded configuration from {config_path}")
         except Exception as e:
             logger.error(f"Failed to load configuration from {config_path}: {e}")
@@ -38,9 +56,17 @@ def load_config() -> Dict[str, Any]:
     
     # Override with environment variables
     # Format: WHISPER_SECTION_KEY=value (e.g., WHISPER_API_SECRET_KEY=mysecret)
+    # Sections whose names contain underscores (e.g. WHISPER_HYBRID_STT_MIN_CONFIDENCE)
+    # are matched against the sections already present in the file.
+    sections = sorted((name for name, value in config.items() if isinstance(value, dict)), key=len, reverse=True)
     for env_key, env_value in os.environ.items():
         if env_key.startswith("WHISPER_"):
-            parts = env_key.lower().split("_", 2)[1:]  # Remove WHISPER_ prefix and split
+            name = env_key[len("WHISPER_"):].lower()
+            section = next((section for section in sections if name.startswith(f"{section}_")), None)
+            if section is not None:
+                parts = [section, name[len(section) + 1:]]
+            else:
+                parts = name.split("_", 1)
             
             if len(parts) == 1:
                 # Single level: WHISPER_KEY=value
@@ -2,10 +2,15 @@
 Security utilities for the Whisper Voice Auth microservice.
 """
 import os
+import hmac
+import base64
+import hashlib
 import logging
+from functools import lru_cache
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from fastapi import HTTPException, Security, Depends
 from fastapi.security.api_key import APIKeyHeader
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from app.utils.config import load_config
 
 logger = logging.getLogger(__name__)
@@ -18,6 +23,28 @@ api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 config = load_config()
 
 
+def _load_valid_api_keys() -> frozenset:
+    """
+    Collect the accepted API keys from config and environment.
+    
+    Returns:
+        frozenset: Valid API keys, encoded for hmac.compare_digest
+    """
+    keys = list(config.get("api", {}).get("keys", []))
+    
+    # Add API key from environment if available
+    env_api_key = os.environ.get("WHISPER_API_KEY")
+    if env_api_key:
+        keys.append(env_api_key)
+    
+    return frozenset(str(key).encode() for key in keys if key)
+
+
+# Resolved once at import instead of on every request
+VALID_API_KEYS = _load_valid_api_keys()
+SKIP_API_VALIDATION = config.get("development_mode", False) and config.get("skip_api_validation", False)
+
+
 async def validate_api_key(
     api_key_header: Optional[str] = Security(api_key_header),
 ) -> str:
@@ -33,20 +60,14 @@ async def validate_api_key(
     Raises:
         HTTPException: If the API key is invalid or missing
     """
-    # Get valid API keys from config or environment
-    valid_api_keys = config.get("api", {}).get("keys", [])
-    
-    # Add API key from environment if available
-    env_api_key = os.environ.get("WHISPER_API_KEY")
-    if env_api_key:
-        valid_api_keys.append(env_api_key)
-    
     # Skip validation in development mode if configured
-    if config.get("development_mode", False) and config.get("skip_api_validation", False):
+    if SKIP_API_VALIDATION:
         return api_key_header or "dev_mode"
     
-    # Validate the API key
-    if not api_key_header or api_key_header not in valid_api_keys:
+    # Validate the API key (constant-time comparison against every key)
+    if not api_key_header or not any(
+        hmac.compare_digest(api_key_header.encode(), key) for key in VALID_API_KEYS
+    ):
         logger.warning("Invalid or missing API key")
         raise HTTPException(
             status_code=403,
@@ -56,9 +77,54 @@ async def validate_api_key(
     return api_key_header
 
 
+# Stored format: version || key id || nonce || AES-256-GCM ciphertext and tag
+ENCRYPTION_FORMAT_VERSION = b"\x01"
+KEY_ID_SIZE = 4
+NONCE_SIZE = 12
+
+
+def _decode_key(encoded_key: str) -> bytes:
+    """Decode a urlsafe base64 key (e.g. from generate_key.py) to 32 raw bytes."""
+    key = base64.urlsafe_b64decode(encoded_key)
+    if len(key) != 32:
+        raise ValueError("Encryption key must be 32 bytes (urlsafe base64 encoded)")
+    return key
+
+
+def _key_id(key: bytes) -> bytes:
+    return hashlib.sha256(key).digest()[:KEY_ID_SIZE]
+
+
+@lru_cache(maxsize=1)
+def _encryption_keys() -> Tuple[Optional[bytes], Dict[bytes, bytes]]:
+    """
+    Load the encryption keys once per process.
+    
+    WHISPER_ENCRYPTION_KEY encrypts new data. Keys listed (comma-separated)
+    in WHISPER_ENCRYPTION_PREVIOUS_KEYS still decrypt data written before a
+    rotation, which the key id stored with each ciphertext selects.
+    
+    Returns:
+        Tuple[Optional[bytes], Dict[bytes, bytes]]: Current key id (None if no
+        key is configured) and all keys by id
+    """
+    encoded_keys = [os.environ.get("WHISPER_ENCRYPTION_KEY", "")]
+    encoded_keys += os.environ.get("WHISPER_ENCRYPTION_PREVIOUS_KEYS", "").split(",")
+    keys = {}
+    for encoded_key in encoded_keys:
+        if encoded_key.strip():
+            key = _decode_key(encoded_key.strip())
+            keys.setdefault(_key_id(key), key)
+    current_id = next(iter(keys), None) if encoded_keys[0].strip() else None
+    return current_id, keys
+
+
+_temporary_key: Optional[bytes] = None
+
+
 def encrypt_data(data: bytes) -> bytes:
     """
-    Encrypt sensitive data for storage.
+    Encrypt sensitive data for storage with AES-256-GCM.
     
     Args:
         data: Data to encrypt
@@ -66,41 +132,49 @@ def encrypt_data(data: bytes) -> bytes:
     Returns:
         bytes: Encrypted data
     """
-    # Implementation using cryptography library
-    # This is a placeholder and should be properly implemented with:
-    # - Key management (from secure storage)
-    # - Proper encryption algorithm (e.g., AES-256-GCM)
-    # - Nonce/IV handling
-    from cryptography.fernet import Fernet
+    global _temporary_key
+    current_id, keys = _encryption_keys()
+    if current_id is not None:
+        key = keys[current_id]
+    else:
+        # Generate a key if not available (this is just for development).
+        # It lives as long as the process, so nothing it encrypts survives a restart.
+        if _temporary_key is None:
+            _temporary_key = AESGCM.generate_key(bit_length=256)
+            logger.warning("Generated temporary encryption key - this should be properly configured")
+        key = _temporary_key
+        current_id = _key_id(key)
     
-    # In production, the key should be securely stored and retrieved
-    key = os.environ.get("WHISPER_ENCRYPTION_KEY")
-    if not key:
-        # Generate a key if not available (this is just for development)
-        # In production, you should have a consistent key management strategy
-        key = Fernet.generate_key()
-        logger.warning("Generated temporary encryption key - this should be properly configured")
-    
-    f = Fernet(key)
-    return f.encrypt(data)
+    nonce = os.urandom(NONCE_SIZE)
+    return ENCRYPTION_FORMAT_VERSION + current_id + nonce + AESGCM(key).encrypt(nonce, data, None)
 
 
 def decrypt_data(encrypted_data: bytes) -> bytes:
     """
     Decrypt stored sensitive data.
     
+    Data encrypted with Fernet by earlier versions is still accepted.
+    
     Args:
         encrypted_data: Encrypted data to decrypt
         
     Returns:
         bytes: Decrypted data
     """
-    # Implementation using cryptography library
-    from cryptography.fernet import Fernet
-    
-    key = os.environ.get("WHISPER_ENCRYPTION_KEY")
-    if not key:
+    _, keys = _encryption_keys()
+    if _temporary_key is not None:
+        keys = {**keys, _key_id(_temporary_key): _temporary_key}
+    if not keys:
         raise ValueError("Encryption key not available")
     
-    f = Fernet(key)
-    return f.decrypt(encrypted_data)
+    if not encrypted_data.startswith(ENCRYPTION_FORMAT_VERSION):
+        # Fernet tokens are base64 text; a Fernet key is 32 urlsafe base64 bytes as well
+        from cryptography.fernet import Fernet, MultiFernet
+        return MultiFernet([Fernet(base64.urlsafe_b64encode(key)) for key in keys.values()]).decrypt(encrypted_data)
+    
+    header_size = len(ENCRYPTION_FORMAT_VERSION)
+    key_id = encrypted_data[header_size:header_size + KEY_ID_SIZE]
+    nonce = encrypted_data[header_size + KEY_ID_SIZE:header_size + KEY_ID_SIZE + NONCE_SIZE]
+    if key_id not in keys:
+        raise ValueError("Data was encrypted with an unknown key")
+    return AESGCM(keys[key_id]).decrypt(nonce, encrypted_data[header_size + KEY_ID_SIZE + NONCE_SIZE:], None)
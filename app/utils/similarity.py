@@ -0,0 +1,56 @@
+"""
+Cosine similarity kernel shared by speaker verification and semantic validation.
+"""
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+    logger.warning("numba not available. Falling back to numpy for embedding similarity.")
+
+
+def _unit_dot(a: np.ndarray, b: np.ndarray) -> float:
+    s = 0.0
+    for i in range(a.shape[0]):
+        s += a[i] * b[i]
+    return s
+
+
+if njit is not None:
+    _unit_dot = njit(cache=True, fastmath=True)(_unit_dot)
+    # Compile now rather than on the first request
+    _unit_dot(np.zeros(1, dtype=np.float32), np.zeros(1, dtype=np.float32))
+else:
+    _unit_dot = np.dot
+
+
+def unit_normalize(vector: np.ndarray) -> np.ndarray:
+    """
+    Scale a vector to unit length as float32, the dtype the kernel is compiled for.
+
+    Args:
+        vector: Embedding to normalize
+
+    Returns:
+        np.ndarray: Unit-length float32 copy of the vector
+    """
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def unit_dot(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Cosine similarity of two unit-length float32 vectors.
+
+    Args:
+        a: First normalized embedding
+        b: Second normalized embedding
+
+    Returns:
+        float: Dot product of the vectors
+    """
+    return float(_unit_dot(a, b))
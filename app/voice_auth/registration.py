@@ -3,13 +3,22 @@ Voice print registration module for the Whisper Voice Auth microservice.
 """
 import os
 import uuid
-import pickle
+import asyncio
 import logging
 import numpy as np
 from pathlib import Path
 from typing import Tuple, List
-from app.voice_auth.verification import get_voice_embedding, VOICEPRINT_DIR
+from resemblyzer import preprocess_wav
+from app.voice_auth.verification import (
+    get_voice_embeddings,
+    run_embedding,
+    write_voiceprint,
+    VOICEPRINT_DIR,
+    OWNER_VOICEPRINT_FILE,
+)
 from app.utils.security import encrypt_data
+from app.utils.similarity import unit_normalize
+from app.hybrid.cache import clear_transcription_cache
 
 logger = logging.getLogger(__name__)
 
@@ -28,14 +37,9 @@ async def register_voice_print(audio_paths: List[Path]) -> Tuple[bool, str]:
         if not audio_paths:
             raise ValueError("No audio files provided for voice registration")
         
-        # Extract embeddings from all audio files
-        embeddings = []
-        for audio_path in audio_paths:
-            embedding = get_voice_embedding(audio_path)
-            embeddings.append(embedding)
-        
-        # Create average embedding as the voiceprint
-        voiceprint = np.mean(embeddings, axis=0)
+        # Load the samples in parallel, then embed them together (off the event loop)
+        wavs = await asyncio.gather(*(asyncio.to_thread(preprocess_wav, str(audio_path)) for audio_path in audio_paths))
+        voiceprint = await run_embedding(build_voice_print, wavs)
         
         # Generate a unique ID for this voiceprint
         voice_id = str(uuid.uuid4())
@@ -43,6 +47,9 @@ async def register_voice_print(audio_paths: List[Path]) -> Tuple[bool, str]:
         # Save the voiceprint
         await save_voice_print(voiceprint, "owner")
         
+        # Cached results may hold speaker checks against the old voiceprint
+        clear_transcription_cache()
+        
         logger.info(f"Voice print registered successfully with ID: {voice_id}")
         return True, voice_id
     
@@ -51,6 +58,23 @@ async def register_voice_print(audio_paths: List[Path]) -> Tuple[bool, str]:
         return False, ""
 
 
+def build_voice_print(wavs: List[np.ndarray]) -> np.ndarray:
+    """
+    Average the embeddings of several samples into a voiceprint.
+    
+    The voiceprint is stored at unit length, so verification compares it
+    with a probe embedding by a plain dot product.
+    
+    Args:
+        wavs: Preprocessed waveforms of the speaker's voice
+        
+    Returns:
+        np.ndarray: Unit-length float32 voiceprint
+    """
+    embeddings = get_voice_embeddings(wavs).astype(np.float32, copy=False)
+    return unit_normalize(embeddings.mean(axis=0))
+
+
 async def save_voice_print(voiceprint: np.ndarray, user_id: str) -> bool:
     """
     Save a voice print to storage.
@@ -63,24 +87,20 @@ async def save_voice_print(voiceprint: np.ndarray, user_id: str) -> bool:
         bool: Success status
     """
     try:
-        # Ensure directory exists
-        VOICEPRINT_DIR.mkdir(parents=True, exist_ok=True)
-        
         # Define path for the voiceprint
         if user_id == "owner":
-            voiceprint_path = VOICEPRINT_DIR / "owner_voiceprint.pkl"
+            voiceprint_path = VOICEPRINT_DIR / OWNER_VOICEPRINT_FILE
         else:
-            voiceprint_path = VOICEPRINT_DIR / f"{user_id}_voiceprint.pkl"
+            voiceprint_path = VOICEPRINT_DIR / f"{user_id}_voiceprint.npy"
         
         # In production, encrypt the voiceprint
-        # serialized = pickle.dumps(voiceprint)
+        # serialized = voiceprint.astype(np.float32).tobytes()
         # encrypted_data = encrypt_data(serialized)
         # with open(voiceprint_path, "wb") as f:
         #     f.write(encrypted_data)
         
-        # For development, save without encryption
-        with open(voiceprint_path, "wb") as f:
-            pickle.dump(voiceprint, f)
+        # For development, save without encryption (off the event loop)
+        await asyncio.to_thread(write_voiceprint, voiceprint_path, voiceprint)
         
         logger.info(f"Saved voice print for user {user_id} at {voiceprint_path}")
         return True
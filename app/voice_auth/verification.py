@@ -3,33 +3,65 @@ Speaker verification module for the Whisper Voice Auth microservice.
 """
 import os
 import pickle
+import asyncio
 import logging
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Tuple, List, Optional
+from typing import Any, Callable, Tuple, List, Optional
 import torch
-from resemblyzer import VoiceEncoder, preprocess_wav
+from resemblyzer import VoiceEncoder, preprocess_wav, audio as resemblyzer_audio
 from app.utils.config import load_config
+from app.audio.processor import load_audio_samples, TARGET_SAMPLE_RATE
+from app.utils.similarity import unit_dot, unit_normalize
 
 logger = logging.getLogger(__name__)
 
 # Load configuration
 config = load_config()
 VERIFICATION_THRESHOLD = config.get("auth", {}).get("speaker_verification_threshold", 0.75)
+EMBEDDING_WORKERS = max(1, int(config.get("auth", {}).get("embedding_workers", 1)))
+# Partial-utterance settings, resemblyzer's embed_utterance defaults
+PARTIALS_RATE = 1.3
+PARTIALS_MIN_COVERAGE = 0.75
 
 # Path to stored voice prints
 VOICEPRINT_DIR = Path(os.environ.get("WHISPER_VOICEPRINT_DIR", "app/storage/voiceprints"))
 VOICEPRINT_DIR.mkdir(parents=True, exist_ok=True)
+OWNER_VOICEPRINT_FILE = "owner_voiceprint.npy"
+LEGACY_OWNER_VOICEPRINT_FILE = "owner_voiceprint.pkl"  # Pickled by earlier versions
+
+# Unit-length owner voiceprint, keyed by the stored file's (mtime_ns, size)
+_owner_reference: Optional[Tuple[Tuple[int, int], np.ndarray]] = None
+
+# Encoder forward passes get their own threads: they don't tie up the default pool
+# used for file I/O, and at most EMBEDDING_WORKERS of them share the device at once
+_embedding_executor = ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS, thread_name_prefix="voice-embedding")
 
 # Initialize voice encoder
 try:
-    voice_encoder = VoiceEncoder()
+    voice_encoder = VoiceEncoder().eval()
     logger.info("Voice encoder initialized successfully")
 except Exception as e:
     logger.error(f"Failed to initialize voice encoder: {str(e)}")
     voice_encoder = None
 
 
+async def run_embedding(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run a function that uses the voice encoder on the embedding threads.
+    
+    Args:
+        func: Function to call
+        *args: Positional arguments for func
+        
+    Returns:
+        Any: The function's result
+    """
+    return await asyncio.get_running_loop().run_in_executor(_embedding_executor, func, *args)
+
+
+@torch.inference_mode()
 def get_voice_embedding(audio_path: Path) -> np.ndarray:
     """
     Extract voice embedding from audio file.
@@ -43,14 +75,50 @@ def get_voice_embedding(audio_path: Path) -> np.ndarray:
     if voice_encoder is None:
         raise RuntimeError("Voice encoder not initialized")
     
-    # Preprocess WAV file for the encoder
-    wav = preprocess_wav(str(audio_path))
+    # Preprocess the samples for the encoder; decoding is shared with local transcription
+    wav = preprocess_wav(load_audio_samples(audio_path), source_sr=TARGET_SAMPLE_RATE)
     
     # Extract embedding
     embedding = voice_encoder.embed_utterance(wav)
     return embedding
 
 
+@torch.inference_mode()
+def get_voice_embeddings(wavs: List[np.ndarray]) -> np.ndarray:
+    """
+    Extract voice embeddings from several preprocessed waveforms at once.
+    
+    The partial utterances of all waveforms go through the encoder in one
+    batched forward pass; each embedding is then the normalized mean of
+    its own partials, as resemblyzer's embed_utterance computes it.
+    
+    Args:
+        wavs: Waveforms returned by preprocess_wav
+        
+    Returns:
+        np.ndarray: One unit-length embedding row per waveform
+    """
+    if voice_encoder is None:
+        raise RuntimeError("Voice encoder not initialized")
+    
+    mels = []
+    partial_counts = []
+    for wav in wavs:
+        wav_slices, mel_slices = voice_encoder.compute_partial_slices(len(wav), PARTIALS_RATE, PARTIALS_MIN_COVERAGE)
+        max_wave_length = wav_slices[-1].stop
+        if max_wave_length >= len(wav):
+            wav = np.pad(wav, (0, max_wave_length - len(wav)), "constant")
+        mel = resemblyzer_audio.wav_to_mel_spectrogram(wav)
+        mels.extend(mel[mel_slice] for mel_slice in mel_slices)
+        partial_counts.append(len(mel_slices))
+    
+    partial_embeds = voice_encoder(torch.from_numpy(np.array(mels)).to(voice_encoder.device)).cpu().numpy()
+    embeddings = np.stack([
+        partials.mean(axis=0) for partials in np.split(partial_embeds, np.cumsum(partial_counts)[:-1])
+    ])
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
 async def verify_speaker(audio_path: Path) -> Tuple[bool, float]:
     """
     Verify if the speaker in the audio matches the stored voiceprint.
@@ -63,16 +131,16 @@ async def verify_speaker(audio_path: Path) -> Tuple[bool, float]:
     """
     try:
         # Get the voiceprint
-        owner_voiceprint = load_owner_voiceprint()
-        if owner_voiceprint is None:
+        owner_reference = get_owner_reference()
+        if owner_reference is None:
             logger.warning("No owner voiceprint found. Verification failed.")
             return False, 0.0
         
-        # Extract embedding from the input audio
-        new_embedding = get_voice_embedding(audio_path)
+        # Extract embedding from the input audio (off the event loop, it's a full forward pass)
+        new_embedding = await run_embedding(get_voice_embedding, audio_path)
         
-        # Calculate similarity score
-        similarity = cosine_similarity(new_embedding, owner_voiceprint)
+        # Calculate similarity score (only the probe still needs normalizing)
+        similarity = unit_dot(unit_normalize(new_embedding), owner_reference)
         
         # Check if the score is above the threshold
         is_verified = similarity >= VERIFICATION_THRESHOLD
@@ -85,6 +153,54 @@ async def verify_speaker(audio_path: Path) -> Tuple[bool, float]:
         return False, 0.0
 
 
+def owner_voiceprint_version() -> Optional[Tuple[int, int]]:
+    """
+    Get the version of the stored owner voiceprint.
+    
+    Cached results that include a speaker check are keyed by it, so a
+    re-registration handled by any worker invalidates them in every worker.
+    
+    Returns:
+        Optional[Tuple[int, int]]: The file's (mtime_ns, size), or None if there is no voiceprint
+    """
+    try:
+        stat_result = (VOICEPRINT_DIR / OWNER_VOICEPRINT_FILE).stat()
+    except FileNotFoundError:
+        return None
+    return (stat_result.st_mtime_ns, stat_result.st_size)
+
+
+def get_owner_reference() -> Optional[np.ndarray]:
+    """
+    Get the unit-length owner voiceprint used for verification.
+    
+    The stored voiceprint is loaded and normalized once, and reloaded
+    only when the file changes (e.g. after re-registration by any worker).
+    
+    Returns:
+        Optional[np.ndarray]: Normalized owner voiceprint or None if not found
+    """
+    global _owner_reference
+    voiceprint_path = VOICEPRINT_DIR / OWNER_VOICEPRINT_FILE
+    
+    try:
+        stat_result = voiceprint_path.stat()
+    except FileNotFoundError:
+        if not migrate_legacy_voiceprint():
+            _owner_reference = None
+            return None
+        stat_result = voiceprint_path.stat()
+    
+    version = (stat_result.st_mtime_ns, stat_result.st_size)
+    if _owner_reference is None or _owner_reference[0] != version:
+        voiceprint = load_owner_voiceprint()
+        if voiceprint is None:
+            return None
+        _owner_reference = (version, unit_normalize(voiceprint))
+    
+    return _owner_reference[1]
+
+
 def load_owner_voiceprint() -> Optional[np.ndarray]:
     """
     Load the owner's voiceprint from storage.
@@ -92,21 +208,64 @@ def load_owner_voiceprint() -> Optional[np.ndarray]:
     Returns:
         Optional[np.ndarray]: Owner's voiceprint embedding or None if not found
     """
-    voiceprint_path = VOICEPRINT_DIR / "owner_voiceprint.pkl"
+    voiceprint_path = VOICEPRINT_DIR / OWNER_VOICEPRINT_FILE
     
     if not voiceprint_path.exists():
         return None
     
     try:
-        with open(voiceprint_path, "rb") as f:
-            # In production, this should be decrypted using app.utils.security.decrypt_data
-            voiceprint = pickle.load(f)
-        return voiceprint
+        # In production, this should be decrypted using app.utils.security.decrypt_data.
+        # A raw .npy array needs no unpickling, so loading it can't run code.
+        return np.load(voiceprint_path, allow_pickle=False)
     except Exception as e:
         logger.error(f"Error loading owner voiceprint: {str(e)}")
         return None
 
 
+def write_voiceprint(voiceprint_path: Path, voiceprint: np.ndarray) -> None:
+    """
+    Store a voiceprint as a float32 .npy file.
+    
+    The file is written under a temporary name, flushed to disk and renamed
+    into place, so other workers never load a partly written voiceprint and
+    a crash never leaves an empty one. Missing directories are created.
+    
+    Args:
+        voiceprint_path: Destination .npy file
+        voiceprint: Voice embedding to store
+    """
+    voiceprint_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = voiceprint_path.with_name(f"{voiceprint_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.asarray(voiceprint, dtype=np.float32), allow_pickle=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, voiceprint_path)
+
+
+def migrate_legacy_voiceprint() -> bool:
+    """
+    Convert a pickled owner voiceprint from an earlier version to .npy.
+    
+    Returns:
+        bool: True if a legacy voiceprint was converted
+    """
+    legacy_path = VOICEPRINT_DIR / LEGACY_OWNER_VOICEPRINT_FILE
+    if not legacy_path.exists():
+        return False
+    
+    try:
+        with open(legacy_path, "rb") as f:
+            voiceprint = pickle.load(f)
+        write_voiceprint(VOICEPRINT_DIR / OWNER_VOICEPRINT_FILE, voiceprint)
+        legacy_path.unlink(missing_ok=True)
+        logger.info(f"Converted legacy voiceprint {legacy_path} to {OWNER_VOICEPRINT_FILE}")
+        return True
+    except Exception as e:
+        logger.error(f"Error converting legacy voiceprint: {str(e)}")
+        return False
+
+
 def cosine_similarity(embedding1: np.ndarray, embedding2: np.ndarray) -> float:
     """
     Calculate cosine similarity between two embeddings.
@@ -118,11 +277,4 @@ def cosine_similarity(embedding1: np.ndarray, embedding2: np.ndarray) -> float:
     Returns:
         float: Cosine similarity score (0-1)
     """
-    # Normalize the embeddings
-    embedding1 = embedding1 / np.linalg.norm(embedding1)
-    embedding2 = embedding2 / np.linalg.norm(embedding2)
-    
-    # Calculate cosine similarity
-    similarity = np.dot(embedding1, embedding2)
-    
-    return similarity
+    return unit_dot(unit_normalize(embedding1), unit_normalize(embedding2))
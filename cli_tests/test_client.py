@@ -5,51 +5,59 @@ This script allows registering a voice print and testing voice verification.
 """
 import argparse
 import os
+from contextlib import ExitStack
 import requests
-import json
+import orjson
 from pathlib import Path
 
 
-def register_voice(api_url, api_key, audio_files):
-    """Register voice print with audio files."""
-    files = [('audio_files', (os.path.basename(f), open(f, 'rb'), 'audio/wav')) for f in audio_files]
-    
-    headers = {
+def create_session(api_key):
+    """Create an HTTP session that keeps its connection to the service open between calls."""
+    session = requests.Session()
+    session.headers.update({
         'X-API-Key': api_key,
-    }
-    
-    response = requests.post(
-        f"{api_url}/api/v1/voice/register",
-        headers=headers,
-        files=files
-    )
+    })
+    return session
+
+
+def register_voice(session, api_url, audio_files):
+    """Register voice print with audio files."""
+    # The uploads are closed as soon as the request has been sent
+    with ExitStack() as stack:
+        files = [
+            ('audio_files', (os.path.basename(f), stack.enter_context(open(f, 'rb')), 'audio/wav'))
+            for f in audio_files
+        ]
+        
+        response = session.post(
+            f"{api_url}/api/v1/voice/register",
+            files=files
+        )
     
     print(f"Status code: {response.status_code}")
-    print(json.dumps(response.json(), indent=2))
+    result = orjson.loads(response.content)
+    print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
     
-    return response.json()
+    return result
 
 
-def verify_voice(api_url, api_key, audio_file):
+def verify_voice(session, api_url, audio_file):
     """Verify voice with an audio file."""
-    files = {
-        'audio_file': (os.path.basename(audio_file), open(audio_file, 'rb'), 'audio/wav')
-    }
-    
-    headers = {
-        'X-API-Key': api_key,
-    }
-    
-    response = requests.post(
-        f"{api_url}/api/v1/voice/verify",
-        headers=headers,
-        files=files
-    )
+    with open(audio_file, 'rb') as f:
+        files = {
+            'audio_file': (os.path.basename(audio_file), f, 'audio/wav')
+        }
+        
+        response = session.post(
+            f"{api_url}/api/v1/voice/verify",
+            files=files
+        )
     
     print(f"Status code: {response.status_code}")
-    print(json.dumps(response.json(), indent=2))
+    result = orjson.loads(response.content)
+    print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
     
-    return response.json()
+    return result
 
 
 def main():
@@ -69,12 +77,13 @@ def main():
     
     args = parser.parse_args()
     
-    if args.command == 'register':
-        register_voice(args.url, args.key, args.audio_files)
-    elif args.command == 'verify':
-        verify_voice(args.url, args.key, args.audio_file)
-    else:
-        parser.print_help()
+    with create_session(args.key) as session:
+        if args.command == 'register':
+            register_voice(session, args.url, args.audio_files)
+        elif args.command == 'verify':
+            verify_voice(session, args.url, args.audio_file)
+        else:
+            parser.print_help()
 
 
 if __name__ == '__main__':
@@ -3,6 +3,7 @@
 Generate a secure encryption key for Whisper Voice Auth microservice.
 """
 import base64
+import fileinput
 import os
 from cryptography.fernet import Fernet
 
@@ -18,23 +19,22 @@ print(f"WHISPER_ENCRYPTION_KEY={key_str}\n")
 # Update .env file if it exists
 env_file = '.env'
 if os.path.exists(env_file):
-    with open(env_file, 'r') as f:
-        env_content = f.read()
+    # Rewrite the file in place, one line at a time
+    found = False
+    ends_with_newline = True
+    for line in fileinput.input(env_file, inplace=True):
+        if line.startswith('WHISPER_ENCRYPTION_KEY='):
+            print(f'WHISPER_ENCRYPTION_KEY={key_str}')
+            found = True
+        else:
+            print(line, end='')
+        ends_with_newline = line.endswith('\n')
     
-    # Replace existing key or add new one
-    if 'WHISPER_ENCRYPTION_KEY=' in env_content:
-        lines = env_content.split('\n')
-        updated_lines = []
-        for line in lines:
-            if line.startswith('WHISPER_ENCRYPTION_KEY='):
-                updated_lines.append(f'WHISPER_ENCRYPTION_KEY={key_str}')
-            else:
-                updated_lines.append(line)
-        updated_content = '\n'.join(updated_lines)
-    else:
-        updated_content = env_content + f'\nWHISPER_ENCRYPTION_KEY={key_str}\n'
-    
-    with open(env_file, 'w') as f:
-        f.write(updated_content)
+    # Add the key if there was none
+    if not found:
+        with open(env_file, 'a') as f:
+            if not ends_with_newline:
+                f.write('\n')
+            f.write(f'WHISPER_ENCRYPTION_KEY={key_str}\n')
     
     print(f"Updated {env_file} with the new encryption key.")
@@ -6,63 +6,167 @@ This script helps you record audio samples that can be used to register your voi
 import os
 import time
 import argparse
+import threading
 import wave
+from collections import deque
+from pathlib import Path
 import numpy as np
 import pyaudio
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
 # Audio recording parameters
 RATE = 16000
 CHANNELS = 1
 CHUNK = 1024
 FORMAT = pyaudio.paInt16
 OUTPUT_DIR = "samples"
+VAD_THRESHOLD = 0  # Chunk RMS (int16 units) below which audio counts as silence; 0 keeps everything
+SILENCE_PAD = 0.3  # Seconds of each silent stretch that are kept around speech
+
+
+def chunk_rms(samples):
+    """Root mean square of an int16 chunk."""
+    total = 0.0
+    for i in range(samples.shape[0]):
+        total += float(samples[i]) * float(samples[i])
+    return np.sqrt(total / samples.shape[0]) if samples.shape[0] else 0.0
+
+
+if njit is not None:
+    chunk_rms = njit(cache=True, fastmath=True)(chunk_rms)
+    # Compile now rather than on the first captured buffer
+    chunk_rms(np.zeros(1, dtype=np.int16))
+else:
+    def chunk_rms(samples):
+        """Root mean square of an int16 chunk."""
+        return float(np.sqrt(np.mean(np.square(samples, dtype=np.float64)))) if samples.size else 0.0
 
-def record_audio(output_file, duration=10, rate=RATE, channels=CHANNELS, chunk=CHUNK):
-    """Record audio from microphone."""
-    p = pyaudio.PyAudio()
-    
-    # Open stream
-    stream = p.open(
-        format=FORMAT,
-        channels=channels,
-        rate=rate,
-        input=True,
-        frames_per_buffer=chunk
-    )
+class Microphone:
+    """Input stream kept open across recordings; captured buffers are dropped while nothing records."""
     
-    print(f"Recording for {duration} seconds...")
-    frames = []
+    def __init__(self, rate=RATE, channels=CHANNELS, chunk=CHUNK):
+        self.rate = rate
+        self.channels = channels
+        self.chunk = chunk
+        self._pa = pyaudio.PyAudio()
+        self.sample_width = self._pa.get_sample_size(FORMAT)
+        self._consumer = None
+        self._stream = self._pa.open(
+            format=FORMAT,
+            channels=channels,
+            rate=rate,
+            input=True,
+            frames_per_buffer=chunk,
+            stream_callback=self._callback
+        )
     
-    # Countdown
-    for i in range(3, 0, -1):
-        print(f"{i}...")
-        time.sleep(1)
+    def _callback(self, in_data, frame_count, time_info, status):
+        # Called on PortAudio's thread for every captured buffer
+        consumer = self._consumer
+        if consumer is not None and consumer(in_data, frame_count) and self._consumer is consumer:
+            self._consumer = None
+        return None, pyaudio.paContinue
     
-    print("GO! Recording...")
+    def capture(self, consumer):
+        """Pass captured buffers to consumer(in_data, frame_count) until it returns True."""
+        self._consumer = consumer
     
-    # Record audio
-    for _ in range(0, int(rate / chunk * duration)):
-        data = stream.read(chunk)
-        frames.append(data)
+    def is_active(self):
+        return self._stream.is_active()
     
-    print("Done recording.")
+    def close(self):
+        self._consumer = None
+        self._stream.stop_stream()
+        self._stream.close()
+        self._pa.terminate()
+
+
+def record_audio(output_file, duration=10, microphone=None, vad_threshold=VAD_THRESHOLD):
+    """Record audio from microphone, shortening silent stretches to SILENCE_PAD if vad_threshold is set.
     
-    # Stop and close the stream
-    stream.stop_stream()
-    stream.close()
-    p.terminate()
+    An open Microphone can be passed to reuse its stream; otherwise one is opened for this recording.
+    Returns the captured int16 samples (before trimming), interleaved if channels > 1.
+    """
+    if microphone is None:
+        microphone = Microphone()
+        try:
+            return record_audio(output_file, duration, microphone, vad_threshold)
+        finally:
+            microphone.close()
     
-    # Save the recorded audio
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    rate, channels, chunk = microphone.rate, microphone.channels, microphone.chunk
+    print(f"Recording for {duration} seconds...")
     
-    wf = wave.open(output_file, 'wb')
+    # Open the output first, so chunks are written as they are captured
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    wf = wave.open(os.fspath(output_file), 'wb')
     wf.setnchannels(channels)
-    wf.setsampwidth(p.get_sample_size(FORMAT))
+    wf.setsampwidth(microphone.sample_width)
     wf.setframerate(rate)
-    wf.writeframes(b''.join(frames))
-    wf.close()
     
+    # One preallocated buffer for the whole capture; chunks are copied into it, not appended
+    total = int(rate * duration)
+    samples = np.empty(total * channels, dtype=np.int16)
+    pos = 0
+    # Latest silent chunks (views of samples), written once speech follows them (the rest of the silence is dropped)
+    silence = deque(maxlen=max(1, int(SILENCE_PAD * rate / chunk)))
+    voiced = False
+    finished = threading.Event()
+    
+    def consume(in_data, frame_count):
+        nonlocal pos, voiced
+        frames = min(frame_count, total - pos // channels)
+        data = samples[pos:pos + frames * channels]
+        data[:] = np.frombuffer(in_data, dtype=np.int16, count=data.size)
+        pos += data.size
+        
+        if vad_threshold <= 0:
+            wf.writeframesraw(data)
+        elif chunk_rms(data) >= vad_threshold:
+            while silence:
+                wf.writeframesraw(silence.popleft())
+            wf.writeframesraw(data)
+            voiced = True
+        else:
+            silence.append(data)
+        if pos < samples.size:
+            return False
+        finished.set()
+        return True
+    
+    try:
+        # Countdown (the stream is already running, so capture starts right at "GO!")
+        for i in range(3, 0, -1):
+            print(f"{i}...")
+            time.sleep(1)
+        
+        print("GO! Recording...")
+        microphone.capture(consume)
+        
+        # Record audio (the header's sizes are patched once, on close); woken by the callback,
+        # with a periodic check in case the stream stops on its own
+        while not finished.wait(1.0):
+            if not microphone.is_active():
+                break
+    finally:
+        # Stop feeding this file, the stream stays open for the next recording
+        microphone.capture(None)
+        if voiced:
+            # Trailing silence, shortened like the rest
+            while silence:
+                wf.writeframesraw(silence.popleft())
+        wf.close()
+    
+    print("Done recording.")
+    if vad_threshold > 0 and not voiced:
+        print(f"Warning: no audio above the VAD threshold ({vad_threshold}) was captured")
     print(f"Audio saved to {output_file}")
+    return samples[:pos]
 
 
 def main():
@@ -70,29 +174,36 @@ def main():
     parser.add_argument('--samples', type=int, default=3, help='Number of samples to record')
     parser.add_argument('--duration', type=int, default=10, help='Duration of each sample in seconds')
     parser.add_argument('--output-dir', default=OUTPUT_DIR, help='Directory to save samples')
+    parser.add_argument('--chunk', type=int, default=CHUNK, help='Frames per capture buffer (lower for less latency)')
+    parser.add_argument('--vad-threshold', type=float, default=VAD_THRESHOLD,
+                        help='Chunk RMS below which audio is silence to trim, e.g. 300 (0 disables trimming)')
     
     args = parser.parse_args()
     
     # Create output directory
-    os.makedirs(args.output_dir, exist_ok=True)
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    sample_files = [output_dir / f"sample_{i}.wav" for i in range(1, args.samples + 1)]
     
     print(f"Will record {args.samples} samples, each {args.duration} seconds long.")
     print("Speak naturally during the recording. Read a text or count numbers.")
     print("Make sure you are in a quiet environment.")
     input("Press Enter to start recording...")
     
-    # Record samples
-    for i in range(1, args.samples + 1):
-        output_file = os.path.join(args.output_dir, f"sample_{i}.wav")
-        
-        print(f"\nRecording sample {i}/{args.samples}")
-        record_audio(output_file, duration=args.duration)
-        
-        if i < args.samples:
-            input("Press Enter to record the next sample...")
+    # Record samples, all from one input stream
+    microphone = Microphone(chunk=args.chunk)
+    try:
+        for i, output_file in enumerate(sample_files, start=1):
+            print(f"\nRecording sample {i}/{args.samples}")
+            record_audio(output_file, duration=args.duration, microphone=microphone, vad_threshold=args.vad_threshold)
+            
+            if i < args.samples:
+                input("Press Enter to record the next sample...")
+    finally:
+        microphone.close()
     
     print("\nAll samples recorded. You can now register your voice print using:")
-    print(f"./test_client.py register {' '.join([os.path.join(args.output_dir, f'sample_{i}.wav') for i in range(1, args.samples + 1)])}")
+    print(f"./test_client.py register {' '.join(map(os.fspath, sample_files))}")
 
 
 if __name__ == "__main__":
@@ -2,17 +2,34 @@
 """
 Test LLM integration for Whisper Voice Auth microservice.
 This script helps you test the integration with your Language Model API.
+Several texts are sent concurrently over one pooled connection.
 """
 import os
 import sys
-import json
 import argparse
-import requests
+import asyncio
+import httpx
+import orjson
 from dotenv import load_dotenv
 
+try:
+    import h2  # noqa: F401 - enables HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.3  # Seconds before the first retry, doubled for each further retry
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
 
 def test_llm_integration(text, api_url=None, api_key=None):
     """Test LLM API integration with sample text."""
+    return asyncio.run(test_llm_integration_many([text], api_url, api_key))[0]
+
+
+async def test_llm_integration_many(texts, api_url=None, api_key=None, concurrency=10):
+    """Test LLM API integration with several texts at once, returning one success flag per text."""
     # Load environment variables
     load_dotenv()
     
@@ -22,7 +39,7 @@ def test_llm_integration(text, api_url=None, api_key=None):
     
     if not api_url:
         print("Error: LLM API URL not provided. Use --api-url or set WHISPER_LLM_API_URL")
-        return False
+        return [False] * len(texts)
     
     # Prepare request
     headers = {
@@ -33,6 +50,22 @@ def test_llm_integration(text, api_url=None, api_key=None):
     if api_key:
         headers["Authorization"] = f"Bearer {api_key}"
     
+    # At most `concurrency` requests are in flight; the client reuses their connections
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    limits = httpx.Limits(max_connections=max(1, concurrency))
+    # Failed connection attempts are retried by the transport, error statuses per request.
+    # Over HTTP/2 (with httpx[http2] installed) the requests share multiplexed TLS connections
+    transport = httpx.AsyncHTTPTransport(limits=limits, retries=MAX_RETRIES, http2=HTTP2_AVAILABLE)
+    async with httpx.AsyncClient(headers=headers, transport=transport, timeout=30) as client:
+        async def send(text):
+            async with semaphore:
+                return await _send_test_request(client, api_url, text)
+        
+        return list(await asyncio.gather(*(send(text) for text in texts)))
+
+
+async def _send_test_request(client, api_url, text):
+    """Send one test payload and print its request and response together."""
     # Create payload
     payload = {
         "text": text,
@@ -46,54 +79,59 @@ def test_llm_integration(text, api_url=None, api_key=None):
         "source": "whisper_voice_auth",
     }
     
-    # Print request details
-    print("\n======= REQUEST =======")
-    print(f"URL: {api_url}")
-    print(f"Headers: {json.dumps(headers, indent=2)}")
-    print(f"Payload: {json.dumps(payload, indent=2)}")
+    # Request details (printed with the response, so concurrent reports don't interleave)
+    report = [
+        "\n======= REQUEST =======",
+        f"URL: {api_url}",
+        f"Headers: {_pretty(dict(client.headers))}",
+        f"Payload: {_pretty(payload)}",
+    ]
     
     try:
-        # Send request
-        response = requests.post(
-            api_url,
-            headers=headers,
-            json=payload,
-            timeout=30,
-        )
-        
-        # Print response
-        print("\n======= RESPONSE =======")
-        print(f"Status: {response.status_code}")
+        # Send request, retrying rate limits and server errors with exponential backoff
+        body = orjson.dumps(payload)
+        for attempt in range(MAX_RETRIES + 1):
+            if attempt:
+                await asyncio.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+            response = await client.post(api_url, content=body)
+            if response.status_code not in RETRY_STATUSES:
+                break
         
+        report += ["\n======= RESPONSE =======", f"Status: {response.status_code} ({response.http_version})"]
         try:
-            response_json = response.json()
-            print(f"Body: {json.dumps(response_json, indent=2)}")
-        except:
-            print(f"Body: {response.text}")
+            report.append(f"Body: {_pretty(orjson.loads(response.content))}")
+        except orjson.JSONDecodeError:
+            report.append(f"Body: {response.text}")
         
         # Check success
-        if response.status_code == 200:
-            print("\n✅ LLM integration test successful!")
-            return True
-        else:
-            print("\n❌ LLM integration test failed!")
-            return False
-            
+        success = response.status_code == 200
+        report.append("\n✅ LLM integration test successful!" if success else "\n❌ LLM integration test failed!")
+        
     except Exception as e:
-        print(f"\n❌ Error: {str(e)}")
-        return False
+        report.append(f"\n❌ Error: {str(e)}")
+        success = False
+    
+    print("\n".join(report))
+    return success
+
+
+def _pretty(value):
+    return orjson.dumps(value, option=orjson.OPT_INDENT_2).decode()
 
 
 def main():
     parser = argparse.ArgumentParser(description='Test LLM integration for Whisper Voice Auth')
-    parser.add_argument('text', help='Text to send to LLM API')
+    parser.add_argument('texts', nargs='+', help='Texts to send to LLM API (sent concurrently)')
     parser.add_argument('--api-url', help='LLM API URL')
     parser.add_argument('--api-key', help='LLM API Key')
+    parser.add_argument('--concurrency', type=int, default=10, help='Max requests in flight')
     
     args = parser.parse_args()
     
-    success = test_llm_integration(args.text, args.api_url, args.api_key)
-    sys.exit(0 if success else 1)
+    results = asyncio.run(test_llm_integration_many(args.texts, args.api_url, args.api_key, args.concurrency))
+    if len(results) > 1:
+        print(f"\n{sum(results)}/{len(results)} requests succeeded")
+    sys.exit(0 if all(results) else 1)
 
 
 if __name__ == "__main__":
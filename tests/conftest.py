@@ -0,0 +1,23 @@
+"""
+Shared fixtures for the Whisper Voice Auth tests.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+# The app is imported once for the session; modules that can't use it skip themselves
+try:
+    from app.main import app
+except ImportError:
+    app = None
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Test client shared by the whole session (None if the app can't be imported)."""
+    if app is None:
+        yield None
+        return
+    # Entering the client runs the app's lifespan: startup (model warm-up, cache loading)
+    # happens once before the first test, shutdown once after the last
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,281 @@
+"""
+Tests for the audio processing utilities.
+"""
+import io
+import os
+import asyncio
+import pytest
+from pathlib import Path
+from unittest.mock import patch, AsyncMock, Mock
+from fastapi import UploadFile
+
+try:
+    from app.audio import processor
+    PROCESSOR_IMPORTS_SUCCESSFUL = True
+except ImportError:
+    PROCESSOR_IMPORTS_SUCCESSFUL = False
+
+# Skip all processor-dependent tests if imports failed
+pytestmark = pytest.mark.skipif(not PROCESSOR_IMPORTS_SUCCESSFUL,
+                               reason="Audio processor imports failed, skipping processor tests")
+
+
+async def test_upload_is_read_in_chunks(tmp_path):
+    """Test that uploads are read in bounded chunks and passed to ffmpeg from memory."""
+    payload = b"RIFF\0\0\0\0WAVE" + b"x" * (processor.UPLOAD_CHUNK_SIZE * 2 + 123)
+    upload = UploadFile(file=io.BytesIO(payload), filename="sample.wav")
+    received = {}
+
+    async def fake_normalize(input_source, output_path):
+        received["source"] = input_source
+        Path(output_path).write_bytes(b"processed")
+
+    with patch.object(processor, "TEMP_DIR", tmp_path), \
+         patch.object(processor, "normalize_audio", side_effect=fake_normalize), \
+         patch.object(processor, "probe_duration", return_value=5.0), \
+         patch.object(upload, "read", wraps=upload.read) as mock_read:
+        processed_path = await processor.process_audio_file(upload)
+
+    assert received["source"] == payload
+    assert processed_path.exists()
+    # Nothing but the processed file is written to disk
+    assert list(tmp_path.iterdir()) == [processed_path]
+    # Every read must be bounded by the chunk size
+    assert all(call.args == (processor.UPLOAD_CHUNK_SIZE,) for call in mock_read.call_args_list)
+
+
+@pytest.mark.parametrize("filename, payload", [
+    ("sample.m4a", b"\0\0\0\x20ftypM4A \0\0\0\0" + b"x" * 64),
+    ("sample.mp3", b"not a recognisable header"),
+])
+async def test_seek_requiring_upload_gets_a_file(tmp_path, filename, payload):
+    """Test that MP4/M4A and unrecognised uploads reach ffmpeg as a file, not via a pipe."""
+    upload = UploadFile(file=io.BytesIO(payload), filename=filename)
+
+    process = AsyncMock()
+    process.communicate.return_value = (b"", b"")
+    process.returncode = 0
+
+    with patch.object(processor, "TEMP_DIR", tmp_path):
+        source, _, _ = await processor.receive_audio_file(upload)
+        assert isinstance(source, Path)
+        assert source.suffix == Path(filename).suffix
+        assert source.read_bytes() == payload
+
+        with patch("asyncio.create_subprocess_exec", return_value=process) as mock_exec:
+            await processor.normalize_audio(source, tmp_path / "out.wav")
+
+    argv = mock_exec.call_args.args
+    assert argv[argv.index("-i") + 1] == str(source)
+
+
+async def test_oversized_upload_rejected():
+    """Test that uploads above the in-memory limit are rejected."""
+    upload = UploadFile(file=io.BytesIO(b"x" * 10), filename="sample.wav")
+
+    with patch.object(processor, "MAX_UPLOAD_SIZE", 5):
+        with pytest.raises(ValueError, match="exceeds"):
+            await processor.receive_audio_file(upload)
+
+
+async def test_unsupported_upload_format():
+    """Test that unsupported extensions are rejected before anything is written."""
+    upload = UploadFile(file=io.BytesIO(b"data"), filename="sample.txt")
+
+    with pytest.raises(ValueError, match="Unsupported audio format"):
+        await processor.process_audio_file(upload)
+
+
+def test_get_audio_metadata_reads_header(tmp_path):
+    """Test that WAV metadata comes from the header."""
+    import numpy as np
+    import soundfile as sf
+
+    wav_path = tmp_path / "tone.wav"
+    sf.write(str(wav_path), np.zeros(16000 * 3, dtype=np.int16), 16000, subtype="PCM_16")
+
+    duration, metadata = processor.get_audio_metadata(wav_path)
+
+    assert duration == pytest.approx(3.0)
+    assert metadata["sample_rate"] == 16000
+    assert metadata["channels"] == 1
+    assert metadata["format"] == "wav"
+
+
+async def test_duration_rejected_before_transcode(tmp_path):
+    """Test that out-of-range durations are rejected without running ffmpeg."""
+    upload = UploadFile(file=io.BytesIO(b"data"), filename="sample.wav")
+
+    with patch.object(processor, "TEMP_DIR", tmp_path), \
+         patch.object(processor, "normalize_audio", new_callable=AsyncMock) as mock_normalize, \
+         patch.object(processor, "probe_duration", return_value=45.0):
+        with pytest.raises(ValueError, match="Audio duration must be between"):
+            await processor.process_audio_file(upload)
+
+    mock_normalize.assert_not_called()
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("url, content_type, expected", [
+    ("https://example.com/a", "audio/mpeg", ".mp3"),
+    ("https://example.com/a", "audio/wav; charset=binary", ".wav"),
+    ("https://example.com/a.flac?sig=abc", "application/octet-stream", ".flac"),
+    ("https://example.com/a.txt", "text/plain", None),
+])
+def test_get_url_audio_extension(url, content_type, expected):
+    """Test resolving the extension of downloaded audio."""
+    assert processor.get_url_audio_extension(url, content_type) == expected
+
+
+def test_probe_duration_from_bytes():
+    """Test that the duration of in-memory WAV audio is read from its header."""
+    import numpy as np
+    import soundfile as sf
+
+    buffer = io.BytesIO()
+    sf.write(buffer, np.zeros(8000 * 4, dtype=np.int16), 8000, format="WAV", subtype="PCM_16")
+
+    assert processor.probe_duration(buffer.getvalue()) == pytest.approx(4.0)
+    assert processor.probe_duration(b"not audio") is None
+
+
+def test_cleanup_temp_files_removes_only_stale_files(tmp_path):
+    """Test that the janitor only removes files older than the max age."""
+    import os
+    import time
+
+    stale = tmp_path / "processed_old.wav"
+    fresh = tmp_path / "processed_new.wav"
+    stale.write_bytes(b"old")
+    fresh.write_bytes(b"new")
+    old_time = time.time() - 600
+    os.utime(stale, (old_time, old_time))
+
+    with patch.object(processor, "TEMP_DIR", tmp_path):
+        removed = processor.cleanup_temp_files(max_age=300)
+
+    assert removed == 1
+    assert not stale.exists()
+    assert fresh.exists()
+
+
+@pytest.mark.parametrize("from_stdin", [True, False])
+async def test_normalize_audio_argv(tmp_path, from_stdin):
+    """Test the ffmpeg command line used for normalization."""
+    source = b"audio bytes" if from_stdin else tmp_path / "in.mp3"
+    output = tmp_path / "out.wav"
+
+    process = AsyncMock()
+    process.communicate.return_value = (b"", b"")
+    process.returncode = 0
+
+    with patch("asyncio.create_subprocess_exec", return_value=process) as mock_exec:
+        await processor.normalize_audio(source, output)
+
+    argv = mock_exec.call_args.args
+    assert argv[0] == "ffmpeg"
+    assert argv[argv.index("-i") + 1] == ("pipe:" if from_stdin else str(source))
+    assert argv[-1] == str(output)
+    assert argv[argv.index("-ar") + 1] == str(processor.TARGET_SAMPLE_RATE)
+    process.communicate.assert_awaited_once_with(source if from_stdin else None)
+
+
+async def test_normalize_audio_kills_ffmpeg_on_timeout(tmp_path):
+    """Test that a hung ffmpeg is killed and reaped when normalization times out."""
+    async def hang(input_data):
+        await asyncio.sleep(10)
+
+    process = AsyncMock()
+    process.communicate.side_effect = hang
+    process.kill = Mock()
+
+    with patch("asyncio.create_subprocess_exec", return_value=process), \
+         patch.object(processor, "FFMPEG_TIMEOUT", 0.01):
+        with pytest.raises(RuntimeError, match="timed out"):
+            await processor.normalize_audio(tmp_path / "in.mp3", tmp_path / "out.wav")
+
+    process.kill.assert_called_once()
+    process.wait.assert_awaited_once()
+
+
+def test_parse_wav_header():
+    """Test that WAV metadata is parsed inline from the leading bytes."""
+    import numpy as np
+    import soundfile as sf
+
+    buffer = io.BytesIO()
+    sf.write(buffer, np.zeros((8000 * 3, 2), dtype=np.int16), 8000, format="WAV", subtype="PCM_16")
+    data = buffer.getvalue()
+
+    header = processor.parse_wav_header(data[:processor.WAV_HEADER_SNIFF_SIZE], len(data))
+    assert header["sample_rate"] == 8000
+    assert header["channels"] == 2
+    assert header["bits_per_sample"] == 16
+    assert header["duration"] == pytest.approx(3.0)
+    assert header["data_size"] == 8000 * 3 * 4
+    assert data[header["data_offset"] - 8:header["data_offset"] - 4] == b"data"
+
+    # Streaming writers leave the data size unset; fall back to the byte count
+    data_offset = data.index(b"data")
+    streamed = data[:data_offset + 4] + b"\xff\xff\xff\xff" + data[data_offset + 8:]
+    assert processor.parse_wav_header(streamed, len(streamed))["duration"] == pytest.approx(3.0)
+
+    assert processor.parse_wav_header(b"ID3\x03" + b"\x00" * 100, 104) is None
+
+
+async def test_wav_header_skips_probe(tmp_path):
+    """Test that a parsed WAV header is used instead of probing the audio again."""
+    with patch.object(processor, "TEMP_DIR", tmp_path), \
+         patch.object(processor, "normalize_audio", new_callable=AsyncMock), \
+         patch.object(processor, "probe_duration") as mock_probe:
+        with pytest.raises(ValueError, match="Audio duration must be between"):
+            await processor.prepare_audio_file(b"audio", {"duration": 60.0})
+
+    mock_probe.assert_not_called()
+
+
+def test_get_audio_metadata_cached_until_file_changes(tmp_path):
+    """Test that headers are parsed once per file version."""
+    import numpy as np
+    import soundfile as sf
+
+    wav_path = tmp_path / "cached.wav"
+    sf.write(str(wav_path), np.zeros(16000 * 2, dtype=np.int16), 16000, subtype="PCM_16")
+
+    with patch.object(processor.sf, "info", wraps=processor.sf.info) as mock_info:
+        assert processor.get_audio_metadata(wav_path)[0] == pytest.approx(2.0)
+        assert processor.get_audio_metadata(wav_path)[0] == pytest.approx(2.0)
+        assert mock_info.call_count == 1
+
+        sf.write(str(wav_path), np.zeros(16000 * 3, dtype=np.int16), 16000, subtype="PCM_16")
+        assert processor.get_audio_metadata(wav_path)[0] == pytest.approx(3.0)
+        assert mock_info.call_count == 2
+
+        # A same-size file moved into place with the same mtime is a different inode
+        replacement = tmp_path / "replacement.wav"
+        sf.write(str(replacement), np.zeros(16000 * 3, dtype=np.int16), 8000, subtype="PCM_16")
+        mtime_ns = wav_path.stat().st_mtime_ns
+        os.utime(replacement, ns=(mtime_ns, mtime_ns))
+        os.replace(replacement, wav_path)
+        assert processor.get_audio_metadata(wav_path)[0] == pytest.approx(6.0)
+        assert mock_info.call_count == 3
+
+
+def test_load_audio_samples_decoded_once_per_file_version(tmp_path):
+    """Test that a clip is decoded once and shared until the file changes."""
+    import numpy as np
+    import soundfile as sf
+
+    wav_path = tmp_path / "samples.wav"
+    sf.write(str(wav_path), np.full(16000, 16384, dtype=np.int16), 16000, subtype="PCM_16")
+
+    with patch.object(processor.sf, "read", wraps=processor.sf.read) as mock_read:
+        samples = processor.load_audio_samples(wav_path)
+        assert processor.load_audio_samples(wav_path) is samples
+        assert mock_read.call_count == 1
+        assert samples.dtype == np.float32
+        assert samples[0] == pytest.approx(0.5)
+
+        sf.write(str(wav_path), np.zeros(8000, dtype=np.int16), 16000, subtype="PCM_16")
+        assert len(processor.load_audio_samples(wav_path)) == 8000
+        assert mock_read.call_count == 2
@@ -0,0 +1,44 @@
+"""
+Tests for the circuit breaker used around external services.
+"""
+from unittest.mock import patch
+
+from app.utils.circuit_breaker import CircuitBreaker, STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN
+
+
+def test_breaker_opens_after_consecutive_failures():
+    """Test that the breaker opens once fail_max is reached."""
+    breaker = CircuitBreaker("test", fail_max=3, reset_timeout=30)
+
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == STATE_CLOSED
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    assert not breaker.allow_request()
+
+
+def test_success_resets_failure_count():
+    """Test that a success clears the consecutive failure count."""
+    breaker = CircuitBreaker("test", fail_max=2, reset_timeout=30)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == STATE_CLOSED
+
+
+def test_half_open_allows_single_probe():
+    """Test that only one probe passes once the reset timeout elapses."""
+    breaker = CircuitBreaker("test", fail_max=1, reset_timeout=30)
+
+    with patch("app.utils.circuit_breaker.time.monotonic", return_value=100.0):
+        breaker.record_failure()
+    with patch("app.utils.circuit_breaker.time.monotonic", return_value=131.0):
+        assert breaker.state == STATE_HALF_OPEN
+        assert breaker.allow_request()
+        assert not breaker.allow_request()
+        breaker.record_success()
+        assert breaker.state == STATE_CLOSED
@@ -0,0 +1,168 @@
+"""
+Tests for the hybrid STT result cache.
+"""
+import pytest
+
+try:
+    from app.hybrid import cache
+    CACHE_IMPORTS_SUCCESSFUL = True
+except ImportError:
+    CACHE_IMPORTS_SUCCESSFUL = False
+
+# Skip all cache-dependent tests if imports failed
+pytestmark = pytest.mark.skipif(not CACHE_IMPORTS_SUCCESSFUL,
+                               reason="Cache imports failed, skipping cache tests")
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    """Start every test with an empty cache."""
+    cache.clear_transcription_cache()
+    yield
+    cache.clear_transcription_cache()
+
+
+def test_cache_roundtrip():
+    """Test that a stored result is returned for the same key."""
+    key = cache.make_cache_key("abc", language="ru", prompt=None)
+    result = {"source": "openai", "text": "привет", "metadata": {}}
+
+    assert cache.get_cached_result(key) is None
+    cache.cache_result(key, result)
+    assert cache.get_cached_result(key) == result
+
+
+def test_cache_key_depends_on_options():
+    """Test that different request options produce different keys."""
+    key_ru = cache.make_cache_key("abc", language="ru", verify_speaker=False)
+    key_en = cache.make_cache_key("abc", language="en", verify_speaker=False)
+    assert key_ru != key_en
+    assert key_ru == cache.make_cache_key("abc", verify_speaker=False, language="ru")
+
+
+def test_failed_results_not_cached():
+    """Test that error results are never cached."""
+    key = cache.make_cache_key("abc")
+    cache.cache_result(key, {"source": "error", "text": "Processing error", "metadata": {}})
+    assert cache.get_cached_result(key) is None
+
+
+def test_audio_fingerprint(tmp_path):
+    """Test that the fingerprint depends on the PCM samples only."""
+    import numpy as np
+    import soundfile as sf
+
+    samples = (np.sin(np.arange(16000) / 10) * 10000).astype(np.int16)
+    first = tmp_path / "first.wav"
+    second = tmp_path / "second.wav"
+    other = tmp_path / "other.wav"
+    sf.write(str(first), samples, 16000, subtype="PCM_16")
+    sf.write(str(second), samples, 16000, subtype="PCM_16")
+    sf.write(str(other), samples[::-1], 16000, subtype="PCM_16")
+
+    assert cache.audio_fingerprint(first) == cache.audio_fingerprint(second)
+    assert cache.audio_fingerprint(first) != cache.audio_fingerprint(other)
+    assert cache.audio_fingerprint(tmp_path / "missing.wav") is None
+    empty = tmp_path / "empty.wav"
+    empty.touch()
+    assert cache.audio_fingerprint(empty) is None
+
+
+def test_fingerprint_cache_returns_copies():
+    """Test that callers can't modify the cached fingerprint result."""
+    key = cache.make_cache_key("fp", language=None)
+    cache.cache_fingerprint_result(key, {"source": "local", "text": "hi", "metadata": {"speaker_match": None}})
+
+    hit = cache.get_fingerprint_result(key)
+    hit["metadata"]["speaker_match"] = 0.5
+    assert cache.get_fingerprint_result(key)["metadata"]["speaker_match"] is None
+
+
+def test_semantic_cache_lookup_and_eviction(tmp_path):
+    """Test nearest-neighbour lookup, the similarity threshold, LRU eviction and persistence."""
+    import numpy as np
+
+    semantic = cache.SemanticCache(max_size=2, threshold=0.9)
+    a = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    b = np.array([0.0, 1.0, 0.0], dtype=np.float32)
+    c = np.array([0.0, 0.0, 1.0], dtype=np.float32)
+
+    semantic.add("a", a, {"id": "a"})
+    semantic.add("b", b, {"id": "b"})
+    near_a = np.array([0.95, 0.05, 0.0], dtype=np.float32)
+    near_a /= np.linalg.norm(near_a)
+
+    similarity, value = semantic.lookup(near_a)
+    assert value == {"id": "a"}
+    assert similarity > 0.9
+    assert semantic.lookup(np.array([0.6, 0.8, 0.0], dtype=np.float32)) is None
+
+    # "a" was used most recently, so adding "c" evicts "b"
+    semantic.add("c", c, {"id": "c"})
+    assert len(semantic) == 2
+    assert semantic.lookup(b) is None
+    assert semantic.lookup(c)[1] == {"id": "c"}
+
+    path = tmp_path / "semantic.npz"
+    semantic.save(path)
+    restored = cache.SemanticCache(max_size=2, threshold=0.9)
+    restored.load(path)
+    assert restored.lookup(a)[1] == {"id": "a"}
+    assert restored.lookup(c)[1] == {"id": "c"}
+    assert [p.name for p in tmp_path.iterdir()] == ["semantic.npz"]
+    # Nothing in the file needs unpickling
+    with np.load(path, allow_pickle=False) as data:
+        assert data["texts"].dtype.kind == "U"
+
+
+def test_semantic_cache_hnsw_index_matches_linear_scan():
+    """Test that the HNSW index finds the same entries as a full scan, across evictions."""
+    import numpy as np
+    pytest.importorskip("faiss")
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((300, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    indexed = cache.SemanticCache(max_size=64, threshold=0.99, use_index=True)
+    scanned = cache.SemanticCache(max_size=64, threshold=0.99, use_index=False)
+    for i, vector in enumerate(vectors):
+        indexed.add(str(i), vector, {"id": i})
+        scanned.add(str(i), vector, {"id": i})
+
+    assert len(indexed) == 64
+    # Stale vectors are dropped when the index is rebuilt
+    assert len(indexed._index_texts) <= 2 * 64 + cache.HNSW_CANDIDATES
+    for vector in vectors:
+        expected = scanned.lookup(vector)
+        found = indexed.lookup(vector)
+        assert (found is None) == (expected is None)
+        if expected is not None:
+            assert found[1] == expected[1]
+
+
+async def test_openai_transcript_single_flight():
+    """Test that concurrent and repeated requests share one OpenAI call, and failures aren't cached."""
+    import asyncio
+
+    calls = []
+
+    async def transcribe():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "hello", 0.95, "en"
+
+    key = cache.make_cache_key("fp", language=None, prompt=None)
+    results = await asyncio.gather(*(cache.cached_openai_transcript(key, transcribe) for _ in range(5)))
+    assert results == [("hello", 0.95, "en")] * 5
+    assert await cache.cached_openai_transcript(key, transcribe) == ("hello", 0.95, "en")
+    assert len(calls) == 1
+
+    async def failing():
+        calls.append(1)
+        return None
+
+    other = cache.make_cache_key("other", language=None, prompt=None)
+    assert await cache.cached_openai_transcript(other, failing) is None
+    assert await cache.cached_openai_transcript(other, failing) is None
+    assert len(calls) == 3
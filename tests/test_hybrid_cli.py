@@ -4,6 +4,7 @@ Tests for the hybrid_stt.py CLI tool.
 import os
 import sys
 import pytest
+import orjson
 from unittest.mock import patch, MagicMock
 from pathlib import Path
 
@@ -20,25 +21,31 @@ except ImportError:
 pytestmark = pytest.mark.skipif(not HYBRID_CLI_IMPORTS_SUCCESSFUL, 
                                reason="CLI imports failed, skipping CLI-dependent tests")
 
-@pytest.fixture
-def sample_audio_path():
-    """Create a simple mock audio file for testing."""
-    # Create a temporary test file
-    import tempfile
-    temp = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-    temp.write(b"mock audio data")
-    temp.close()
-    return temp.name
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path):
+    """Keep cached results out of the user's cache directory."""
+    if not HYBRID_CLI_IMPORTS_SUCCESSFUL:
+        yield None
+        return
+    with patch("hybrid_stt.CACHE_DIR", tmp_path / "cache"):
+        yield tmp_path / "cache"
+
+
+@pytest.fixture(scope="session")
+def sample_audio_path(tmp_path_factory):
+    """Create a simple mock audio file for testing (once per session, tests must not modify it)."""
+    audio_file = tmp_path_factory.mktemp("audio") / "mock.wav"
+    audio_file.write_bytes(b"mock audio data")
+    return str(audio_file)
 
 
-@pytest.mark.asyncio
 async def test_process_audio_cli(sample_audio_path):
     """Test the CLI process_audio function."""
     if not HYBRID_CLI_IMPORTS_SUCCESSFUL:
         pytest.skip("CLI imports failed")
     
-    # Mock the required dependencies (only process_audio_hybrid now)
-    with patch("hybrid_stt.process_audio_hybrid") as mock_hybrid:
+    # Mock the required dependencies (only process_audio_hybrid now, imported on first use)
+    with patch("app.hybrid.controller.process_audio_hybrid") as mock_hybrid:
         # Setup the mock
         mock_hybrid.return_value = {
             "source": "local",
@@ -102,16 +109,15 @@ def test_cli_argument_parsing():
         assert mock_run.called, "asyncio.run should have been called"
 
 
-@pytest.mark.asyncio 
-async def test_cli_environment_variables():
-    """Test that CLI sets environment variables correctly."""
+async def test_cli_semantic_options():
+    """Test that CLI passes semantic options to the controller without touching the environment."""
     if not HYBRID_CLI_IMPORTS_SUCCESSFUL:
         pytest.skip("CLI imports failed")
     
     # Mock environment
     with patch.dict(os.environ, {}, clear=True):
-        # Mock the actual process_audio function to test env variable setting
-        with patch("hybrid_stt.process_audio_hybrid") as mock_process:
+        # Mock the controller to inspect the options it receives
+        with patch("app.hybrid.controller.process_audio_hybrid") as mock_process:
             mock_process.return_value = {
                 "source": "openai",
                 "text": "test",
@@ -126,6 +132,52 @@ async def test_cli_environment_variables():
             # Call process_audio with use_semantics=True
             await hybrid_stt.process_audio("/path/to/audio.wav", use_semantics=True, semantic_threshold=0.75)
             
-            # Check that environment variables were set
-            assert os.environ.get("WHISPER_HYBRID_STT_USE_SEMANTIC_VALIDATION") == "true"
-            assert os.environ.get("WHISPER_HYBRID_STT_SEMANTIC_THRESHOLD") == "0.75"
+            # Options are passed as arguments, not through process-global environment
+            call_kwargs = mock_process.call_args.kwargs
+            assert call_kwargs["use_semantics"] is True
+            assert call_kwargs["semantic_threshold"] == 0.75
+            assert "WHISPER_HYBRID_STT_USE_SEMANTIC_VALIDATION" not in os.environ
+            assert "WHISPER_HYBRID_STT_SEMANTIC_THRESHOLD" not in os.environ
+
+
+async def test_cached_result_skips_pipeline(sample_audio_path, cache_dir):
+    """Test that a repeated run with the same audio and options is served from the cache."""
+    if not HYBRID_CLI_IMPORTS_SUCCESSFUL:
+        pytest.skip("CLI imports failed")
+    
+    with patch("app.hybrid.controller.process_audio_hybrid") as mock_hybrid:
+        mock_hybrid.return_value = {"source": "local", "text": "cached text", "metadata": {"confidence": 0.9}}
+        
+        first = await hybrid_stt.process_audio(sample_audio_path)
+        second = await hybrid_stt.process_audio(sample_audio_path)
+        # Different options are a different entry
+        await hybrid_stt.process_audio(sample_audio_path, use_semantics=True)
+        # --no-cache always runs the pipeline
+        await hybrid_stt.process_audio(sample_audio_path, use_cache=False)
+    
+    assert second == first
+    assert mock_hybrid.call_count == 3
+    assert len(list(cache_dir.glob("*.json"))) == 2
+
+
+async def test_failed_and_speaker_checked_results_not_cached(sample_audio_path, cache_dir):
+    """Test that error results and speaker checks are not cached, and debug is left out."""
+    if not HYBRID_CLI_IMPORTS_SUCCESSFUL:
+        pytest.skip("CLI imports failed")
+    
+    with patch("app.hybrid.controller.process_audio_hybrid") as mock_hybrid:
+        mock_hybrid.return_value = {"source": "error", "text": "", "metadata": {}}
+        await hybrid_stt.process_audio(sample_audio_path)
+        await hybrid_stt.process_audio(sample_audio_path)
+        assert mock_hybrid.call_count == 2
+        
+        mock_hybrid.return_value = {"source": "local", "text": "hi", "metadata": {}, "debug": {"openai_status": "down"}}
+        await hybrid_stt.process_audio(sample_audio_path, verify_speaker=True)
+        await hybrid_stt.process_audio(sample_audio_path, verify_speaker=True)
+        assert mock_hybrid.call_count == 4
+        assert not list(cache_dir.glob("*.json"))
+        
+        await hybrid_stt.process_audio(sample_audio_path)
+    
+    (entry,) = cache_dir.glob("*.json")
+    assert "debug" not in orjson.loads(entry.read_bytes())
@@ -4,27 +4,49 @@ Tests for the hybrid STT configuration.
 import pytest
 import os
 import yaml
+from types import MappingProxyType
+from typing import Optional
 from unittest.mock import patch, mock_open
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from app.utils.config import YAML_LOADER
 
 # Path to the config file
 CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config.yaml")
 
-@pytest.fixture
+
+class HybridSTTConfig(BaseModel):
+    """Required hybrid_stt settings (strict: no coercion, but ints are accepted for floats)."""
+    model_config = ConfigDict(strict=True)
+    
+    whisper_url: str = Field(..., description="URL of the local Whisper service")
+    min_confidence: float = Field(..., description="Minimum local confidence before falling back")
+    min_speaker_match: float = Field(..., description="Minimum voice similarity with the owner")
+    timeout_local: float = Field(..., description="Local transcription timeout in seconds")
+    use_semantic_validation: bool = Field(..., description="Whether to compare local and remote texts")
+    semantic_model: Optional[str] = Field(None, description="Sentence-transformers model for semantic validation")
+    semantic_threshold: Optional[float] = Field(None, description="Semantic similarity threshold (0.0-1.0)")
+
+
+# Sample config for testing (read-only, shared by every test)
+SAMPLE_CONFIG = MappingProxyType({
+    "development_mode": True,
+    "hybrid_stt": MappingProxyType({
+        "whisper_url": "http://localhost:8000",
+        "remote_api_url": "https://api.example.com/stt",
+        "min_confidence": 0.85,
+        "min_speaker_match": 0.90,
+        "timeout_local": 5,
+        "use_semantic_validation": False,
+        "semantic_model": "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+        "semantic_threshold": 0.75
+    })
+})
+
+
+@pytest.fixture(scope="session")
 def sample_config():
     """Sample config for testing."""
-    return {
-        "development_mode": True,
-        "hybrid_stt": {
-            "whisper_url": "http://localhost:8000",
-            "remote_api_url": "https://api.example.com/stt",
-            "min_confidence": 0.85,
-            "min_speaker_match": 0.90,
-            "timeout_local": 5,
-            "use_semantic_validation": False,
-            "semantic_model": "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-            "semantic_threshold": 0.75
-        }
-    }
+    return SAMPLE_CONFIG
 
 
 def test_config_file_exists():
@@ -32,38 +54,32 @@ def test_config_file_exists():
     assert os.path.exists(CONFIG_PATH), f"Config file not found at {CONFIG_PATH}"
 
 
-def test_config_file_format():
-    """Test that the config file is valid YAML."""
+@pytest.fixture(scope="session")
+def parsed_config():
+    """config.yaml, read and parsed once per test session (tests must not modify it)."""
     try:
         with open(CONFIG_PATH, 'r') as f:
-            config = yaml.safe_load(f)
-        assert isinstance(config, dict), "Config file is not a valid YAML dictionary"
+            return yaml.load(f, Loader=YAML_LOADER)
     except yaml.YAMLError:
         pytest.fail("Config file is not valid YAML")
 
 
-def test_hybrid_stt_config_section():
+def test_config_file_format(parsed_config):
+    """Test that the config file is valid YAML."""
+    assert isinstance(parsed_config, dict), "Config file is not a valid YAML dictionary"
+
+
+def test_hybrid_stt_config_section(parsed_config):
     """Test that the hybrid_stt section exists in the config file."""
-    with open(CONFIG_PATH, 'r') as f:
-        config = yaml.safe_load(f)
+    config = parsed_config
     
     assert "hybrid_stt" in config, "hybrid_stt section not found in config file"
     
-    hybrid_config = config["hybrid_stt"]
-    
-    # Check required fields
-    assert "whisper_url" in hybrid_config, "whisper_url not found in hybrid_stt config"
-    assert "min_confidence" in hybrid_config, "min_confidence not found in hybrid_stt config"
-    assert "min_speaker_match" in hybrid_config, "min_speaker_match not found in hybrid_stt config"
-    assert "timeout_local" in hybrid_config, "timeout_local not found in hybrid_stt config"
-    assert "use_semantic_validation" in hybrid_config, "use_semantic_validation not found in hybrid_stt config"
-    
-    # Check data types
-    assert isinstance(hybrid_config["whisper_url"], str), "whisper_url should be a string"
-    assert isinstance(hybrid_config["min_confidence"], (int, float)), "min_confidence should be a number"
-    assert isinstance(hybrid_config["min_speaker_match"], (int, float)), "min_speaker_match should be a number"
-    assert isinstance(hybrid_config["timeout_local"], (int, float)), "timeout_local should be a number"
-    assert isinstance(hybrid_config["use_semantic_validation"], bool), "use_semantic_validation should be a boolean"
+    # Required fields and their types, validated in one pass
+    try:
+        HybridSTTConfig.model_validate(config["hybrid_stt"])
+    except ValidationError as e:
+        pytest.fail(f"Invalid hybrid_stt config: {e}")
 
 
 def test_config_loading_with_env_vars():
@@ -122,3 +138,32 @@ def test_semantic_model_loading():
         assert 0 <= SEMANTIC_THRESHOLD <= 1
     except ImportError:
         pytest.skip("App imports failed")
+
+
+def test_load_config_env_overrides(tmp_path, monkeypatch):
+    """Test that env overrides reach sections with underscores and are read once."""
+    from app.utils import config as config_module
+
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(yaml.safe_dump({"hybrid_stt": {"semantic_threshold": 0.75}}))
+    monkeypatch.setattr(config_module, "ENV_CONFIG_PATH", str(config_file))
+    monkeypatch.setenv("WHISPER_HYBRID_STT_SEMANTIC_THRESHOLD", "0.6")
+    monkeypatch.setenv("WHISPER_API_SECRET_KEY", "secret")
+
+    config_module.reload_config()
+    try:
+        config = config_module.load_config()
+        assert config["hybrid_stt"]["semantic_threshold"] == 0.6
+        assert config["api"]["secret_key"] == "secret"
+
+        # Later changes are only seen after an explicit reload
+        monkeypatch.setenv("WHISPER_HYBRID_STT_SEMANTIC_THRESHOLD", "0.9")
+        assert config_module.load_config()["hybrid_stt"]["semantic_threshold"] == 0.6
+        config_module.reload_config()
+        assert config_module.load_config()["hybrid_stt"]["semantic_threshold"] == 0.9
+
+        # Callers get independent copies
+        config_module.load_config()["hybrid_stt"]["semantic_threshold"] = 0.1
+        assert config_module.load_config()["hybrid_stt"]["semantic_threshold"] == 0.9
+    finally:
+        config_module.reload_config()
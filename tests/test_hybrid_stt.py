@@ -4,124 +4,147 @@ Tests for the Hybrid STT functionality.
 import pytest
 import os
 import json
+import orjson
+from contextlib import ExitStack
 from pathlib import Path
+from typing import Literal, Optional
 from unittest.mock import patch, MagicMock
-from fastapi.testclient import TestClient
-
-# Import only what we need to run basic tests
-try:
-    from app.main import app
-    from app.hybrid.controller import process_audio_hybrid, calculate_semantic_similarity
-    APP_IMPORTS_SUCCESSFUL = True
-except ImportError:
-    APP_IMPORTS_SUCCESSFUL = False
-    pass  # We'll skip tests that require these imports
-
-# Skip all app-dependent tests if imports failed
-pytestmark = pytest.mark.skipif(not APP_IMPORTS_SUCCESSFUL, 
-                               reason="App imports failed, skipping app-dependent tests")
-
-@pytest.fixture
-def client():
-    """Test client fixture."""
-    if APP_IMPORTS_SUCCESSFUL:
-        return TestClient(app)
-    return None
-
-@pytest.fixture
-def sample_audio_path():
-    """Create a simple mock audio file for testing."""
-    # Create a temporary test file if TEST_AUDIO_PATH is not set
-    if not os.environ.get("TEST_AUDIO_PATH"):
-        import tempfile
-        temp = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-        temp.write(b"mock audio data")
-        temp.close()
-        return temp.name
-    return os.environ.get("TEST_AUDIO_PATH")
-
-@pytest.fixture(autouse=True)
-def mock_dependencies():
-    """Mock dependencies to avoid actual processing."""
-    # Only apply mocks if imports were successful
-    if APP_IMPORTS_SUCCESSFUL:
-        with patch("app.audio.processor.process_audio_file") as mock_process:
-            with patch("app.transcription.speech_recognition.transcribe_audio") as mock_transcribe:
-                with patch("app.voice_auth.verification.verify_speaker") as mock_verify:
-                    with patch("app.hybrid.controller.process_audio_remote") as mock_remote:
-                        with patch("app.audio.processor.get_audio_metadata") as mock_metadata:
-                            # Setup the mocks
-                            mock_process.return_value = Path("/tmp/processed_audio.wav")
-                            mock_transcribe.return_value = ("тестовый текст", 0.95, "ru")
-                            mock_verify.return_value = (True, 0.92)
-                            mock_remote.return_value = {
-                                "source": "remote",
-                                "text": "тестовый текст (удаленный)",
-                                "metadata": {
-                                    "confidence": 0.88,
-                                    "speaker_match": 0.85,
-                                    "duration": 3.5,
-                                    "language": "ru",
-                                    "fallback_used": False
-                                }
-                            }
-                            mock_metadata.return_value = (3.5, {"sample_rate": 16000})
-                            yield
-
-
-def test_hybrid_stt_endpoint(client, sample_audio_path):
-    """Test the hybrid STT endpoint."""
-    if not client:
-        pytest.skip("Client not available")
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+
+
+def hybrid_controller():
+    """
+    Import the hybrid controller on first use, skipping the calling test if it's unavailable.
     
-    with open(sample_audio_path, "rb") as f:
-        response = client.post(
-            "/api/v1/hybrid/stt",
-            files={"audio_file": ("test.wav", f, "audio/wav")},
-            params={"verify_speaker": "false", "return_debug": "true"}
-        )
+    The controller pulls in torch and the semantic model stack, so only the
+    tests that exercise it import it.
+    """
+    controller = pytest.importorskip("app.hybrid.controller")
+    if not hasattr(controller, "calculate_semantic_similarity"):
+        pytest.skip("Hybrid controller lacks calculate_semantic_similarity, skipping app-dependent tests")
+    return controller
+
+
+class HybridMetadataSpec(BaseModel):
+    """Hybrid response metadata as specified (stricter than the API schema)."""
+    model_config = ConfigDict(strict=True)
     
-    assert response.status_code == 200
-    data = response.json()
-    assert "source" in data
-    assert "text" in data
-    assert "metadata" in data
-    assert "confidence" in data["metadata"]
-    assert "language" in data["metadata"]
+    confidence: float = Field(..., ge=0, le=1)
+    speaker_match: Optional[float] = Field(None, ge=0, le=1)
+    duration: float = Field(..., gt=0)
+    language: str
+    fallback_used: bool
+    semantic_diff: Optional[float] = Field(None, ge=0, le=1)
 
 
-def test_hybrid_stt_endpoint_with_semantics(client, sample_audio_path):
-    """Test the hybrid STT endpoint with semantic validation."""
-    if not client:
-        pytest.skip("Client not available")
+class HybridResponseSpec(BaseModel):
+    """Hybrid response as specified."""
+    model_config = ConfigDict(strict=True)
     
-    with open(sample_audio_path, "rb") as f:
-        response = client.post(
-            "/api/v1/hybrid/stt",
-            files={"audio_file": ("test.wav", f, "audio/wav")},
-            params={
-                "verify_speaker": "false", 
+    source: Literal["local", "remote"]
+    text: str
+    metadata: HybridMetadataSpec
+
+
+# Validator built once and shared by the tests
+HYBRID_RESPONSE = TypeAdapter(HybridResponseSpec)
+
+@pytest.fixture(scope="session")
+def sample_audio_path(tmp_path_factory):
+    """Create a simple mock audio file for testing (once per session, tests must not modify it)."""
+    # Use TEST_AUDIO_PATH if set, otherwise create a temporary test file
+    if os.environ.get("TEST_AUDIO_PATH"):
+        return os.environ["TEST_AUDIO_PATH"]
+    audio_file = tmp_path_factory.mktemp("audio") / "mock.wav"
+    audio_file.write_bytes(b"mock audio data")
+    return str(audio_file)
+
+@pytest.fixture(scope="session")
+def audio_bytes(sample_audio_path):
+    """Contents of the sample audio file, read once for request bodies."""
+    return Path(sample_audio_path).read_bytes()
+
+@pytest.fixture(scope="module")
+def mock_dependencies():
+    """
+    Mock dependencies to avoid actual processing (patched once for the module's tests that use it).
+    
+    Yields the mocks by name; a test that changes one must restore it.
+    """
+    # Skips every test that uses the mocks if the controller can't be imported
+    hybrid_controller()
+    
+    with ExitStack() as stack:
+        mock_process = stack.enter_context(patch("app.audio.processor.process_audio_file"))
+        mock_transcribe = stack.enter_context(patch("app.transcription.speech_recognition.transcribe_audio"))
+        mock_verify = stack.enter_context(patch("app.voice_auth.verification.verify_speaker"))
+        mock_remote = stack.enter_context(patch("app.hybrid.controller.process_audio_remote"))
+        mock_metadata = stack.enter_context(patch("app.audio.processor.get_audio_metadata"))
+        
+        # Setup the mocks
+        mock_process.return_value = Path("/tmp/processed_audio.wav")
+        mock_transcribe.return_value = ("тестовый текст", 0.95, "ru")
+        mock_verify.return_value = (True, 0.92)
+        mock_remote.return_value = {
+            "source": "remote",
+            "text": "тестовый текст (удаленный)",
+            "metadata": {
+                "confidence": 0.88,
+                "speaker_match": 0.85,
+                "duration": 3.5,
+                "language": "ru",
+                "fallback_used": False
+            }
+        }
+        mock_metadata.return_value = (3.5, {"sample_rate": 16000})
+        yield {
+            "process": mock_process,
+            "transcribe": mock_transcribe,
+            "verify": mock_verify,
+            "remote": mock_remote,
+            "metadata": mock_metadata,
+        }
+
+
+@pytest.mark.parametrize(
+    "params,expected_metadata",
+    [
+        ({"verify_speaker": "false", "return_debug": "true"}, ["confidence", "language"]),
+        (
+            {
+                "verify_speaker": "false",
                 "return_debug": "true",
                 "use_semantics": "true",
                 "semantic_threshold": "0.8"
-            }
-        )
+            },
+            ["fallback_used"],
+        ),
+    ],
+    ids=["basic", "with_semantics"],
+)
+def test_hybrid_stt_endpoint(client, audio_bytes, mock_dependencies, params, expected_metadata):
+    """Test the hybrid STT endpoint, with and without semantic validation."""
+    if not client:
+        pytest.skip("Client not available")
+    
+    response = client.post(
+        "/api/v1/hybrid/stt",
+        files={"audio_file": ("test.wav", audio_bytes, "audio/wav")},
+        params=params
+    )
     
     assert response.status_code == 200
-    data = response.json()
+    data = orjson.loads(response.content)
     assert "source" in data
     assert "text" in data
     assert "metadata" in data
-    assert "fallback_used" in data["metadata"]
+    for key in expected_metadata:
+        assert key in data["metadata"]
 
 
-@pytest.mark.asyncio
-async def test_process_audio_hybrid(sample_audio_path):
+async def test_process_audio_hybrid(sample_audio_path, mock_dependencies):
     """Test the hybrid audio processing function."""
-    if not APP_IMPORTS_SUCCESSFUL:
-        pytest.skip("App imports failed")
-    
-    result = await process_audio_hybrid(
+    result = await hybrid_controller().process_audio_hybrid(
         audio_path=Path(sample_audio_path),
         verify_speaker_flag=False,
         return_debug=True
@@ -140,10 +163,11 @@ def test_mock_semantic_similarity():
     """Test a mock version of the semantic similarity function."""
     # Simple mock version that doesn't require sentence-transformers
     def mock_calculate_similarity(text1, text2):
-        # Simple mock implementation
-        common_words = set(text1.lower().split()) & set(text2.lower().split())
-        total_words = set(text1.lower().split()) | set(text2.lower().split())
-        return len(common_words) / len(total_words) if total_words else 0
+        # Simple mock implementation (each text tokenized once)
+        words1 = set(text1.lower().split())
+        words2 = set(text2.lower().split())
+        total_words = words1 | words2
+        return len(words1 & words2) / len(total_words) if total_words else 0
     
     text1 = "Привет, как дела?"
     text2 = "Здравствуйте, как ваши дела?"
@@ -155,21 +179,20 @@ def test_mock_semantic_similarity():
 
 
 # Additional test for the controller with low confidence
-@pytest.mark.asyncio
-async def test_process_audio_hybrid_with_low_confidence(sample_audio_path):
+async def test_process_audio_hybrid_with_low_confidence(sample_audio_path, mock_dependencies):
     """Test hybrid processing with low confidence triggering fallback."""
-    if not APP_IMPORTS_SUCCESSFUL:
-        pytest.skip("App imports failed")
-    
-    # Setup specific mock for this test
-    with patch("app.transcription.speech_recognition.transcribe_audio") as mock_transcribe:
-        mock_transcribe.return_value = ("неуверенный текст", 0.7, "ru")  # Low confidence
-        
-        result = await process_audio_hybrid(
+    # Setup specific result for this test on the shared mock
+    mock_transcribe = mock_dependencies["transcribe"]
+    default_result = mock_transcribe.return_value
+    mock_transcribe.return_value = ("неуверенный текст", 0.7, "ru")  # Low confidence
+    try:
+        result = await hybrid_controller().process_audio_hybrid(
             audio_path=Path(sample_audio_path),
             verify_speaker_flag=False,
             return_debug=True
         )
+    finally:
+        mock_transcribe.return_value = default_result
     
     assert result["source"] == "remote"  # Should use remote due to low confidence
     assert result["metadata"]["fallback_used"] == True
@@ -191,24 +214,5 @@ def test_hybrid_response_format():
         }
     }
     
-    # Validate structure
-    assert "source" in sample_response
-    assert sample_response["source"] in ["local", "remote"]
-    assert "text" in sample_response
-    assert isinstance(sample_response["text"], str)
-    
-    # Validate metadata
-    metadata = sample_response["metadata"]
-    assert "confidence" in metadata
-    assert 0 <= metadata["confidence"] <= 1
-    assert "duration" in metadata
-    assert metadata["duration"] > 0
-    assert "language" in metadata
-    assert "fallback_used" in metadata
-    assert isinstance(metadata["fallback_used"], bool)
-    
-    # Optional fields
-    if "speaker_match" in metadata:
-        assert metadata["speaker_match"] is None or 0 <= metadata["speaker_match"] <= 1
-    if "semantic_diff" in metadata:
-        assert metadata["semantic_diff"] is None or 0 <= metadata["semantic_diff"] <= 1
+    # Validate structure, metadata and the optional fields in one pass
+    HYBRID_RESPONSE.validate_python(sample_response)
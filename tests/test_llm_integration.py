@@ -0,0 +1,170 @@
+"""
+Tests for the language model integration.
+"""
+import pytest
+from unittest.mock import patch
+
+try:
+    from app.llm import integration
+    LLM_IMPORTS_SUCCESSFUL = True
+except ImportError:
+    LLM_IMPORTS_SUCCESSFUL = False
+
+# Skip all tests if imports failed
+pytestmark = pytest.mark.skipif(not LLM_IMPORTS_SUCCESSFUL,
+                               reason="LLM imports failed, skipping LLM integration tests")
+
+
+class FakeResponse:
+    """Response context manager with a fixed status."""
+
+    def __init__(self, status):
+        self.status = status
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def read(self):
+        return b'{"response": "Lights on", "action": "lights_on"}'
+
+    async def text(self):
+        return "error"
+
+
+class FakeSession:
+    """Session that answers with the given statuses in order."""
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.calls = 0
+
+    def post(self, url, **kwargs):
+        self.calls += 1
+        self.body = kwargs["data"]
+        return FakeResponse(self.statuses.pop(0))
+
+
+@pytest.fixture
+def llm_settings():
+    with patch.object(integration, "LLM_API_URL", "http://llm.local/command"), \
+         patch.object(integration, "LLM_RETRY_BACKOFF", 0), \
+         patch.object(integration, "LLM_MAX_RETRIES", 2):
+        yield
+
+
+async def test_gateway_errors_are_retried(llm_settings):
+    """Test that 502/503/504 responses are retried until a success."""
+    session = FakeSession([503, 502, 200])
+    with patch.object(integration, "get_http_session", return_value=session):
+        result = await integration.process_command("turn on the lights", {})
+
+    assert session.calls == 3
+    assert result["success"]
+    assert result["action_taken"] == "lights_on"
+
+
+async def test_retries_are_bounded(llm_settings):
+    """Test that the last gateway error is reported once retries run out."""
+    session = FakeSession([504, 504, 504, 200])
+    with patch.object(integration, "get_http_session", return_value=session):
+        result = await integration.process_command("turn on the lights", {})
+
+    assert session.calls == 3
+    assert not result["success"]
+    assert "504" in result["response"]
+
+
+async def test_client_errors_are_not_retried(llm_settings):
+    """Test that other error statuses fail immediately."""
+    session = FakeSession([400, 200])
+    with patch.object(integration, "get_http_session", return_value=session):
+        result = await integration.process_command("turn on the lights", {})
+
+    assert session.calls == 1
+    assert not result["success"]
+
+
+async def test_payload_serializes_numpy_metadata(llm_settings):
+    """Test that numpy scalars in the metadata are sent as plain JSON numbers."""
+    import numpy as np
+    import orjson
+
+    session = FakeSession([200])
+    with patch.object(integration, "get_http_session", return_value=session):
+        result = await integration.process_command("turn on the lights", {"confidence": np.float32(0.5)})
+
+    assert result["success"]
+    assert orjson.loads(session.body)["metadata"] == {"confidence": 0.5}
+
+
+async def test_concurrent_commands_share_a_batch_request(llm_settings):
+    """Test that batched commands go out as one request and get their own results back."""
+    import asyncio
+    import orjson
+
+    class BatchResponse(FakeResponse):
+        def __init__(self, items):
+            super().__init__(200)
+            self.items = items
+
+        async def read(self):
+            return orjson.dumps({"results": [{"response": item["text"].upper()} for item in self.items]})
+
+    class BatchSession:
+        def __init__(self):
+            self.bodies = []
+
+        def post(self, url, **kwargs):
+            self.bodies.append(orjson.loads(kwargs["data"]))
+            return BatchResponse(self.bodies[-1]["items"])
+
+    session = BatchSession()
+    with patch.object(integration, "LLM_BATCH_SIZE", 8), \
+         patch.object(integration, "command_batcher", integration.CommandBatcher(8, 50)), \
+         patch.object(integration, "get_http_session", return_value=session):
+        results = await asyncio.gather(*(integration.process_command(text, {}) for text in ("on", "off", "dim")))
+
+    assert len(session.bodies) == 1
+    assert [item["text"] for item in session.bodies[0]["items"]] == ["on", "off", "dim"]
+    assert [result["response"] for result in results] == ["ON", "OFF", "DIM"]
+
+
+@pytest.mark.parametrize("batch_status, batch_body", [
+    (400, b"batches not supported"),
+    (200, b'{"results": {"response": "not a list"}}'),
+])
+async def test_rejected_batch_falls_back_to_single_commands(llm_settings, batch_status, batch_body):
+    """Test that commands are resent one by one when the API can't answer a batch."""
+    import asyncio
+    import orjson
+
+    class SingleResponse(FakeResponse):
+        def __init__(self, status, body):
+            super().__init__(status)
+            self.body = body
+
+        async def read(self):
+            return self.body
+
+    class SingleOnlySession:
+        def __init__(self):
+            self.bodies = []
+
+        def post(self, url, **kwargs):
+            body = orjson.loads(kwargs["data"])
+            self.bodies.append(body)
+            if "items" in body:
+                return SingleResponse(batch_status, batch_body)
+            return SingleResponse(200, orjson.dumps({"response": body["text"].upper()}))
+
+    session = SingleOnlySession()
+    with patch.object(integration, "LLM_BATCH_SIZE", 8), \
+         patch.object(integration, "command_batcher", integration.CommandBatcher(8, 50)), \
+         patch.object(integration, "get_http_session", return_value=session):
+        results = await asyncio.gather(*(integration.process_command(text, {}) for text in ("on", "off")))
+
+    assert len(session.bodies) == 3
+    assert [result["response"] for result in results] == ["ON", "OFF"]
@@ -3,185 +3,566 @@ Mock tests for OpenAI Whisper integration.
 """
 import pytest
 import os
+import re
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, Mock, patch
-from pathlib import Path
+
+from app.utils.config import load_config
+
+# Probe the modules under test once; each test class is skipped if its module is unavailable
+try:
+    from app.transcription import openai_whisper
+    from app.transcription.openai_whisper import (
+        transcribe_with_openai,
+        transcribe_audio_hybrid,
+        get_openai_status
+    )
+    from app.utils.circuit_breaker import CircuitBreaker
+    OPENAI_IMPORTS_SUCCESSFUL = True
+except ImportError:
+    OPENAI_IMPORTS_SUCCESSFUL = False
+
+try:
+    from app.hybrid import controller
+    from app.hybrid.controller import (
+        process_audio_hybrid,
+        stream_audio_hybrid,
+        get_hybrid_status,
+        translate_audio_hybrid
+    )
+    from app.hybrid.semantic import clear_embedding_cache
+    CONTROLLER_IMPORTS_SUCCESSFUL = True
+except ImportError:
+    CONTROLLER_IMPORTS_SUCCESSFUL = False
+
+requires_openai_whisper = pytest.mark.skipif(
+    not OPENAI_IMPORTS_SUCCESSFUL, reason="OpenAI whisper module not available"
+)
+requires_controller = pytest.mark.skipif(
+    not CONTROLLER_IMPORTS_SUCCESSFUL, reason="Hybrid controller not available"
+)
+
+# Error raised for files over the API's size limit
+OPENAI_LIMIT_RE = re.compile(r"exceeds OpenAI limit")
 
 # Test configuration
 @pytest.fixture
 def mock_openai_client():
-    """Mock OpenAI client for testing."""
-    mock_client = MagicMock()
-    mock_response = MagicMock()
-    mock_response.text = "Test transcription result"
-    mock_client.audio.transcriptions.create.return_value = mock_response
-    mock_client.audio.translations.create.return_value = mock_response
+    """Mock OpenAI client for testing (plain namespaces, only the API calls are mocks)."""
+    mock_response = SimpleNamespace(text="Test transcription result")
+    mock_client = SimpleNamespace(audio=SimpleNamespace(
+        transcriptions=SimpleNamespace(create=AsyncMock(return_value=mock_response)),
+        translations=SimpleNamespace(create=AsyncMock(return_value=mock_response)),
+    ))
     return mock_client
 
 
-@pytest.fixture
-def sample_audio_path(tmp_path):
-    """Create a temporary audio file for testing."""
-    audio_file = tmp_path / "test_audio.wav"
+@pytest.fixture(scope="session")
+def sample_audio_path(tmp_path_factory):
+    """Create a temporary audio file for testing (once per session, tests must not modify it)."""
+    audio_file = tmp_path_factory.mktemp("audio") / "test_audio.wav"
     # Create a small dummy file
     audio_file.write_bytes(b"fake audio data")
     return audio_file
 
 
+@requires_openai_whisper
 class TestOpenAIWhisperIntegration:
     """Test OpenAI Whisper API integration."""
     
     def test_openai_imports(self):
         """Test that OpenAI modules can be imported."""
-        try:
-            from app.transcription.openai_whisper import (
-                transcribe_with_openai,
-                transcribe_audio_hybrid,
-                get_openai_status
-            )
-            assert True, "OpenAI whisper module imported successfully"
-        except ImportError as e:
-            pytest.skip(f"OpenAI whisper module import failed: {e}")
+        assert callable(transcribe_with_openai)
+        assert callable(transcribe_audio_hybrid)
+        assert callable(get_openai_status)
     
-    @pytest.mark.asyncio
     async def test_get_openai_status(self):
         """Test getting OpenAI API status."""
-        try:
-            from app.transcription.openai_whisper import get_openai_status
-            
-            status = get_openai_status()
-            
-            assert isinstance(status, dict)
-            assert "openai_available" in status
-            assert "api_key_configured" in status
-            assert "model" in status
-            assert "fallback_enabled" in status
-            assert "max_file_size_mb" in status
-            
-        except ImportError:
-            pytest.skip("OpenAI whisper module not available")
+        status = get_openai_status()
+        
+        assert isinstance(status, dict)
+        assert "openai_available" in status
+        assert "api_key_configured" in status
+        assert "model" in status
+        assert "fallback_enabled" in status
+        assert "max_file_size_mb" in status
     
-    @pytest.mark.asyncio
     async def test_transcribe_with_openai_mock(self, mock_openai_client, sample_audio_path):
         """Test OpenAI transcription with mocked client."""
-        try:
-            from app.transcription.openai_whisper import transcribe_with_openai
+        with patch('app.transcription.openai_whisper.openai_client', mock_openai_client):
+            text, confidence, language = await transcribe_with_openai(sample_audio_path)
             
-            with patch('app.transcription.openai_whisper.openai_client', mock_openai_client):
-                text, confidence, language = await transcribe_with_openai(sample_audio_path)
-                
-                assert isinstance(text, str)
-                assert isinstance(confidence, float)
-                assert isinstance(language, str)
-                assert len(text) > 0
-                
-        except ImportError:
-            pytest.skip("OpenAI whisper module not available")
+            assert isinstance(text, str)
+            assert isinstance(confidence, float)
+            assert isinstance(language, str)
+            assert len(text) > 0
     
-    @pytest.mark.asyncio
     async def test_hybrid_transcription_fallback(self, sample_audio_path):
         """Test hybrid transcription fallback to local when OpenAI fails."""
-        try:
-            from app.transcription.openai_whisper import transcribe_audio_hybrid
+        # Mock OpenAI failure
+        with patch('app.transcription.openai_whisper.openai_client', None):
+            text, confidence, language, source = await transcribe_audio_hybrid(
+                sample_audio_path, detailed=True, use_openai_first=True
+            )
             
-            # Mock OpenAI failure
-            with patch('app.transcription.openai_whisper.openai_client', None):
-                text, confidence, language, source = await transcribe_audio_hybrid(
-                    sample_audio_path, detailed=True, use_openai_first=True
-                )
-                
-                # Should fallback to local or return error
-                assert source in ["local", "failed"]
-                assert isinstance(text, str)
-                assert isinstance(confidence, float)
-                assert isinstance(language, str)
-                
-        except ImportError:
-            pytest.skip("OpenAI whisper module not available")
+            # Should fallback to local or return error
+            assert source in ["local", "failed"]
+            assert isinstance(text, str)
+            assert isinstance(confidence, float)
+            assert isinstance(language, str)
     
-    @pytest.mark.asyncio
-    async def test_file_size_check(self, tmp_path):
-        """Test file size validation for OpenAI API."""
-        try:
-            from app.transcription.openai_whisper import transcribe_with_openai
+    async def test_speculative_local_after_openai_failures(self, sample_audio_path):
+        """Test that local transcription runs alongside OpenAI once OpenAI has failed."""
+        import asyncio
+        
+        started = asyncio.Event()
+        
+        async def fake_local(audio_path, detailed=True):
+            started.set()
+            return "local text", 0.8, "en"
+        
+        async def failing_openai(audio_path, language=None, prompt=None):
+            # The fallback must already be running while OpenAI is in flight
+            await asyncio.wait_for(started.wait(), timeout=1)
+            raise RuntimeError("OpenAI unavailable")
+        
+        breaker = CircuitBreaker("test", fail_max=5)
+        breaker.record_failure()
+        
+        with patch.object(openai_whisper, 'openai_client', MagicMock()), \
+             patch.object(openai_whisper, 'openai_breaker', breaker), \
+             patch.object(openai_whisper, 'FALLBACK_TO_LOCAL', True), \
+             patch.object(openai_whisper, 'transcribe_with_openai', failing_openai), \
+             patch.object(openai_whisper, 'local_transcribe', fake_local):
+            text, confidence, language, source = await openai_whisper.transcribe_audio_hybrid(
+                sample_audio_path, detailed=True, use_openai_first=True
+            )
+        
+        assert (text, source) == ("local text", "local")
+        assert breaker.consecutive_failures == 2
+    
+    async def test_upload_streams_file_handle(self, mock_openai_client, sample_audio_path):
+        """Test that the upload is passed as a file handle and closed even when the API fails."""
+        with patch('app.transcription.openai_whisper.openai_client', mock_openai_client):
+            await transcribe_with_openai(sample_audio_path)
+            uploaded = mock_openai_client.audio.transcriptions.create.call_args.kwargs["file"]
+            assert not isinstance(uploaded, (bytes, bytearray))
+            assert uploaded.closed
             
-            # Create a file that's "too large" (mock the size check)
-            large_file = tmp_path / "large_audio.wav"
-            large_file.write_bytes(b"x" * 100)  # Small file, but we'll mock the stat
+            mock_openai_client.audio.transcriptions.create.side_effect = RuntimeError("API error")
+            with pytest.raises(RuntimeError):
+                await transcribe_with_openai(sample_audio_path)
+            assert mock_openai_client.audio.transcriptions.create.call_args.kwargs["file"].closed
+    
+    async def test_disk_cache_reuses_response_for_same_content(self, mock_openai_client, tmp_path):
+        """Test that identical audio content is sent to OpenAI once per request options."""
+        first = tmp_path / "first.wav"
+        copy = tmp_path / "copy.wav"
+        first.write_bytes(b"fake audio data")
+        copy.write_bytes(b"fake audio data")
+        
+        with patch('app.transcription.openai_whisper.openai_client', mock_openai_client), \
+             patch('app.transcription.openai_whisper.OPENAI_CACHE_DIR', str(tmp_path / "cache")):
+            result = await transcribe_with_openai(first)
+            assert await transcribe_with_openai(copy) == result
+            assert mock_openai_client.audio.transcriptions.create.call_count == 1
             
-            # Mock file size to be larger than 25MB AND mock OpenAI client
-            with patch.object(Path, 'stat') as mock_stat, \
-                 patch('app.transcription.openai_whisper.openai_client', True):
-                mock_stat.return_value.st_size = 26 * 1024 * 1024  # 26MB
-                
-                with pytest.raises(ValueError, match="exceeds OpenAI limit"):
-                    await transcribe_with_openai(large_file)
-                    
-        except ImportError:
-            pytest.skip("OpenAI whisper module not available")
+            # Different options are a different request
+            await transcribe_with_openai(copy, language="en")
+            assert mock_openai_client.audio.transcriptions.create.call_count == 2
+        
+        assert len(list((tmp_path / "cache").glob("*.json"))) == 2
+    
+    async def test_file_size_check(self, tmp_path):
+        """Test file size validation for OpenAI API."""
+        # Create a file that's too large (sparse, so no data is written)
+        large_file = tmp_path / "large_audio.wav"
+        with open(large_file, "wb") as f:
+            f.truncate(26 * 1024 * 1024)  # 26MB
+        
+        # Mock OpenAI client
+        with patch('app.transcription.openai_whisper.openai_client', True):
+            with pytest.raises(ValueError, match=OPENAI_LIMIT_RE):
+                await transcribe_with_openai(large_file)
+
+
+    async def test_chunk_large_audio_uses_ffmpeg_segments(self, tmp_path):
+        """Test that large files are split by ffmpeg without decoding them in Python."""
+        import numpy as np
+        import soundfile as sf
+        
+        audio_path = tmp_path / "long.wav"
+        sf.write(str(audio_path), np.zeros(16000 * 10, dtype=np.int16), 16000, subtype="PCM_16")
+        
+        async def fake_communicate():
+            chunk_dir = tmp_path / "long_chunks"
+            for i in range(3):
+                (chunk_dir / f"chunk_{i:03d}.wav").write_bytes(b"chunk")
+            return b"", b""
+        
+        process = AsyncMock()
+        process.communicate.side_effect = fake_communicate
+        process.returncode = 0
+        
+        # ~312KB file split into 0.1MB chunks -> 3 second segments
+        with patch("asyncio.create_subprocess_exec", return_value=process) as mock_exec:
+            chunks = await openai_whisper.chunk_large_audio(audio_path, chunk_size_mb=0.1)
+        
+        argv = mock_exec.call_args.args
+        assert argv[0] == "ffmpeg"
+        assert argv[argv.index("-segment_time") + 1] == "3"
+        assert argv[argv.index("-c") + 1] == "copy"
+        assert [chunk.name for chunk in chunks] == ["chunk_000.wav", "chunk_001.wav", "chunk_002.wav"]
+
+    async def test_chunk_large_audio_reencodes_when_copy_fails(self, tmp_path):
+        """Test that a failed stream-copy split falls back to PCM WAV chunks."""
+        import numpy as np
+        import soundfile as sf
+        
+        audio_path = tmp_path / "long.wav"
+        sf.write(str(audio_path), np.zeros(16000 * 10, dtype=np.int16), 16000, subtype="PCM_16")
+        chunk_dir = tmp_path / "long_chunks"
+        
+        copy_process = AsyncMock()
+        copy_process.communicate.return_value = (b"", b"codec not supported")
+        copy_process.returncode = 1
+        
+        async def fake_communicate():
+            for i in range(2):
+                (chunk_dir / f"chunk_{i:03d}.wav").write_bytes(b"chunk")
+            return b"", b""
+        
+        pcm_process = AsyncMock()
+        pcm_process.communicate.side_effect = fake_communicate
+        pcm_process.returncode = 0
+        
+        with patch("asyncio.create_subprocess_exec", side_effect=[copy_process, pcm_process]) as mock_exec:
+            chunks = await openai_whisper.chunk_large_audio(audio_path, chunk_size_mb=0.1)
+        
+        argv = mock_exec.call_args.args
+        assert argv[argv.index("-c:a") + 1] == "pcm_s16le"
+        # 0.1MB of 16kHz 16-bit mono PCM lasts 3 seconds
+        assert argv[argv.index("-segment_time") + 1] == "3"
+        assert [chunk.name for chunk in chunks] == ["chunk_000.wav", "chunk_001.wav"]
+
+    async def test_chunk_large_audio_reuses_stat_result(self, tmp_path):
+        """Test that a stat result from the caller replaces another stat() call."""
+        import os
+        
+        # The file doesn't exist, so stat() would raise
+        audio_path = tmp_path / "missing.wav"
+        stat_result = os.stat_result((0o100644, 1, 0, 1, 0, 0, 1024, 0, 0, 0))
+        chunks = await openai_whisper.chunk_large_audio(audio_path, stat_result=stat_result)
+        
+        assert chunks == [audio_path]
+
+    async def test_large_audio_chunks_transcribed_concurrently(self, tmp_path):
+        """Test that chunks are transcribed at the same time and joined in order."""
+        import asyncio
+        import os
+        
+        chunks = []
+        for i in range(3):
+            chunk_path = tmp_path / f"chunk_{i:03d}.wav"
+            chunk_path.write_bytes(b"chunk")
+            chunks.append(chunk_path)
+        
+        running = 0
+        peak = 0
+        
+        async def fake_hybrid(chunk_path, detailed, language, prompt):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return chunk_path.stem, 0.9, "en", "openai"
+        
+        large = os.stat_result((0o100644, 1, 0, 1, 0, 0, 30 * 1024 * 1024, 0, 0, 0))
+        with patch.object(openai_whisper, "chunk_large_audio", AsyncMock(return_value=chunks)), \
+             patch.object(openai_whisper, "transcribe_audio_hybrid", side_effect=fake_hybrid), \
+             patch.object(openai_whisper, "CHUNK_CONCURRENCY", 4), \
+             patch.object(openai_whisper, "_chunk_semaphore", asyncio.Semaphore(2)):
+            text, confidence, language, source = await openai_whisper.transcribe_large_audio(
+                tmp_path / "long.wav", stat_result=large
+            )
+        
+        assert text == "chunk_000 chunk_001 chunk_002"
+        assert source == "chunked"
+        assert peak == 2
+        assert not any(chunk_path.exists() for chunk_path in chunks)
+
+    async def test_large_audio_removes_chunk_directory(self, tmp_path):
+        """Test that the chunk directory is removed with every file in it, but not the original."""
+        import os
+        
+        audio_path = tmp_path / "long.wav"
+        audio_path.write_bytes(b"audio")
+        chunk_dir = tmp_path / "long_chunks"
+        chunk_dir.mkdir()
+        chunks = []
+        for i in range(2):
+            chunks.append(chunk_dir / f"chunk_{i:03d}.wav")
+            chunks[-1].write_bytes(b"chunk")
+        # Left behind by an interrupted split
+        (chunk_dir / "chunk_002.wav").write_bytes(b"partial")
+        
+        large = os.stat_result((0o100644, 1, 0, 1, 0, 0, 30 * 1024 * 1024, 0, 0, 0))
+        with patch.object(openai_whisper, "chunk_large_audio", AsyncMock(return_value=chunks)), \
+             patch.object(openai_whisper, "transcribe_audio_hybrid", AsyncMock(return_value=("text", 0.9, "en", "openai"))):
+            await openai_whisper.transcribe_large_audio(audio_path, stat_result=large)
+        
+        assert not chunk_dir.exists()
+        assert audio_path.exists()
+
+    async def test_large_audio_keeps_chunks_that_succeeded(self, tmp_path):
+        """Test that one failed chunk leaves a gap instead of failing the whole file."""
+        import os
+        
+        chunks = [tmp_path / f"chunk_{i:03d}.wav" for i in range(3)]
+        
+        async def fake_hybrid(chunk_path, detailed, language, prompt):
+            if chunk_path.stem == "chunk_001":
+                raise RuntimeError("both backends failed")
+            return chunk_path.stem, 0.9, "en", "openai"
+        
+        large = os.stat_result((0o100644, 1, 0, 1, 0, 0, 30 * 1024 * 1024, 0, 0, 0))
+        with patch.object(openai_whisper, "chunk_large_audio", AsyncMock(return_value=chunks)), \
+             patch.object(openai_whisper, "transcribe_audio_hybrid", side_effect=fake_hybrid), \
+             patch.object(openai_whisper, "CHUNK_CONCURRENCY", 4):
+            text, confidence, language, _ = await openai_whisper.transcribe_large_audio(
+                tmp_path / "long.wav", stat_result=large
+            )
+        
+        assert text == "chunk_000 chunk_002"
+        assert confidence == pytest.approx(0.6)
+        assert language == "en"
 
+    async def test_close_openai_client(self):
+        """Test that shutdown closes the pooled OpenAI connections."""
+        client = MagicMock()
+        client.close = AsyncMock()
+        with patch('app.transcription.openai_whisper.openai_client', client):
+            await openai_whisper.close_openai_client()
+        client.close.assert_awaited_once()
+        
+        with patch('app.transcription.openai_whisper.openai_client', None):
+            await openai_whisper.close_openai_client()
 
+
+@requires_controller
 class TestHybridController:
     """Test hybrid controller with OpenAI integration."""
     
-    @pytest.mark.asyncio
     async def test_controller_imports(self):
         """Test that hybrid controller can be imported."""
-        try:
-            from app.hybrid.controller import (
-                process_audio_hybrid,
-                get_hybrid_status,
-                translate_audio_hybrid
-            )
-            assert True, "Hybrid controller imported successfully"
-        except ImportError as e:
-            pytest.skip(f"Hybrid controller import failed: {e}")
+        assert callable(process_audio_hybrid)
+        assert callable(get_hybrid_status)
+        assert callable(translate_audio_hybrid)
     
-    @pytest.mark.asyncio
     async def test_get_hybrid_status(self):
         """Test getting hybrid system status."""
-        try:
-            from app.hybrid.controller import get_hybrid_status
-            
-            status = get_hybrid_status()
-            
-            assert isinstance(status, dict)
-            assert "primary_service" in status
-            assert "fallback_enabled" in status
-            assert "openai_status" in status
-            
-        except ImportError:
-            pytest.skip("Hybrid controller not available")
+        status = get_hybrid_status()
+        
+        assert isinstance(status, dict)
+        assert "primary_service" in status
+        assert "fallback_enabled" in status
+        assert "openai_status" in status
     
-    @pytest.mark.asyncio
     async def test_process_audio_hybrid_mock(self, sample_audio_path):
         """Test processing audio with mocked dependencies."""
-        try:
-            from app.hybrid.controller import process_audio_hybrid
+        # Mock all the dependencies
+        with patch('app.hybrid.controller.get_audio_metadata') as mock_metadata, \
+             patch('app.hybrid.controller.verify_speaker') as mock_verify, \
+             patch('app.hybrid.controller.transcribe_audio_hybrid') as mock_transcribe:
+            
+            # Setup mocks
+            mock_metadata.return_value = (10.0, {"duration": 10.0})
+            mock_verify.return_value = (True, 0.95)
+            mock_transcribe.return_value = ("Test transcription", 0.9, "en", "openai")
+            
+            result = await process_audio_hybrid(
+                audio_path=sample_audio_path,
+                verify_speaker_flag=False,
+                return_debug=True
+            )
+            
+            assert isinstance(result, dict)
+            assert "source" in result
+            assert "text" in result
+            assert "metadata" in result
+            assert result["text"] == "Test transcription"
+
+
+    async def test_stream_audio_hybrid_mock(self, sample_audio_path):
+        """Test streaming deltas followed by a final result."""
+        async def fake_stream(audio_path, language=None, prompt=None):
+            for delta in ["Test ", "stream"]:
+                yield delta
+        
+        with patch('app.hybrid.controller.PRIMARY_SERVICE', "openai"), \
+             patch('app.hybrid.controller.supports_streaming', return_value=True), \
+             patch('app.hybrid.controller.stream_with_openai', fake_stream), \
+             patch('app.hybrid.controller.get_audio_metadata', return_value=(3.0, {"duration": 3.0})):
+            
+            events = [event async for event in stream_audio_hybrid(sample_audio_path)]
+        
+        assert [e["text"] for e in events if e["type"] == "delta"] == ["Test ", "stream"]
+        assert events[-1]["type"] == "final"
+        assert events[-1]["result"]["text"] == "Test stream"
+        assert events[-1]["result"]["source"] == "openai"
+
+
+    async def test_stream_verifies_speaker_once(self, sample_audio_path):
+        """Test that a failed verification is not repeated by the fallback pipeline."""
+        with patch('app.hybrid.controller.verify_speaker', AsyncMock(return_value=(False, 0.2))) as mock_verify, \
+             patch('app.hybrid.controller.get_audio_metadata', return_value=(3.0, {"duration": 3.0})):
+            events = [event async for event in stream_audio_hybrid(sample_audio_path, verify_speaker_flag=True)]
+        
+        assert mock_verify.await_count == 1
+        assert events[-1]["result"]["source"] == "verification_failed"
+        assert events[-1]["result"]["metadata"]["speaker_match"] == 0.2
+
+    async def test_verification_overlaps_metadata_probe(self, sample_audio_path):
+        """Test that speaker verification runs while the file is being probed."""
+        import threading
+        
+        verification_started = threading.Event()
+        
+        def slow_metadata(audio_path, stat_result=None):
+            # Only returns once verification has started alongside it
+            assert verification_started.wait(timeout=5)
+            return 3.0, {"duration": 3.0}
+        
+        async def fake_verify(audio_path):
+            verification_started.set()
+            return True, 0.97
+        
+        with patch('app.hybrid.controller.get_audio_metadata', side_effect=slow_metadata), \
+             patch('app.hybrid.controller.verify_speaker', side_effect=fake_verify), \
+             patch('app.hybrid.controller.transcribe_audio_hybrid',
+                   AsyncMock(return_value=("hello", 0.9, "en", "openai"))):
+            result = await process_audio_hybrid(sample_audio_path, verify_speaker_flag=True, return_debug=True)
+        
+        assert result["text"] == "hello"
+        assert result["metadata"]["speaker_match"] == 0.97
+        
+        with patch('app.hybrid.controller.get_audio_metadata', return_value=(3.0, {"duration": 3.0})), \
+             patch('app.hybrid.controller.verify_speaker', AsyncMock(side_effect=RuntimeError("no voiceprint"))):
+            result = await process_audio_hybrid(sample_audio_path, verify_speaker_flag=True)
+        
+        assert result["source"] == "verification_error"
+
+
+    async def test_semantic_validation_transcribes_once(self, sample_audio_path):
+        """Test that semantic validation asks only OpenAI for the comparison transcript."""
+        import numpy as np
+        
+        class FakeModel:
+            def encode(self, texts, **kwargs):
+                return np.array([[1.0, 0.0] if "light" in text else [0.0, 1.0] for text in texts], dtype=np.float32)
+        
+        clear_embedding_cache()
+        with patch('app.hybrid.controller.PRIMARY_SERVICE', "local"), \
+             patch('app.hybrid.controller.USE_SEMANTIC_VALIDATION', True), \
+             patch('app.hybrid.controller.get_sentence_transformer', return_value=FakeModel()), \
+             patch('app.hybrid.controller.get_audio_metadata', return_value=(3.0, {"duration": 3.0})), \
+             patch('app.hybrid.controller.transcribe_audio_hybrid',
+                   AsyncMock(return_value=("turn on the lamp", 0.8, "en", "local"))) as mock_hybrid, \
+             patch('app.hybrid.controller.try_transcribe_with_openai',
+                   AsyncMock(return_value=("turn on the light", 0.95, "en"))) as mock_openai:
+            result = await process_audio_hybrid(
+                sample_audio_path, use_semantics=True, semantic_threshold=0.5
+            )
+        clear_embedding_cache()
+        
+        assert mock_hybrid.await_count == 1
+        assert mock_openai.await_count == 1
+        assert result["source"] == "openai_semantic"
+        assert result["text"] == "turn on the light"
+        assert result["metadata"]["semantic_diff"] == pytest.approx(1.0)
+
+    async def test_semantic_fast_path_skips_encoder(self, sample_audio_path):
+        """Test that lexically identical transcripts are accepted without encoding the OpenAI text."""
+        import numpy as np
+        
+        class FakeModel:
+            def __init__(self):
+                self.encoded = []
             
-            # Mock all the dependencies
-            with patch('app.hybrid.controller.get_audio_metadata') as mock_metadata, \
-                 patch('app.hybrid.controller.verify_speaker') as mock_verify, \
-                 patch('app.hybrid.controller.transcribe_audio_hybrid') as mock_transcribe:
-                
-                # Setup mocks
-                mock_metadata.return_value = {"duration": 10.0}
-                mock_verify.return_value = (True, 0.95)
-                mock_transcribe.return_value = ("Test transcription", 0.9, "en", "openai")
-                
-                result = await process_audio_hybrid(
-                    audio_path=sample_audio_path,
-                    verify_speaker_flag=False,
-                    return_debug=True
-                )
-                
-                assert isinstance(result, dict)
-                assert "source" in result
-                assert "text" in result
-                assert "metadata" in result
-                assert result["text"] == "Test transcription"
-                
-        except ImportError:
-            pytest.skip("Hybrid controller not available")
+            def encode(self, texts, **kwargs):
+                self.encoded.extend(texts)
+                return np.ones((len(texts), 2), dtype=np.float32) / np.sqrt(2)
+        
+        model = FakeModel()
+        clear_embedding_cache()
+        with patch('app.hybrid.controller.PRIMARY_SERVICE', "local"), \
+             patch('app.hybrid.controller.USE_SEMANTIC_VALIDATION', True), \
+             patch('app.hybrid.controller.SEMANTIC_FAST_PATH', True), \
+             patch('app.hybrid.controller.semantic_cache') as mock_semantic_cache, \
+             patch('app.hybrid.controller.get_sentence_transformer', return_value=model), \
+             patch('app.hybrid.controller.get_audio_metadata', return_value=(3.0, {"duration": 3.0})), \
+             patch('app.hybrid.controller.transcribe_audio_hybrid',
+                   AsyncMock(return_value=("Turn on the light", 0.8, "en", "local"))), \
+             patch('app.hybrid.controller.try_transcribe_with_openai',
+                   AsyncMock(return_value=("turn on the light.", 0.95, "en"))):
+            mock_semantic_cache.lookup.return_value = None
+            result = await process_audio_hybrid(sample_audio_path, use_semantics=True)
+        clear_embedding_cache()
+        
+        assert model.encoded == ["Turn on the light"]
+        assert result["source"] == "local"
+        assert result["metadata"]["semantic_diff"] == pytest.approx(0.0)
+
+
+    async def test_transcription_runs_alongside_verification(self, sample_audio_path):
+        """Test that transcription overlaps verification and is cancelled when it fails."""
+        import asyncio
+        
+        transcription_started = asyncio.Event()
+        transcription_cancelled = asyncio.Event()
+        
+        async def slow_transcription(*args, **kwargs):
+            transcription_started.set()
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                transcription_cancelled.set()
+                raise
+        
+        async def failing_verification(audio_path):
+            # Only decides once transcription is already under way
+            await transcription_started.wait()
+            return False, 0.1
+        
+        with patch('app.hybrid.controller.PARALLEL_VERIFICATION', True), \
+             patch('app.hybrid.controller.get_audio_metadata', return_value=(3.0, {"duration": 3.0})), \
+             patch('app.hybrid.controller.verify_speaker', side_effect=failing_verification), \
+             patch('app.hybrid.controller.transcribe_audio_hybrid', side_effect=slow_transcription):
+            result = await asyncio.wait_for(
+                process_audio_hybrid(sample_audio_path, verify_speaker_flag=True), timeout=2
+            )
+            await asyncio.wait_for(transcription_cancelled.wait(), timeout=1)
+        
+        assert result["source"] == "verification_failed"
+
+
+@requires_controller
+class TestSemanticWarmUp:
+    """Test loading the semantic model at startup."""
+    
+    def test_warm_up_encodes_once(self):
+        """Test that warm-up loads the model and runs one encode only when enabled."""
+        model = MagicMock()
+        with patch('app.hybrid.controller.USE_SEMANTIC_VALIDATION', True), \
+             patch('app.hybrid.controller.get_sentence_transformer', return_value=model):
+            controller.warm_up_semantic_model()
+        model.encode.assert_called_once()
+        
+        with patch('app.hybrid.controller.USE_SEMANTIC_VALIDATION', False), \
+             patch('app.hybrid.controller.get_sentence_transformer') as mock_loader:
+            controller.warm_up_semantic_model()
+        mock_loader.assert_not_called()
 
 
 class TestConfiguration:
@@ -189,26 +570,20 @@ class TestConfiguration:
     
     def test_config_structure(self):
         """Test that configuration has required OpenAI settings."""
-        try:
-            from app.utils.config import load_config
-            
-            config = load_config()
-            
-            # Check if OpenAI section exists
-            if "openai" in config:
-                openai_config = config["openai"]
-                assert "model" in openai_config
-                assert "max_retries" in openai_config
-                assert "timeout" in openai_config
-            
-            # Check transcription section
-            if "transcription" in config:
-                transcription_config = config["transcription"]
-                assert "primary_service" in transcription_config
-                assert "fallback_to_local" in transcription_config
-                
-        except ImportError:
-            pytest.skip("Config module not available")
+        config = load_config()
+        
+        # Check if OpenAI section exists
+        if "openai" in config:
+            openai_config = config["openai"]
+            assert "model" in openai_config
+            assert "max_retries" in openai_config
+            assert "timeout" in openai_config
+        
+        # Check transcription section
+        if "transcription" in config:
+            transcription_config = config["transcription"]
+            assert "primary_service" in transcription_config
+            assert "fallback_to_local" in transcription_config
     
     def test_environment_variables(self):
         """Test that OpenAI API key can be set via environment."""
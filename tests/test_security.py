@@ -0,0 +1,90 @@
+"""
+Tests for the security utilities.
+"""
+import pytest
+from fastapi import HTTPException
+
+from app.utils import security
+
+
+async def test_validate_api_key_accepts_configured_key(monkeypatch):
+    """Test that a configured API key is accepted."""
+    monkeypatch.setattr(security, "VALID_API_KEYS", frozenset({b"secret-key"}))
+    monkeypatch.setattr(security, "SKIP_API_VALIDATION", False)
+
+    assert await security.validate_api_key("secret-key") == "secret-key"
+
+
+@pytest.mark.parametrize("api_key", [None, "", "wrong-key"])
+async def test_validate_api_key_rejects_invalid_key(monkeypatch, api_key):
+    """Test that missing or unknown API keys are rejected."""
+    monkeypatch.setattr(security, "VALID_API_KEYS", frozenset({b"secret-key"}))
+    monkeypatch.setattr(security, "SKIP_API_VALIDATION", False)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await security.validate_api_key(api_key)
+    assert exc_info.value.status_code == 403
+
+
+async def test_validate_api_key_does_not_grow_key_list(monkeypatch):
+    """Test that repeated validation doesn't mutate the configured key list."""
+    monkeypatch.setenv("WHISPER_API_KEY", "env-key")
+    keys_before = list(security.config.get("api", {}).get("keys", []))
+
+    for _ in range(3):
+        try:
+            await security.validate_api_key("some-key")
+        except HTTPException:
+            pass
+
+    assert security.config.get("api", {}).get("keys", []) == keys_before
+
+
+def test_valid_api_keys_are_encoded_once(monkeypatch):
+    """Test that keys are deduplicated and stored as bytes, skipping empty ones."""
+    monkeypatch.setenv("WHISPER_API_KEY", "env-key")
+    monkeypatch.setitem(security.config, "api", {"keys": ["env-key", "file-key", ""]})
+
+    assert security._load_valid_api_keys() == frozenset({b"env-key", b"file-key"})
+
+
+@pytest.fixture
+def encryption_key(monkeypatch):
+    import base64
+    import os
+
+    key = base64.urlsafe_b64encode(os.urandom(32)).decode()
+    monkeypatch.setenv("WHISPER_ENCRYPTION_KEY", key)
+    monkeypatch.delenv("WHISPER_ENCRYPTION_PREVIOUS_KEYS", raising=False)
+    security._encryption_keys.cache_clear()
+    yield key
+    security._encryption_keys.cache_clear()
+
+
+def test_encrypt_round_trip(encryption_key):
+    """Test that AES-GCM encrypted data decrypts, and tampering is detected."""
+    from cryptography.exceptions import InvalidTag
+
+    token = security.encrypt_data(b"voiceprint")
+    assert token != security.encrypt_data(b"voiceprint")  # Fresh nonce per call
+    assert security.decrypt_data(token) == b"voiceprint"
+
+    with pytest.raises(InvalidTag):
+        security.decrypt_data(token[:-1] + bytes([token[-1] ^ 1]))
+
+
+def test_decrypt_after_key_rotation(encryption_key, monkeypatch):
+    """Test that data written with a previous key and legacy Fernet data still decrypt."""
+    import base64
+    import os
+    from cryptography.fernet import Fernet
+
+    token = security.encrypt_data(b"voiceprint")
+    legacy = Fernet(encryption_key.encode()).encrypt(b"legacy")
+
+    monkeypatch.setenv("WHISPER_ENCRYPTION_KEY", base64.urlsafe_b64encode(os.urandom(32)).decode())
+    monkeypatch.setenv("WHISPER_ENCRYPTION_PREVIOUS_KEYS", encryption_key)
+    security._encryption_keys.cache_clear()
+
+    assert security.decrypt_data(token) == b"voiceprint"
+    assert security.decrypt_data(legacy) == b"legacy"
@@ -0,0 +1,251 @@
+"""
+Tests for the semantic validation helpers.
+"""
+import pytest
+import numpy as np
+
+try:
+    from app.hybrid import semantic
+    SEMANTIC_IMPORTS_SUCCESSFUL = True
+except ImportError:
+    SEMANTIC_IMPORTS_SUCCESSFUL = False
+
+# Skip all tests if imports failed
+pytestmark = pytest.mark.skipif(not SEMANTIC_IMPORTS_SUCCESSFUL,
+                               reason="Semantic imports failed, skipping semantic tests")
+
+
+def _inference_mode_enabled():
+    try:
+        import torch
+    except ImportError:
+        return None
+    return torch.is_inference_mode_enabled()
+
+
+class FakeModel:
+    """Bag-of-characters encoder that records its batches."""
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=False,
+               show_progress_bar=None):
+        self.batches.append(list(texts))
+        self.show_progress_bar = show_progress_bar
+        self.inference_mode = _inference_mode_enabled()
+        embeddings = np.zeros((len(texts), 32), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for char in text:
+                embeddings[row, ord(char) % 32] += 1
+        if normalize_embeddings:
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    """Start every test with an empty embedding cache."""
+    semantic.clear_embedding_cache()
+    yield
+    semantic.clear_embedding_cache()
+
+
+def test_similarity_uses_one_batched_encode():
+    """Test that both texts are encoded in a single call."""
+    model = FakeModel()
+
+    assert semantic.semantic_similarity(model, "abc", "abc") == pytest.approx(1.0)
+    assert model.batches == [["abc"]]
+
+    similarity = semantic.semantic_similarity(model, "hello", "world")
+    assert 0.0 < similarity < 1.0
+    assert model.batches[-1] == ["hello", "world"]
+    assert model.show_progress_bar is False
+
+
+def test_cached_embeddings_are_not_encoded_again():
+    """Test that repeated texts skip the encoder."""
+    model = FakeModel()
+
+    semantic.encode_texts(model, ["local text"])
+    semantic.semantic_similarity(model, "local text", "remote text")
+
+    assert model.batches == [["local text"], ["remote text"]]
+
+
+def test_sentence_transformer_loaded_once():
+    """Test that the model is loaded lazily and shared between callers."""
+    from unittest.mock import patch
+
+    import threading
+
+    semantic.clear_sentence_transformers()
+    with patch.dict("sys.modules", {"sentence_transformers": None}), \
+         patch.object(semantic, "_load_sentence_transformer", wraps=semantic._load_sentence_transformer) as mock_load:
+        # Import failures are reported as an unavailable model
+        assert semantic.get_sentence_transformer("missing-model") is None
+        assert semantic.get_sentence_transformer("missing-model") is None
+        assert mock_load.call_count == 1
+
+        # Concurrent first calls share one load
+        semantic.clear_sentence_transformers()
+        threads = [threading.Thread(target=semantic.get_sentence_transformer, args=("other-model",)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert mock_load.call_count == 2
+    semantic.clear_sentence_transformers()
+
+
+def test_encode_runs_without_autograd():
+    """Test that embeddings are computed in inference mode."""
+    model = FakeModel()
+
+    semantic.encode_texts(model, ["no grad"])
+    assert model.inference_mode in (True, None)
+
+
+@pytest.mark.parametrize("use_rapidfuzz", [True, False], ids=["rapidfuzz", "difflib"])
+def test_lexical_similarity(use_rapidfuzz):
+    """Test the lexical pre-check on identical, reordered, contained and unrelated transcripts."""
+    from unittest.mock import patch
+
+    try:
+        from app.hybrid.controller import LEXICAL_SAME_THRESHOLD
+    except ImportError:
+        LEXICAL_SAME_THRESHOLD = 0.95  # The controller's default
+    if use_rapidfuzz and semantic.fuzz is None:
+        pytest.skip("rapidfuzz not installed")
+
+    with patch.object(semantic, "fuzz", semantic.fuzz if use_rapidfuzz else None):
+        assert semantic.lexical_similarity("Turn on the light", "turn on the light") == pytest.approx(1.0)
+        assert semantic.lexical_similarity("on the light turn", "turn on the light") == pytest.approx(1.0)
+        assert semantic.lexical_similarity("turn on the light", "what a lovely day") < 0.5
+        # One transcript's words being a subset of the other's is not the same command
+        assert semantic.lexical_similarity("open the door", "do not open the door") < LEXICAL_SAME_THRESHOLD
+
+
+def test_sentence_transformer_quantized_on_cpu():
+    """Test that linear layers are quantized to int8 when the model runs on the CPU."""
+    import types
+    from unittest.mock import patch
+
+    torch = pytest.importorskip("torch")
+
+    class FakeSentenceTransformer(torch.nn.Sequential):
+        def __init__(self, model_name, device):
+            torch.manual_seed(0)
+            super().__init__(torch.nn.Linear(32, 16))
+
+        def encode(self, texts, **kwargs):
+            features = torch.from_numpy(FakeModel().encode(texts))
+            embeddings = self(features).numpy()
+            return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    fake_module = types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer)
+    semantic.clear_sentence_transformers()
+    with patch.dict("sys.modules", {"sentence_transformers": fake_module}), \
+         patch("torch.cuda.is_available", return_value=False):
+        quantized = semantic.get_sentence_transformer("fake-model")
+        plain = semantic.get_sentence_transformer("fake-model", quantize=False)
+        # A model whose scores move too much keeps its fp32 weights
+        with patch.object(semantic, "QUANTIZE_MAX_DRIFT", -1.0):
+            semantic.clear_sentence_transformers()
+            rejected = semantic.get_sentence_transformer("fake-model")
+    semantic.clear_sentence_transformers()
+
+    assert not isinstance(quantized[0], torch.nn.Linear)
+    assert isinstance(plain[0], torch.nn.Linear)
+    assert isinstance(rejected[0], torch.nn.Linear)
+
+
+def test_sentence_transformer_compiled_on_gpu():
+    """Test that the transformer is compiled and kept in fp16 on the GPU."""
+    import types
+    from unittest.mock import patch
+
+    torch = pytest.importorskip("torch")
+
+    class FakeTransformer(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.auto_model = torch.nn.Linear(4, 4)
+
+    class Compiled(torch.nn.Module):
+        def __init__(self, module):
+            super().__init__()
+            self.module = module
+
+    def fake_sentence_transformer(model_name, device):
+        return torch.nn.Sequential(FakeTransformer())
+
+    fake_module = types.SimpleNamespace(SentenceTransformer=fake_sentence_transformer)
+    semantic.clear_sentence_transformers()
+    with patch.dict("sys.modules", {"sentence_transformers": fake_module}), \
+         patch("torch.cuda.is_available", return_value=True), \
+         patch("torch.compile", side_effect=lambda module, **kwargs: Compiled(module)) as mock_compile:
+        model = semantic.get_sentence_transformer("fake-model")
+    semantic.clear_sentence_transformers()
+
+    mock_compile.assert_called_once()
+    assert isinstance(model[0].auto_model, Compiled)
+    assert model[0].auto_model.module.weight.dtype == torch.float16
+
+
+def test_sentence_transformer_onnx_backend():
+    """Test that the ONNX backend is requested and PyTorch is used when it fails."""
+    import types
+    from unittest.mock import MagicMock, patch
+
+    pytest.importorskip("torch")
+    calls = []
+
+    def fake_sentence_transformer(model_name, device, backend="torch", model_kwargs=None):
+        calls.append((backend, model_kwargs))
+        if backend == "onnx" and model_name == "no-onnx":
+            raise RuntimeError("optimum not installed")
+        return MagicMock(backend=backend)
+
+    fake_module = types.SimpleNamespace(SentenceTransformer=fake_sentence_transformer)
+    semantic.clear_sentence_transformers()
+    with patch.dict("sys.modules", {"sentence_transformers": fake_module}), \
+         patch("torch.cuda.is_available", return_value=False):
+        onnx_model = semantic.get_sentence_transformer("fake-model", backend="onnx")
+        fallback = semantic.get_sentence_transformer("no-onnx", quantize=False, backend="onnx")
+    semantic.clear_sentence_transformers()
+
+    assert onnx_model.backend == "onnx"
+    assert calls[0] == ("onnx", {"provider": "CPUExecutionProvider"})
+    assert fallback.backend == "torch"
+
+
+def test_embedding_cache_keys_are_bounded():
+    """Test that long transcripts are cached under fixed-size digests."""
+    model = FakeModel()
+    long_text = "turn on the light " * 1000
+
+    first = semantic.encode_texts(model, [long_text])
+    second = semantic.encode_texts(model, [long_text])
+
+    assert model.batches == [[long_text]]
+    np.testing.assert_array_equal(first, second)
+    assert all(len(key) == 20 for key in semantic._embedding_cache)
+
+
+def test_encode_texts_from_worker_threads():
+    """Test that concurrent encodes with a tiny cache never lose their rows."""
+    from concurrent.futures import ThreadPoolExecutor
+    from unittest.mock import patch
+    from cachetools import LRUCache
+
+    model = FakeModel()
+    texts = [f"command number {i}" for i in range(20)]
+
+    with patch.object(semantic, "_embedding_cache", LRUCache(maxsize=2)):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda text: semantic.encode_texts(model, [text, "shared"]), texts * 5))
+
+    for text, embeddings in zip(texts * 5, results):
+        np.testing.assert_allclose(embeddings[0], FakeModel().encode([text], normalize_embeddings=True)[0])
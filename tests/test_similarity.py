@@ -0,0 +1,34 @@
+"""
+Tests for the shared embedding similarity kernel.
+"""
+import pytest
+import numpy as np
+
+try:
+    from app.utils import similarity
+    SIMILARITY_IMPORTS_SUCCESSFUL = True
+except ImportError:
+    SIMILARITY_IMPORTS_SUCCESSFUL = False
+
+# Skip all tests if imports failed
+pytestmark = pytest.mark.skipif(not SIMILARITY_IMPORTS_SUCCESSFUL,
+                               reason="Similarity imports failed, skipping similarity tests")
+
+
+def test_unit_dot_matches_numpy():
+    """Test the compiled similarity kernel against numpy."""
+    rng = np.random.default_rng(0)
+    a, b = rng.standard_normal((2, 384)).astype(np.float32)
+    a /= np.linalg.norm(a)
+    b /= np.linalg.norm(b)
+
+    assert similarity.unit_dot(a, b) == pytest.approx(float(a @ b), abs=1e-5)
+    assert similarity.unit_dot(a, a) == pytest.approx(1.0, abs=1e-5)
+
+
+def test_unit_normalize_returns_float32_unit_vector():
+    """Test that voiceprints of any dtype are normalized to float32."""
+    vector = similarity.unit_normalize(np.array([3.0, 4.0], dtype=np.float64))
+
+    assert vector.dtype == np.float32
+    np.testing.assert_allclose(vector, [0.6, 0.8], rtol=1e-6)
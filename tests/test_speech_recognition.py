@@ -0,0 +1,137 @@
+"""
+Tests for local Whisper transcription batching.
+"""
+import asyncio
+import pytest
+from pathlib import Path
+
+try:
+    from app.transcription.speech_recognition import TranscriptionBatcher
+    SPEECH_IMPORTS_SUCCESSFUL = True
+except ImportError:
+    SPEECH_IMPORTS_SUCCESSFUL = False
+
+# Skip all tests if imports failed
+pytestmark = pytest.mark.skipif(not SPEECH_IMPORTS_SUCCESSFUL,
+                               reason="Speech recognition imports failed, skipping batching tests")
+
+
+class RecordingBatcher(TranscriptionBatcher):
+    """Batcher that records batches instead of running Whisper."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(None, *args, **kwargs)
+        self.batches = []
+
+    def _decode_batch(self, audio_paths):
+        self.batches.append(list(audio_paths))
+        return [(f"text for {path.name}", 0.9, "en") for path in audio_paths]
+
+
+async def test_concurrent_requests_are_batched():
+    """Test that concurrent requests share one decode call and get their own results."""
+    batcher = RecordingBatcher(max_batch_size=8, max_wait_ms=50)
+    paths = [Path(f"clip_{i}.wav") for i in range(5)]
+
+    results = await asyncio.gather(*(batcher.transcribe(path) for path in paths))
+
+    assert batcher.batches == [paths]
+    assert [text for text, _, _ in results] == [f"text for {path.name}" for path in paths]
+
+
+async def test_batch_size_is_capped():
+    """Test that batches never exceed the configured size."""
+    batcher = RecordingBatcher(max_batch_size=2, max_wait_ms=50)
+    paths = [Path(f"clip_{i}.wav") for i in range(5)]
+
+    await asyncio.gather(*(batcher.transcribe(path) for path in paths))
+
+    assert [len(batch) for batch in batcher.batches] == [2, 2, 1]
+
+
+async def test_decode_error_is_propagated_to_every_request():
+    """Test that a failed batch fails all of its requests without stopping the worker."""
+    batcher = RecordingBatcher(max_batch_size=8, max_wait_ms=20)
+
+    def failing_decode(audio_paths):
+        raise RuntimeError("decode failed")
+
+    batcher._decode_batch = failing_decode
+    results = await asyncio.gather(
+        batcher.transcribe(Path("a.wav")),
+        batcher.transcribe(Path("b.wav")),
+        return_exceptions=True,
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    del batcher._decode_batch
+    assert (await batcher.transcribe(Path("c.wav")))[0] == "text for c.wav"
+
+
+def test_ctranslate2_segments_are_joined():
+    """Test that faster-whisper segments become one transcript with an average confidence."""
+    import math
+    from types import SimpleNamespace
+    from app.transcription import speech_recognition
+
+    class FakeModel:
+        def transcribe(self, audio, **kwargs):
+            segments = (SimpleNamespace(text=f" part {i}", avg_logprob=math.log(p)) for i, p in enumerate((0.8, 0.6)))
+            return segments, SimpleNamespace(language="en")
+
+    text, confidence, language = speech_recognition._transcribe_ctranslate2(FakeModel(), None)
+
+    assert text == "part 0 part 1"
+    assert confidence == pytest.approx(0.7)
+    assert language == "en"
+
+
+def test_detected_language_limited_to_subset():
+    """Test that auto-detection picks the most probable configured language."""
+    from unittest.mock import patch
+    from app.transcription import speech_recognition
+
+    probabilities = [{"en": 0.2, "de": 0.5, "ru": 0.3}, {"en": 0.6, "de": 0.3, "ru": 0.1}]
+    with patch.object(speech_recognition, "LANGUAGE_SUBSET", ("en", "ru")), \
+         patch.object(speech_recognition.whisper, "detect_language", return_value=(None, probabilities)):
+        assert speech_recognition._detect_languages(None, None) == ["ru", "en"]
+        assert list(speech_recognition.get_supported_languages()) == ["en", "ru"]
+
+
+async def test_batches_decoded_concurrently_up_to_limit():
+    """Test that up to max_in_flight batches are decoded at the same time."""
+    batcher = RecordingBatcher(max_batch_size=1, max_wait_ms=0, max_in_flight=2)
+    running = 0
+    peak = 0
+
+    async def fake_submit(audio_paths):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.02)
+        running -= 1
+        return [(path.name, 0.9, "en") for path in audio_paths]
+
+    batcher._submit = fake_submit
+    paths = [Path(f"clip_{i}.wav") for i in range(5)]
+    results = await asyncio.gather(*(batcher.transcribe(path) for path in paths))
+
+    assert [text for text, _, _ in results] == [path.name for path in paths]
+    assert peak == 2
+
+
+def test_long_transcription_confidence_from_segment_logprobs():
+    """Test that long-form confidence averages exp(avg_logprob) over Whisper's segments."""
+    import math
+    from app.transcription import speech_recognition
+
+    class FakeModel:
+        def transcribe(self, audio, **kwargs):
+            segments = [{"avg_logprob": math.log(p)} for p in (0.9, 0.5)]
+            return {"text": " long text ", "language": "en", "segments": segments}
+
+    text, confidence, language = speech_recognition._transcribe_long(FakeModel(), None)
+
+    assert text == "long text"
+    assert confidence == pytest.approx(0.7)
+    assert language == "en"
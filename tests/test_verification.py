@@ -0,0 +1,128 @@
+"""
+Tests for speaker verification.
+"""
+import os
+import pickle
+import pytest
+import numpy as np
+from unittest.mock import patch
+
+try:
+    from app.voice_auth import verification
+    VERIFICATION_IMPORTS_SUCCESSFUL = True
+except ImportError:
+    VERIFICATION_IMPORTS_SUCCESSFUL = False
+
+# Skip all tests if imports failed
+pytestmark = pytest.mark.skipif(not VERIFICATION_IMPORTS_SUCCESSFUL,
+                               reason="Verification imports failed, skipping verification tests")
+
+
+def write_voiceprint(directory, voiceprint, mtime):
+    path = directory / "owner_voiceprint.npy"
+    np.save(path, voiceprint)
+    os.utime(path, (mtime, mtime))
+
+
+def test_owner_reference_loaded_once_per_file_version(tmp_path):
+    """Test that the normalized voiceprint is reused until the file changes."""
+    write_voiceprint(tmp_path, np.array([3.0, 4.0]), 1_000_000)
+
+    with patch.object(verification, "VOICEPRINT_DIR", tmp_path), \
+         patch.object(verification, "_owner_reference", None), \
+         patch.object(verification, "load_owner_voiceprint", wraps=verification.load_owner_voiceprint) as mock_load:
+        np.testing.assert_allclose(verification.get_owner_reference(), [0.6, 0.8])
+        verification.get_owner_reference()
+        assert mock_load.call_count == 1
+
+        write_voiceprint(tmp_path, np.array([0.0, 2.0]), 2_000_000)
+        np.testing.assert_allclose(verification.get_owner_reference(), [0.0, 1.0])
+        assert mock_load.call_count == 2
+
+
+def test_owner_voiceprint_version_changes_on_reregistration(tmp_path):
+    """Test that cache keys built from the voiceprint version change when the file is replaced."""
+    with patch.object(verification, "VOICEPRINT_DIR", tmp_path):
+        assert verification.owner_voiceprint_version() is None
+
+        write_voiceprint(tmp_path, np.array([3.0, 4.0]), 1_000_000)
+        version = verification.owner_voiceprint_version()
+        assert version == (1_000_000 * 10**9, (tmp_path / "owner_voiceprint.npy").stat().st_size)
+
+        write_voiceprint(tmp_path, np.array([0.0, 2.0]), 2_000_000)
+        assert verification.owner_voiceprint_version() != version
+
+
+def test_legacy_pickled_voiceprint_is_converted(tmp_path):
+    """Test that a voiceprint pickled by an earlier version is rewritten as .npy once."""
+    with open(tmp_path / "owner_voiceprint.pkl", "wb") as f:
+        pickle.dump(np.array([3.0, 4.0]), f)
+
+    with patch.object(verification, "VOICEPRINT_DIR", tmp_path), \
+         patch.object(verification, "_owner_reference", None):
+        np.testing.assert_allclose(verification.get_owner_reference(), [0.6, 0.8])
+
+    assert not (tmp_path / "owner_voiceprint.pkl").exists()
+    stored = np.load(tmp_path / "owner_voiceprint.npy", allow_pickle=False)
+    assert stored.dtype == np.float32
+    np.testing.assert_allclose(stored, [3.0, 4.0])
+
+
+async def test_verify_speaker_uses_reference(tmp_path):
+    """Test that only the probe clip is embedded during verification."""
+    write_voiceprint(tmp_path, np.array([1.0, 0.0]), 1_000_000)
+
+    with patch.object(verification, "VOICEPRINT_DIR", tmp_path), \
+         patch.object(verification, "_owner_reference", None), \
+         patch.object(verification, "get_voice_embedding", return_value=np.array([2.0, 0.0])) as mock_embed:
+        verified, score = await verification.verify_speaker(tmp_path / "probe.wav")
+
+    assert verified
+    assert score == pytest.approx(1.0)
+    mock_embed.assert_called_once()
+
+
+async def test_verify_speaker_embeds_off_event_loop(tmp_path):
+    """Test that the probe embedding runs on the dedicated embedding threads."""
+    import threading
+
+    write_voiceprint(tmp_path, np.array([1.0, 0.0]), 1_000_000)
+    threads = []
+
+    def fake_embedding(audio_path):
+        threads.append(threading.current_thread())
+        return np.array([1.0, 0.0])
+
+    with patch.object(verification, "VOICEPRINT_DIR", tmp_path), \
+         patch.object(verification, "_owner_reference", None), \
+         patch.object(verification, "get_voice_embedding", side_effect=fake_embedding):
+        verified, _ = await verification.verify_speaker(tmp_path / "probe.wav")
+
+    assert verified
+    assert threads and threads[0] is not threading.main_thread()
+    assert threads[0].name.startswith("voice-embedding")
+
+
+def test_voice_print_is_stored_unit_length():
+    """Test that registration averages the samples into a unit-length voiceprint."""
+    from app.voice_auth import registration
+
+    wavs = [np.zeros(1), np.ones(1)]
+    with patch.object(registration, "get_voice_embeddings", return_value=np.array([[3.0, 0.0], [0.0, 4.0]])):
+        voiceprint = registration.build_voice_print(wavs)
+
+    assert voiceprint.dtype == np.float32
+    np.testing.assert_allclose(voiceprint, [0.6, 0.8], rtol=1e-6)
+
+
+@pytest.mark.skipif(VERIFICATION_IMPORTS_SUCCESSFUL and verification.voice_encoder is None,
+                    reason="Voice encoder not available")
+def test_batched_embeddings_match_single_utterances():
+    """Test that one batched forward pass gives the same embeddings as embed_utterance."""
+    rng = np.random.default_rng(0)
+    wavs = [rng.standard_normal(16000 * seconds).astype(np.float32) * 0.1 for seconds in (2, 3)]
+
+    embeddings = verification.get_voice_embeddings(wavs)
+
+    for wav, embedding in zip(wavs, embeddings):
+        np.testing.assert_allclose(embedding, verification.voice_encoder.embed_utterance(wav), atol=1e-5)